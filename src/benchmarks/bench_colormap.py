@@ -0,0 +1,93 @@
+import time
+import numpy as np
+
+from modules.colormap import Colormap
+
+
+GRADIENT_COLORS = [
+    (0.0, 0.0, 1.0),
+    (0.0, 1.0, 1.0),
+    (0.0, 1.0, 0.0),
+    (1.0, 1.0, 0.0),
+    (1.0, 0.0, 0.0)
+]
+GRADIENT_POSITIONS = [0.0, 0.25, 0.5, 0.75, 1.0]
+SIZES = [10 ** 4, 10 ** 5, 10 ** 6]
+
+
+# Прежняя реализация Renderer._get_array_color_by_height (эталон)
+def legacy_colors(z_array, min_z, max_z, gradient_colors, gradient_positions):
+    if max_z == min_z:
+        return np.tile(gradient_colors[0], (len(z_array), 1))
+
+    normalized = (z_array - min_z) / (max_z - min_z)
+    colors = np.zeros((len(z_array), 3))
+
+    i = 0
+    while i < len(z_array):
+        norm_val = normalized[i]
+
+        grad_idx = 0
+        while grad_idx < len(gradient_positions) - 1:
+            if gradient_positions[grad_idx] <= norm_val <= \
+                    gradient_positions[grad_idx + 1]:
+                t = (norm_val - gradient_positions[grad_idx]) / \
+                    (gradient_positions[grad_idx + 1] -
+                     gradient_positions[grad_idx])
+
+                color1 = gradient_colors[grad_idx]
+                color2 = gradient_colors[grad_idx + 1]
+
+                colors[i, 0] = color1[0] + t * (color2[0] - color1[0])
+                colors[i, 1] = color1[1] + t * (color2[1] - color1[1])
+                colors[i, 2] = color1[2] + t * (color2[2] - color1[2])
+                break
+            grad_idx += 1
+
+        if grad_idx == len(gradient_positions) - 1:
+            colors[i] = gradient_colors[-1]
+
+        i += 1
+
+    return colors
+
+
+# Измерение лучшего времени из нескольких запусков
+def best_time(func, repeats):
+    best = float('inf')
+    result = None
+    i = 0
+    while i < repeats:
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+        i += 1
+    return best, result
+
+
+def main():
+    rng = np.random.default_rng(42)
+    colormap = Colormap(GRADIENT_COLORS, GRADIENT_POSITIONS)
+
+    print(f"{'Высот':>10} {'Старый, с':>12} {'Новый, с':>12} " +
+          f"{'Ускорение':>10} {'Макс. откл.':>12}")
+
+    idx = 0
+    while idx < len(SIZES):
+        size = SIZES[idx]
+        heights = rng.uniform(-1.0, 1.0, size).astype(np.float32)
+
+        old_time, old_colors = best_time(
+            lambda: legacy_colors(heights, -1.0, 1.0, GRADIENT_COLORS,
+                                  GRADIENT_POSITIONS), 1)
+        new_time, new_colors = best_time(
+            lambda: colormap.map_heights(heights, -1.0, 1.0), 5)
+
+        max_error = np.max(np.abs(old_colors - new_colors))
+        print(f"{size:>10} {old_time:>12.4f} {new_time:>12.5f} " +
+              f"{old_time / new_time:>9.0f}x {max_error:>12.2e}")
+        idx += 1
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+import argparse
+import os
+import tempfile
+import time
+import numpy as np
+
+from benchmarks.synthetic import synthetic_heights, write_fdf
+from modules.fdf_reader import FDFReader
+
+
+# Прежняя реализация чтения в FDFParser._parse_fdf (эталон)
+def legacy_read(filename):
+    with open(filename, 'r') as file:
+        lines = file.readlines()
+
+    data_rows = []
+    i = 0
+    while i < len(lines):
+        values = lines[i].strip().split()
+        if values:
+            row = list(map(int, values))
+            data_rows.append(row)
+        i += 1
+
+    return np.array(data_rows, dtype=np.float32)
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(
+        description="Сравнение потокового и прежнего парсера FDF")
+    arg_parser.add_argument('--sizes', type=int, nargs='+',
+                            default=[1000, 4000, 8000],
+                            help="стороны синтетических карт")
+    arg_parser.add_argument('--no-legacy', action='store_true',
+                            help="не запускать прежний парсер " +
+                            "(8000x8000 требует несколько ГБ памяти)")
+    args = arg_parser.parse_args()
+
+    print(f"{'Размер':>11} {'МБ':>8} {'Старый, с':>10} {'Новый, с':>10} " +
+          f"{'МБ/с':>8} {'Ускорение':>10}")
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        idx = 0
+        while idx < len(args.sizes):
+            size = args.sizes[idx]
+            filename = os.path.join(tmp_dir, f"synthetic_{size}.fdf")
+            write_fdf(filename, synthetic_heights(size))
+            megabytes = os.path.getsize(filename) / (1024 * 1024)
+
+            start = time.perf_counter()
+            grid = FDFReader().read(filename)
+            new_time = time.perf_counter() - start
+
+            if args.no_legacy:
+                old_text = "-"
+                speedup_text = "-"
+            else:
+                start = time.perf_counter()
+                legacy_grid = legacy_read(filename)
+                old_time = time.perf_counter() - start
+
+                if not np.array_equal(grid, legacy_grid):
+                    raise RuntimeError(f"Результаты различаются: {size}")
+
+                old_text = f"{old_time:.2f}"
+                speedup_text = f"{old_time / new_time:.1f}x"
+                del legacy_grid
+
+            print(f"{size:>5}x{size:<5} {megabytes:>8.1f} {old_text:>10} " +
+                  f"{new_time:>10.2f} {megabytes / new_time:>8.1f} " +
+                  f"{speedup_text:>10}")
+
+            del grid
+            os.remove(filename)
+            idx += 1
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+import argparse
+import contextlib
+import io
+import math
+import time
+import numpy as np
+from OpenGL.GL import glMatrixMode, glLoadIdentity, glGetFloatv, glFinish, \
+    GL_PROJECTION, GL_MODELVIEW, GL_PROJECTION_MATRIX, GL_MODELVIEW_MATRIX
+from OpenGL.GLU import gluPerspective
+
+from benchmarks.synthetic import synthetic_heights
+from modules.camera import Camera
+from modules.colormap import Colormap
+from modules.graphics import SimpleRenderer
+from modules.lod import HeightPyramid
+from modules.offscreen import OffscreenContext
+from modules.renderer import FIELD_OF_VIEW, NEAR_PLANE, FAR_PLANE, \
+    DEFAULT_GRADIENT_COLORS, DEFAULT_GRADIENT_POSITIONS
+from modules.terrain import Frustum
+
+# Размер буфера кадра
+WIDTH = 1200
+HEIGHT = 800
+
+# Масштаб камеры: близко к модели, чтобы были загружены детальные тайлы
+CAMERA_ZOOM = 0.4
+
+
+# Пирамида высот с нормализацией, как у FDF файла (см. normalize_points)
+def height_pyramid(heights):
+    size = len(heights)
+    scale_factor = 2.0 / (size - 1)
+    min_z = float(heights.min())
+    max_z = float(heights.max())
+    pyramid = HeightPyramid(heights, scale_factor, min_z,
+                            0.5 / (max_z - min_z))
+    pyramid.build_extremes()
+    return pyramid, min_z * scale_factor, max_z * scale_factor
+
+
+# Построение модели и выбор тайлов для камеры (как при загрузке файла)
+def build_model(renderer, heights, colormap, camera):
+    pyramid, min_z, max_z = height_pyramid(heights)
+    level = pyramid.level_count() - 1
+    renderer.build_wireframe(pyramid.level_points(level),
+                             pyramid.level_lines(level), min_z, max_z,
+                             colormap.map_heights, None, pyramid)
+    renderer.set_gradient(DEFAULT_GRADIENT_COLORS,
+                          DEFAULT_GRADIENT_POSITIONS)
+
+    glMatrixMode(GL_MODELVIEW)
+    glLoadIdentity()
+    camera.apply_transformations()
+    pixel_scale = HEIGHT / (2.0 * math.tan(math.radians(FIELD_OF_VIEW / 2)))
+    frustum = Frustum(glGetFloatv(GL_PROJECTION_MATRIX),
+                      glGetFloatv(GL_MODELVIEW_MATRIX))
+    renderer.update_lod(pixel_scale / camera.get_distance(), frustum,
+                        pixel_scale)
+    glFinish()
+
+
+# Среднее время (мс) замены патчей patch x patch в случайных местах
+def measure_patches(renderer, heights, patch, count, seed=0):
+    rng = np.random.default_rng(seed)
+    size = len(heights)
+    total = 0.0
+    i = 0
+    while i < count:
+        x0 = int(rng.integers(0, size - patch + 1))
+        y0 = int(rng.integers(0, size - patch + 1))
+        values = heights[y0:y0 + patch, x0:x0 + patch] + \
+            rng.uniform(-5.0, 5.0, (patch, patch)).astype(np.float32)
+
+        start = time.perf_counter()
+        renderer.update_heights(x0, y0, values)
+        glFinish()
+        total += time.perf_counter() - start
+        i += 1
+    return total / count * 1000
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(
+        description="Сравнение пересборки модели и обновления " +
+        "прямоугольной части высот (glBufferSubData)")
+    arg_parser.add_argument('--size', type=int, default=2000,
+                            help="сторона синтетической карты")
+    arg_parser.add_argument('--patches', type=int, nargs='+',
+                            default=[8, 32, 128, 512],
+                            help="стороны патчей")
+    arg_parser.add_argument('--count', type=int, default=20,
+                            help="количество патчей каждого размера")
+    args = arg_parser.parse_args()
+
+    context = OffscreenContext(WIDTH, HEIGHT)
+    context.bind()
+    glMatrixMode(GL_PROJECTION)
+    glLoadIdentity()
+    gluPerspective(FIELD_OF_VIEW, WIDTH / float(HEIGHT), NEAR_PLANE,
+                   FAR_PLANE)
+
+    heights = synthetic_heights(args.size)
+    colormap = Colormap(DEFAULT_GRADIENT_COLORS, DEFAULT_GRADIENT_POSITIONS)
+    camera = Camera()
+    camera.zoom = CAMERA_ZOOM
+
+    print(f"{'Режим':<17} {'Тайлов':>7} {'Пересборка, мс':>15} " +
+          f"{'Патч':>9} {'Обновление, мс':>15} {'Ускорение':>10}")
+
+    modes = [("x, y, z, r, g, b", False), ("высоты", True)]
+    mode_idx = 0
+    while mode_idx < len(modes):
+        name, implicit_xy = modes[mode_idx]
+        renderer = SimpleRenderer(implicit_xy=implicit_xy)
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            build_model(renderer, heights, colormap, camera)
+            rebuild_time = (time.perf_counter() - start) * 1000
+        tiles = len(renderer.terrain.meshes)
+
+        # Первое изменение копирует исходные высоты (один раз)
+        renderer.update_heights(0, 0, heights[:1, :1])
+
+        idx = 0
+        while idx < len(args.patches):
+            patch = args.patches[idx]
+            patch_time = measure_patches(renderer, heights, patch,
+                                         args.count)
+            print(f"{name:<17} {tiles:>7} {rebuild_time:>15.1f} " +
+                  f"{f'{patch}x{patch}':>9} {patch_time:>15.2f} " +
+                  f"{rebuild_time / patch_time:>9.0f}x")
+            idx += 1
+
+        renderer.cleanup()
+        mode_idx += 1
+
+    context.delete()
+
+
+if __name__ == "__main__":
+    main()
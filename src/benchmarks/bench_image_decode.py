@@ -0,0 +1,93 @@
+import argparse
+import contextlib
+import io
+import os
+import time
+import numpy as np
+from PIL import Image
+
+from modules.file_parser import FDFParser
+
+# Изображение по умолчанию (относительно корня репозитория)
+DEFAULT_IMAGE = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                             '..', '..', 'fdf_image_for_test',
+                             'Planet9_3840x2160.jpg')
+
+
+# Прежнее уменьшение: декодирование в полном разрешении, оттенки серого
+# и билинейный фильтр до width x height (эталон)
+def legacy_heights(filename, width, height):
+    img = Image.open(filename).convert('L')
+    img = img.resize((width, height), Image.BILINEAR)
+    return 255.0 - np.asarray(img, dtype=np.float32)
+
+
+# Время чтения (с, этап 'parse' без построения геометрии) и высоты
+def parser_heights(filename, max_points):
+    parser = FDFParser(use_cache=False, max_image_points=max_points)
+    parser.parse_file(filename)
+    return parser.timings['parse'], parser.data_array
+
+
+# Время прежнего уменьшения (с) и высоты
+def timed_legacy_heights(filename, width, height):
+    start = time.perf_counter()
+    heights = legacy_heights(filename, width, height)
+    return time.perf_counter() - start, heights
+
+
+# Лучшее время (с) из repeat запусков и результат последнего
+def best_time(run, repeat):
+    best = None
+    result = None
+    with contextlib.redirect_stdout(io.StringIO()):
+        i = 0
+        while i < repeat:
+            elapsed, result = run()
+            if best is None or elapsed < best:
+                best = elapsed
+            i += 1
+    return best, result
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(
+        description="Сравнение уменьшения изображения после полного " +
+        "декодирования и уменьшения при декодировании (draft, reduce)")
+    arg_parser.add_argument('--image', default=DEFAULT_IMAGE,
+                            help="файл изображения")
+    arg_parser.add_argument('--points', type=int, nargs='+',
+                            default=[5000, 100000, 1000000],
+                            help="предельные количества точек")
+    arg_parser.add_argument('--repeat', type=int, default=5,
+                            help="количество запусков")
+    args = arg_parser.parse_args()
+
+    with Image.open(args.image) as img:
+        print(f"{os.path.basename(args.image)}: " +
+              f"{img.size[0]}x{img.size[1]} {img.format}")
+
+    print(f"{'Точек':>9} {'Сетка':>11} {'Старый, мс':>11} " +
+          f"{'Новый, мс':>10} {'Ускорение':>10} {'Откл. ср.':>10} " +
+          f"{'Откл. макс':>11}")
+
+    idx = 0
+    while idx < len(args.points):
+        max_points = args.points[idx]
+        new_time, heights = best_time(
+            lambda: parser_heights(args.image, max_points), args.repeat)
+        height, width = heights.shape
+        old_time, reference = best_time(
+            lambda: timed_legacy_heights(args.image, width, height),
+            args.repeat)
+
+        difference = np.abs(heights - reference)
+        print(f"{max_points:>9} {f'{width}x{height}':>11} " +
+              f"{old_time * 1000:>11.1f} {new_time * 1000:>10.1f} " +
+              f"{old_time / new_time:>9.1f}x {np.mean(difference):>10.2f} " +
+              f"{np.max(difference):>11.1f}")
+        idx += 1
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+import argparse
+import time
+import numpy as np
+from OpenGL.GL import glMatrixMode, glLoadIdentity, glOrtho, glClear, \
+    glFinish, GL_PROJECTION, GL_MODELVIEW, GL_COLOR_BUFFER_BIT
+
+from benchmarks.synthetic import synthetic_heights
+from modules.heightfield import HeightField
+from modules.mesh import WireframeMesh, HeightFieldMesh
+from modules.offscreen import OffscreenContext
+from modules.renderer import DEFAULT_GRADIENT_COLORS, \
+    DEFAULT_GRADIENT_POSITIONS
+from modules.shaders import HeightColorShader, HeightFieldShader
+from modules.topology import GridTopology
+
+
+# Карта высот size x size в квадрате [-1, 1]
+def grid_heightfield(size, quantize):
+    heights = synthetic_heights(size) * 0.001
+    step = 2.0 / (size - 1)
+    return HeightField(heights, (-1.0, 1.0), (step, -step), quantize)
+
+
+# Время загрузки (мс) и среднее время кадра (мс) для сетки
+def measure(mesh, shader, frames):
+    glFinish()
+    start = time.perf_counter()
+    mesh.upload()
+    glFinish()
+    upload_time = (time.perf_counter() - start) * 1000
+
+    shader.bind()
+    glFinish()
+    start = time.perf_counter()
+    frame = 0
+    while frame < frames:
+        glClear(GL_COLOR_BUFFER_BIT)
+        mesh.draw()
+        frame += 1
+    glFinish()
+    draw_time = (time.perf_counter() - start) / frames * 1000
+    shader.unbind()
+
+    vertex_bytes = mesh.vertex_bytes()
+    mesh.delete()
+    return vertex_bytes, upload_time, draw_time
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(
+        description="Сравнение буфера вершин с координатами и хранения " +
+        "только высот (float32 и uint16)")
+    arg_parser.add_argument('--sizes', type=int, nargs='+',
+                            default=[129, 1000, 2000],
+                            help="стороны сеток")
+    arg_parser.add_argument('--frames', type=int, default=10,
+                            help="количество кадров")
+    args = arg_parser.parse_args()
+
+    context = OffscreenContext(1200, 800)
+    context.bind()
+    glMatrixMode(GL_PROJECTION)
+    glLoadIdentity()
+    glOrtho(-1.0, 1.0, -1.0, 1.0, -1.0, 1.0)
+    glMatrixMode(GL_MODELVIEW)
+    glLoadIdentity()
+
+    color_shader = HeightColorShader()
+    field_shader = HeightFieldShader()
+    shaders = [color_shader, field_shader]
+    idx = 0
+    while idx < len(shaders):
+        shaders[idx].set_gradient(DEFAULT_GRADIENT_COLORS,
+                                  DEFAULT_GRADIENT_POSITIONS)
+        shaders[idx].set_height_range(-0.1, 0.1)
+        idx += 1
+
+    print(f"{'Сетка':<11} {'Вершины':<16} {'МБ':>8} {'Байт/вершину':>13} " +
+          f"{'Загрузка, мс':>13} {'Кадр, мс':>9}")
+
+    idx = 0
+    while idx < len(args.sizes):
+        size = args.sizes[idx]
+        lines = GridTopology(size, size).lines()
+        heightfield = grid_heightfield(size, False)
+        meshes = [
+            ("x, y, z, r, g, b", WireframeMesh(
+                heightfield.points(), lines,
+                np.ones((size * size, 3), dtype=np.float32)),
+             color_shader),
+            ("высота float32", HeightFieldMesh(heightfield, lines,
+                                               field_shader), field_shader),
+            ("высота uint16", HeightFieldMesh(
+                grid_heightfield(size, True), lines, field_shader),
+             field_shader)
+        ]
+
+        mesh_idx = 0
+        while mesh_idx < len(meshes):
+            name, mesh, shader = meshes[mesh_idx]
+            vertex_bytes, upload_time, draw_time = measure(mesh, shader,
+                                                           args.frames)
+            print(f"{f'{size}x{size}':<11} {name:<16} " +
+                  f"{vertex_bytes / 1024 / 1024:>8.2f} " +
+                  f"{vertex_bytes / (size * size):>13.0f} " +
+                  f"{upload_time:>13.2f} {draw_time:>9.2f}")
+            mesh_idx += 1
+        idx += 1
+
+    color_shader.delete()
+    field_shader.delete()
+    context.delete()
+
+
+if __name__ == "__main__":
+    main()
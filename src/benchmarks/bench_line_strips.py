@@ -0,0 +1,101 @@
+import argparse
+import time
+import numpy as np
+from OpenGL.GL import glMatrixMode, glLoadIdentity, glOrtho, glEnable, \
+    glDisable, glClear, glFinish, GL_PROJECTION, GL_MODELVIEW, \
+    GL_PRIMITIVE_RESTART, GL_COLOR_BUFFER_BIT
+
+from benchmarks.synthetic import synthetic_heights
+from modules.mesh import WireframeMesh
+from modules.offscreen import OffscreenContext
+from modules.topology import GridTopology
+
+
+# Вершины плоской сетки size x size в квадрате [-1, 1] с высотами
+def grid_vertices(size):
+    coords = np.linspace(-1.0, 1.0, size, dtype=np.float32)
+    vertices = np.empty((size * size, 3), dtype=np.float32)
+    vertices[:, 0] = np.tile(coords, size)
+    vertices[:, 1] = np.repeat(coords, size)
+    vertices[:, 2] = synthetic_heights(size).ravel() * 0.001
+    return vertices
+
+
+# Время загрузки (мс) и среднее время кадра (мс) для сетки
+def measure(vertices, colors, topology, line_strips, frames):
+    if line_strips:
+        indices = topology.strips()
+    else:
+        indices = topology.lines()
+    mesh = WireframeMesh(vertices, indices, colors, line_strips)
+
+    glFinish()
+    start = time.perf_counter()
+    mesh.upload()
+    glFinish()
+    upload_time = (time.perf_counter() - start) * 1000
+
+    if line_strips:
+        glEnable(GL_PRIMITIVE_RESTART)
+    glFinish()
+    start = time.perf_counter()
+    frame = 0
+    while frame < frames:
+        glClear(GL_COLOR_BUFFER_BIT)
+        mesh.draw()
+        frame += 1
+    glFinish()
+    draw_time = (time.perf_counter() - start) / frames * 1000
+    glDisable(GL_PRIMITIVE_RESTART)
+
+    num_indices = len(mesh.indices)
+    index_bytes = mesh.indices.nbytes
+    mesh.delete()
+    return num_indices, index_bytes, upload_time, draw_time
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(
+        description="Сравнение линий (GL_LINES) и полос (GL_LINE_STRIP)")
+    arg_parser.add_argument('--sizes', type=int, nargs='+',
+                            default=[129, 1000, 2000],
+                            help="стороны сеток")
+    arg_parser.add_argument('--frames', type=int, default=20,
+                            help="количество кадров")
+    args = arg_parser.parse_args()
+
+    context = OffscreenContext(1200, 800)
+    context.bind()
+    glMatrixMode(GL_PROJECTION)
+    glLoadIdentity()
+    glOrtho(-1.0, 1.0, -1.0, 1.0, -1.0, 1.0)
+    glMatrixMode(GL_MODELVIEW)
+    glLoadIdentity()
+
+    print(f"{'Сетка':<11} {'Режим':<7} {'Индексов':>10} {'МБ':>7} " +
+          f"{'Загрузка, мс':>13} {'Кадр, мс':>9}")
+
+    modes = [("линии", False), ("полосы", True)]
+    idx = 0
+    while idx < len(args.sizes):
+        size = args.sizes[idx]
+        vertices = grid_vertices(size)
+        colors = np.ones((len(vertices), 3), dtype=np.float32)
+        topology = GridTopology(size, size)
+
+        mode_idx = 0
+        while mode_idx < len(modes):
+            name, line_strips = modes[mode_idx]
+            count, nbytes, upload_time, draw_time = measure(
+                vertices, colors, topology, line_strips, args.frames)
+            print(f"{f'{size}x{size}':<11} {name:<7} {count:>10} " +
+                  f"{nbytes / 1024 / 1024:>7.2f} {upload_time:>13.2f} " +
+                  f"{draw_time:>9.2f}")
+            mode_idx += 1
+        idx += 1
+
+    context.delete()
+
+
+if __name__ == "__main__":
+    main()
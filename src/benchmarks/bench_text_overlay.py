@@ -0,0 +1,108 @@
+import argparse
+import time
+import pygame
+from OpenGL.GL import glMatrixMode, glLoadIdentity, glEnable, \
+    glDisable, glBlendFunc, glRasterPos2d, glDrawPixels, glFinish, \
+    GL_PROJECTION, GL_MODELVIEW, GL_BLEND, \
+    GL_DEPTH_TEST, GL_SRC_ALPHA, GL_ONE_MINUS_SRC_ALPHA, GL_RGBA, \
+    GL_UNSIGNED_BYTE
+from OpenGL.GLU import gluOrtho2D
+
+from modules.offscreen import OffscreenContext
+from modules.renderer import HELP_LINES
+from modules.text_overlay import TextOverlay
+
+
+# Прежняя реализация Renderer.display_info: все строки каждый кадр
+def legacy_draw(font, info_lines):
+    y_offset = 40
+    idx = 0
+    while idx < len(info_lines):
+        text_surface = font.render(info_lines[idx], True, (255, 255, 255))
+        text_data = pygame.image.tostring(text_surface, "RGBA", True)
+        glRasterPos2d(10, y_offset)
+        glDrawPixels(text_surface.get_width(), text_surface.get_height(),
+                     GL_RGBA, GL_UNSIGNED_BYTE, text_data)
+        y_offset += 20
+        idx += 1
+
+
+# Изменяемые строки кадра (вращение меняется каждый кадр при rotating)
+def frame_lines(frame, rotating):
+    angle = frame * 0.5 if rotating else 30.0
+    return [
+        "Файл: Planet9_3840x2160.jpg",
+        "Точек: 8294400",
+        "Линий: 16577280",
+        "Детализация: 0 (527223 точек, 1045973 линий)",
+        "Тайлы: 34 видимых, 10 отсечено",
+        f"Вращение X: {angle:.1f}°",
+        f"Вращение Y: {-45.0 + angle:.1f}°",
+        "Масштаб: 1.00"
+    ]
+
+
+# Среднее время кадра (мс) для функции отрисовки текста
+def measure(draw, frames, rotating):
+    glFinish()
+    start = time.perf_counter()
+    frame = 0
+    while frame < frames:
+        draw(frame_lines(frame, rotating))
+        frame += 1
+    glFinish()
+    return (time.perf_counter() - start) / frames * 1000
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(
+        description="Сравнение прежнего и кешированного вывода текста")
+    arg_parser.add_argument('--frames', type=int, default=500,
+                            help="количество кадров")
+    args = arg_parser.parse_args()
+
+    width, height = 1200, 800
+    context = OffscreenContext(width, height)
+    context.bind()
+
+    glMatrixMode(GL_PROJECTION)
+    glLoadIdentity()
+    gluOrtho2D(0, width, height, 0)
+    glMatrixMode(GL_MODELVIEW)
+    glLoadIdentity()
+    glDisable(GL_DEPTH_TEST)
+    glEnable(GL_BLEND)
+    glBlendFunc(GL_SRC_ALPHA, GL_ONE_MINUS_SRC_ALPHA)
+
+    pygame.font.init()
+    font = pygame.font.SysFont('Arial', 16)
+    overlay = TextOverlay(font)
+
+    # Прежний способ: справка тоже растеризуется каждый кадр
+    def draw_legacy(lines):
+        legacy_draw(font, lines + [""] + HELP_LINES)
+
+    def draw_cached(lines):
+        overlay.set_static_lines(HELP_LINES)
+        overlay.set_lines(lines)
+        overlay.draw(10, 40)
+
+    print(f"{'Сценарий':<20} {'Старый, мс':>11} {'Кеш, мс':>9} " +
+          f"{'Ускорение':>10}")
+
+    cases = [("Камера стоит", False), ("Вращение", True)]
+    idx = 0
+    while idx < len(cases):
+        name, rotating = cases[idx]
+        old_time = measure(draw_legacy, args.frames, rotating)
+        new_time = measure(draw_cached, args.frames, rotating)
+        print(f"{name:<20} {old_time:>11.3f} {new_time:>9.3f} " +
+              f"{old_time / new_time:>9.1f}x")
+        idx += 1
+
+    overlay.delete()
+    context.delete()
+
+
+if __name__ == "__main__":
+    main()
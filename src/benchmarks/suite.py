@@ -0,0 +1,391 @@
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+import numpy as np
+import pygame
+from OpenGL.error import GLError, NullFunctionError
+
+from benchmarks.synthetic import SIZES, synthetic_heights, write_fdf, \
+    write_png
+from modules.file_parser import FDFParser, SUPPORTED_EXTENSIONS
+from modules.graphics import SimpleRenderer
+from modules.offscreen import OffscreenContext
+from modules.renderer import Renderer, DEFAULT_GRADIENT_COLORS, \
+    DEFAULT_GRADIENT_POSITIONS
+from modules.topology import GridTopology
+
+# Каталог с примерами файлов (относительно корня репозитория)
+SAMPLE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                          '..', '..', 'fdf_image_for_test')
+
+# Стороны синтетических карт по умолчанию (без 8000x8000: требует
+# несколько ГБ памяти)
+DEFAULT_SIZES = SIZES[:-1]
+
+# Цвет вторичной сетки (как в Renderer)
+GRID_COLOR = (0.3, 0.3, 0.3, 0.5)
+
+# Размер буфера кадра для случаев с OpenGL
+GL_WIDTH = 1200
+GL_HEIGHT = 800
+
+
+# Точек в мегапикселе (пик памяти пересчитывается на мегапиксель карты)
+MEGAPIXEL = 1000 * 1000
+
+
+# Время (лучшее и среднее из repeat запусков) и пик памяти Python и
+# NumPy (tracemalloc, отдельный запуск). setup не входит в измерение
+def measure(setup, run, repeat):
+    times = []
+    with contextlib.redirect_stdout(io.StringIO()):
+        i = 0
+        while i < repeat:
+            state = setup()
+            start = time.perf_counter()
+            run(state)
+            times.append(time.perf_counter() - start)
+            i += 1
+
+        state = setup()
+        tracemalloc.start()
+        try:
+            run(state)
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+    return min(times), sum(times) / len(times), peak
+
+
+# Парсер с высотами, прочитанными source (как перед построением линий)
+def loaded_parser(source):
+    parser = FDFParser(use_cache=False)
+    parser.data_array = source.data_array
+    parser.colors = source.colors
+    parser.width = source.width
+    parser.height = source.height
+    parser.min_z = source.min_z
+    parser.max_z = source.max_z
+    parser.is_image = source.is_image
+    return parser
+
+
+# Renderer без окна: только градиент для _get_array_color_by_height
+def gradient_renderer():
+    renderer = Renderer.__new__(Renderer)
+    renderer.gradient_colors = list(DEFAULT_GRADIENT_COLORS)
+    renderer.gradient_positions = list(DEFAULT_GRADIENT_POSITIONS)
+    return renderer
+
+
+class BenchmarkSuite:
+    # Набор измерений: результаты, контекст OpenGL (None - случаи с
+    # OpenGL пропускаются) и причина пропуска
+    def __init__(self, repeat, use_gl):
+        self.repeat = repeat
+        self.results = []
+        self.context = None
+        self.gl_skip_reason = "отключено (--no-gl)"
+
+        if use_gl:
+            self._create_context()
+
+    # Контекст OpenGL без окна (при ошибке случаи с OpenGL пропускаются)
+    def _create_context(self):
+        try:
+            self.context = OffscreenContext(GL_WIDTH, GL_HEIGHT)
+            self.context.bind()
+        except (GLError, NullFunctionError, RuntimeError, OSError,
+                pygame.error) as e:
+            self.context = None
+            self.gl_skip_reason = f"OpenGL недоступен: {e}"
+
+    # Измерение одного случая и вывод строки таблицы
+    def run_case(self, case, input_name, points, setup, run, gl=False):
+        result = {
+            'case': case,
+            'input': input_name,
+            'points': int(points),
+            'repeat': self.repeat,
+            'best_s': None,
+            'mean_s': None,
+            'peak_bytes': None,
+            'peak_bytes_per_mpx': None,
+            'skipped': None
+        }
+
+        if gl and self.context is None:
+            result['skipped'] = self.gl_skip_reason
+        else:
+            try:
+                best, mean, peak = measure(setup, run, self.repeat)
+                result['best_s'] = best
+                result['mean_s'] = mean
+                result['peak_bytes'] = peak
+                result['peak_bytes_per_mpx'] = \
+                    int(peak * MEGAPIXEL / max(int(points), 1))
+            except MemoryError:
+                result['skipped'] = "недостаточно памяти"
+
+        self.results.append(result)
+        print_result(result)
+        return result
+
+    # Разбор файла и все этапы построения модели для его высот
+    def run_input(self, input_name, filename):
+        ext = os.path.splitext(filename)[1].lower()
+        is_image = ext not in ['.fdf', '.txt']
+        case = 'parse_image' if is_image else 'parse_fdf'
+
+        # Исходный парсер для этапов после разбора
+        source = FDFParser(use_cache=False)
+        with contextlib.redirect_stdout(io.StringIO()):
+            points, lines = source.parse_file(filename)
+        if points is None or lines is None:
+            print(f"Ошибка загрузки файла: {filename}")
+            return
+        count = len(points)
+
+        def parse(parser):
+            if is_image:
+                parser._parse_image(filename)
+            else:
+                parser._parse_fdf(filename)
+
+        self.run_case(case, input_name, count,
+                      lambda: FDFParser(use_cache=False), parse)
+
+        # Линии создаются при обращении: измеряется и создание массива
+        # индексов (без кеша топологий)
+        def create_lines(parser):
+            if parser.is_image:
+                parser.create_lines_optimized_for_image()
+            else:
+                parser.create_lines()
+            np.asarray(parser.lines)
+
+        def lines_setup():
+            GridTopology.clear_cache()
+            return loaded_parser(source)
+
+        self.run_case('create_lines', input_name, count, lines_setup,
+                      create_lines)
+        self.run_case('create_points', input_name, count,
+                      lambda: loaded_parser(source),
+                      lambda parser: parser.create_points())
+        self.run_case('normalize_points', input_name, count,
+                      lambda: source, lambda parser: parser.normalize_points())
+
+        # Все этапы после разбора файла (точки, линии, нормализация,
+        # пирамида): пик памяти на мегапиксель для оценки памяти загрузки
+        self.run_case('build_geometry', input_name, count,
+                      lambda: loaded_parser(source),
+                      lambda parser: parser._build_geometry())
+
+        renderer = gradient_renderer()
+        heights = points[:, 2]
+        self.run_case('_get_array_color_by_height', input_name, count,
+                      lambda: renderer,
+                      lambda r: r._get_array_color_by_height(
+                          heights, source.norm_min_z, source.norm_max_z))
+
+        self.run_case('build_grid', input_name, count, SimpleRenderer,
+                      lambda r: r.build_grid(points, source.width,
+                                             source.height, GRID_COLOR))
+
+        def build_wireframe(r):
+            r.build_wireframe(points, lines, source.norm_min_z,
+                              source.norm_max_z,
+                              renderer.get_color_by_height, source.colors,
+                              source.pyramid)
+            r.cleanup()
+
+        self.run_case('build_wireframe', input_name, count, SimpleRenderer,
+                      build_wireframe, gl=True)
+
+    # Синтетические карты: FDF и PNG каждого размера
+    def run_synthetic(self, sizes, data_dir):
+        idx = 0
+        while idx < len(sizes):
+            size = sizes[idx]
+            fdf_file = os.path.join(data_dir, f"synthetic_{size}.fdf")
+            png_file = os.path.join(data_dir, f"synthetic_{size}.png")
+
+            # Файлы создаются один раз (данные зависят только от размера)
+            if not os.path.exists(fdf_file) or \
+                    not os.path.exists(png_file):
+                heights = synthetic_heights(size, seed=size)
+                write_fdf(fdf_file, heights)
+                write_png(png_file, heights)
+                del heights
+
+            self.run_input(f"synthetic_{size}.fdf", fdf_file)
+            self.run_input(f"synthetic_{size}.png", png_file)
+            idx += 1
+
+    # Файлы из каталога примеров
+    def run_samples(self, sample_dir):
+        if not os.path.isdir(sample_dir):
+            print(f"Каталог примеров не найден: {sample_dir}")
+            return
+
+        names = sorted(os.listdir(sample_dir))
+        idx = 0
+        while idx < len(names):
+            ext = os.path.splitext(names[idx])[1].lower()
+            if ext in SUPPORTED_EXTENSIONS:
+                self.run_input(names[idx],
+                               os.path.join(sample_dir, names[idx]))
+            idx += 1
+
+    # Освобождение контекста OpenGL
+    def cleanup(self):
+        if self.context is not None:
+            self.context.delete()
+            self.context = None
+
+
+# Строка таблицы результатов
+def print_result(result):
+    name = f"{result['case']:<28} {result['input'][:28]:<28} " + \
+        f"{result['points']:>10}"
+    if result['skipped'] is not None:
+        print(f"{name} пропущено: {result['skipped']}")
+        return
+
+    print(f"{name} {result['best_s'] * 1000:>11.2f} " +
+          f"{result['mean_s'] * 1000:>11.2f} " +
+          f"{result['peak_bytes'] / (1024 * 1024):>9.1f} " +
+          f"{result['peak_bytes_per_mpx'] / (1024 * 1024):>9.1f}")
+
+
+# Версия кода (commit git) или None вне репозитория
+def git_revision():
+    try:
+        output = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'],
+                                cwd=os.path.dirname(os.path.abspath(
+                                    __file__)),
+                                capture_output=True, text=True, timeout=10)
+    except (OSError, subprocess.SubprocessError):
+        return None
+    if output.returncode != 0:
+        return None
+    return output.stdout.strip()
+
+
+# Описание окружения для сравнения запусков
+def environment_info():
+    return {
+        'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'git': git_revision(),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'platform': platform.platform(),
+        'processor': platform.processor(),
+        'cpu_count': os.cpu_count()
+    }
+
+
+# Сравнение с предыдущим запуском: отношение лучших времен
+def print_comparison(results, baseline_file):
+    try:
+        with open(baseline_file, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"Ошибка чтения {baseline_file}: {e}")
+        return
+
+    previous = {}
+    idx = 0
+    while idx < len(baseline['results']):
+        result = baseline['results'][idx]
+        previous[(result['case'], result['input'])] = result
+        idx += 1
+
+    print()
+    revision = baseline['environment']['git']
+    print(f"Сравнение с {baseline_file} (git {revision})")
+    print(f"{'Случай':<28} {'Вход':<28} {'Было, мс':>11} {'Стало, мс':>11} " +
+          f"{'Ускорение':>10}")
+    idx = 0
+    while idx < len(results):
+        result = results[idx]
+        old = previous.get((result['case'], result['input']))
+        idx += 1
+        if old is None or old['best_s'] is None or result['best_s'] is None:
+            continue
+
+        print(f"{result['case']:<28} {result['input'][:28]:<28} " +
+              f"{old['best_s'] * 1000:>11.2f} " +
+              f"{result['best_s'] * 1000:>11.2f} " +
+              f"{old['best_s'] / max(result['best_s'], 1e-12):>9.2f}x")
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(
+        description="Измерение времени и памяти парсера, градиента и " +
+        "построения модели")
+    arg_parser.add_argument('--sizes', type=int, nargs='*',
+                            default=DEFAULT_SIZES,
+                            help="стороны синтетических карт (от 10 до " +
+                            "8000; 8000 требует несколько ГБ памяти)")
+    arg_parser.add_argument('--no-samples', action='store_true',
+                            help="не измерять файлы из fdf_image_for_test")
+    arg_parser.add_argument('--sample-dir', default=SAMPLE_DIR,
+                            help="каталог с примерами файлов")
+    arg_parser.add_argument('--data-dir', default=None,
+                            help="каталог для синтетических файлов " +
+                            "(по умолчанию - временный)")
+    arg_parser.add_argument('--repeat', type=int, default=3,
+                            help="количество запусков каждого случая")
+    arg_parser.add_argument('--no-gl', action='store_true',
+                            help="пропустить случаи с OpenGL")
+    arg_parser.add_argument('--output', default=None,
+                            help="файл результатов (JSON)")
+    arg_parser.add_argument('--compare', default=None,
+                            help="результаты предыдущего запуска (JSON)")
+    args = arg_parser.parse_args()
+
+    suite = BenchmarkSuite(max(args.repeat, 1), not args.no_gl)
+    print(f"{'Случай':<28} {'Вход':<28} {'Точек':>10} {'Лучшее, мс':>11} " +
+          f"{'Среднее, мс':>11} {'Пик, МБ':>9} {'МБ/Мп':>9}")
+
+    try:
+        if args.sizes:
+            if args.data_dir is not None:
+                os.makedirs(args.data_dir, exist_ok=True)
+                suite.run_synthetic(args.sizes, args.data_dir)
+            else:
+                with tempfile.TemporaryDirectory() as tmp_dir:
+                    suite.run_synthetic(args.sizes, tmp_dir)
+
+        if not args.no_samples:
+            suite.run_samples(args.sample_dir)
+    finally:
+        suite.cleanup()
+
+    if args.output is not None:
+        data = {
+            'environment': environment_info(),
+            'arguments': vars(args),
+            'results': suite.results
+        }
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(data, f, indent=1, ensure_ascii=False)
+        print(f"Результаты записаны: {args.output}")
+
+    if args.compare is not None:
+        print_comparison(suite.results, args.compare)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,45 @@
+import numpy as np
+from PIL import Image
+
+# Стороны синтетических карт высот (от 10x10 до 8000x8000)
+SIZES = [10, 100, 1000, 4000, 8000]
+
+# Полосы строк при записи FDF (текст не хранится в памяти целиком)
+WRITE_ROWS = 256
+
+
+# Синтетическая карта высот size x size (float32, целые от -100 до 100):
+# холмы из синусоид и шум. Одинаковый seed - одинаковые данные
+def synthetic_heights(size, seed=0):
+    rng = np.random.default_rng(seed)
+    phases = rng.uniform(0.0, 2.0 * np.pi, 4).astype(np.float32)
+    coords = np.linspace(0.0, 6.0 * np.pi, size, dtype=np.float32)
+
+    heights = rng.standard_normal((size, size), dtype=np.float32)
+    heights *= 10.0
+    heights += (40.0 * np.sin(coords + phases[0]) +
+                20.0 * np.sin(3.0 * coords + phases[1]))[np.newaxis, :]
+    heights += (40.0 * np.cos(coords + phases[2]) +
+                20.0 * np.cos(2.0 * coords + phases[3]))[:, np.newaxis]
+
+    np.clip(heights, -100.0, 100.0, out=heights)
+    np.rint(heights, out=heights)
+    return heights
+
+
+# Запись карты высот в FDF файл (целые значения через пробел)
+def write_fdf(filename, heights):
+    with open(filename, 'w') as file:
+        row = 0
+        while row < len(heights):
+            block = heights[row:row + WRITE_ROWS].astype(np.int32)
+            np.savetxt(file, block, fmt='%d', delimiter=' ')
+            row += WRITE_ROWS
+
+
+# Запись карты высот в PNG в оттенках серого (темное - ниже, как при
+# чтении изображений в FDFParser)
+def write_png(filename, heights):
+    gray = np.empty(heights.shape, dtype=np.uint8)
+    np.subtract(155.0, heights, out=gray, casting='unsafe')
+    Image.fromarray(gray, mode='L').save(filename)
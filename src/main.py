@@ -1,36 +1,32 @@
+import argparse
 import pygame
 from OpenGL.GL import glLoadIdentity
 import sys
 import os
+import time
 import tkinter as tk
 from tkinter import filedialog
 
-from modules.file_parser import FDFParser
+from modules.file_parser import FDFParser, SUPPORTED_EXTENSIONS, \
+    MAX_IMAGE_POINTS
 from modules.camera import Camera
+from modules.export import HeadlessExporter
+from modules.loader import BackgroundLoader
+from modules.profiler import FrameProfiler
 from modules.renderer import Renderer
 
 
 # Загрузка файла
-def load_file(filename):
-    parser = FDFParser()
+def load_file(filename, max_image_points=MAX_IMAGE_POINTS):
+    parser = FDFParser(max_image_points=max_image_points)
     points, lines = parser.parse_file(filename)
 
     if points is None or lines is None:
         print(f"Ошибка загрузки файла: {filename}")
         return None, None, None
 
-    # Преобразование точек в список для совместимости
-    if hasattr(points, 'tolist'):
-        points_list = points.tolist()
-    else:
-        points_list = points
-
-    if hasattr(lines, 'tolist'):
-        lines_list = lines.tolist()
-    else:
-        lines_list = lines
-
-    return parser, points_list, lines_list
+    # Массивы NumPy передаются в рендерер без преобразования в списки
+    return parser, points, lines
 
 
 # Открытие диалога выбора файла
@@ -70,11 +66,114 @@ def find_test_file():
     return None
 
 
+# Разбор аргументов командной строки (окно и экспорт без окна)
+def parse_args(argv):
+    arg_parser = argparse.ArgumentParser(
+        prog="main.py",
+        description="Просмотр проволочной модели FDF файла или " +
+        "изображения; с --export - экспорт в PNG без окна")
+    arg_parser.add_argument('input', nargs='?', default=None,
+                            help="файл (для экспорта - файл или каталог " +
+                            "с файлами)")
+    arg_parser.add_argument('--export', default=None,
+                            help="PNG файл (или каталог для каталога)")
+    arg_parser.add_argument('--trace', default=None,
+                            help="файл трассировки кадров (.csv или " +
+                            ".json), записывается при выходе")
+    arg_parser.add_argument('--rot-x', type=float, default=None,
+                            help="вращение по X в градусах (экспорт)")
+    arg_parser.add_argument('--rot-y', type=float, default=None,
+                            help="вращение по Y в градусах (экспорт)")
+    arg_parser.add_argument('--zoom', type=float, default=None,
+                            help="масштаб камеры (экспорт)")
+    arg_parser.add_argument('--width', type=int, default=1200,
+                            help="ширина изображения (экспорт)")
+    arg_parser.add_argument('--height', type=int, default=800,
+                            help="высота изображения (экспорт)")
+    arg_parser.add_argument('--software', action='store_true',
+                            help="программная отрисовка без OpenGL " +
+                            "(экспорт)")
+    arg_parser.add_argument('--implicit-xy', action='store_true',
+                            help="хранить в видеопамяти только высоты " +
+                            "(X и Y вычисляются в шейдере)")
+    arg_parser.add_argument('--quantize-heights', action='store_true',
+                            help="высоты в uint16 (включает --implicit-xy)")
+    arg_parser.add_argument('--max-points', type=int,
+                            default=MAX_IMAGE_POINTS,
+                            help="предельное количество точек " +
+                            "изображения (больше - уменьшение)")
+    args = arg_parser.parse_args(argv)
+
+    if args.export is not None and args.input is None:
+        arg_parser.error("для --export нужен входной файл или каталог")
+    return arg_parser, args
+
+
+# Список пар (входной файл, PNG файл) для экспорта
+def collect_export_jobs(input_path, output_path):
+    if not os.path.isdir(input_path):
+        if os.path.isdir(output_path):
+            name = os.path.splitext(os.path.basename(input_path))[0]
+            output_path = os.path.join(output_path, name + '.png')
+        return [(input_path, output_path)]
+
+    # Все поддерживаемые файлы каталога
+    os.makedirs(output_path, exist_ok=True)
+    jobs = []
+    names = sorted(os.listdir(input_path))
+    i = 0
+    while i < len(names):
+        name, ext = os.path.splitext(names[i])
+        source = os.path.join(input_path, names[i])
+        if ext.lower() in SUPPORTED_EXTENSIONS and os.path.isfile(source):
+            jobs.append((source, os.path.join(output_path, name + '.png')))
+        i += 1
+    return jobs
+
+
+# Экспорт файлов в PNG без окна (один контекст на все файлы)
+def export_main(args):
+    if not os.path.exists(args.input):
+        print(f"Файл {args.input} не найден!")
+        return 1
+
+    jobs = collect_export_jobs(args.input, args.export)
+    if not jobs:
+        print(f"Нет поддерживаемых файлов в {args.input}")
+        return 1
+
+    exporter = HeadlessExporter(args.width, args.height,
+                                use_gl=not args.software,
+                                implicit_xy=args.implicit_xy,
+                                quantize_heights=args.quantize_heights,
+                                max_image_points=args.max_points)
+    exporter.set_view(args.rot_x, args.rot_y, args.zoom)
+
+    failed = 0
+    i = 0
+    while i < len(jobs):
+        if not exporter.export(jobs[i][0], jobs[i][1]):
+            failed += 1
+        i += 1
+    exporter.cleanup()
+
+    print(f"Экспортировано: {len(jobs) - failed} из {len(jobs)}")
+    return 1 if failed else 0
+
+
 # Основная функция
 def main():
+    arg_parser, args = parse_args(sys.argv[1:])
+
+    # Режим экспорта без окна
+    if args.export is not None:
+        sys.exit(export_main(args))
+
+    trace_file = args.trace
+
     # Проверка аргументов командной строки
-    if len(sys.argv) < 2:
-        print("Использование: python main.py [расположение файла]")
+    if args.input is None:
+        arg_parser.print_usage()
         print("Пример: python main.py test.fdf")
 
         # Попытка найти тестовый файл
@@ -87,7 +186,7 @@ def main():
                 print("Файл не выбран. Выход.")
                 sys.exit(1)
     else:
-        filename = sys.argv[1]
+        filename = args.input
 
     if not os.path.exists(filename):
         print(f"Файл {filename} не найден!")
@@ -100,13 +199,11 @@ def main():
 
     # Проверка расширения файла
     ext = os.path.splitext(filename)[1].lower()
-    supported_extensions = ['.fdf', '.txt', '.png', '.jpg', '.jpeg',
-                            '.bmp', '.tiff', '.tif', '.gif', '.psd']
 
     ext_found = False
     i = 0
-    while i < len(supported_extensions):
-        if ext == supported_extensions[i]:
+    while i < len(SUPPORTED_EXTENSIONS):
+        if ext == SUPPORTED_EXTENSIONS[i]:
             ext_found = True
             break
         i += 1
@@ -123,28 +220,37 @@ def main():
             sys.exit(1)
 
     # Загрузка файла
-    parser, points_list, lines_list = load_file(filename)
+    parser, points, lines = load_file(filename, args.max_points)
 
     if parser is None:
         print("Не удалось загрузить файл.")
         sys.exit(1)
 
     # Инициализация рендерера и камеры
-    renderer = Renderer()
+    renderer = Renderer(implicit_xy=args.implicit_xy,
+                        quantize_heights=args.quantize_heights)
     camera = Camera()
+    profiler = FrameProfiler()
+    if trace_file is not None:
+        profiler.start_trace()
 
     # Инициализация данных для модели
-    renderer.init_wireframe(points_list, lines_list,
+    start = time.perf_counter()
+    renderer.init_wireframe(points, lines,
                             parser.norm_min_z, parser.norm_max_z,
-                            parser.width, parser.height)
+                            parser.width, parser.height, parser.colors,
+                            parser.pyramid)
+    parser.timings['build_wireframe'] = time.perf_counter() - start
+    profiler.set_load_timings(os.path.basename(filename), parser.timings)
 
     # Загрузка шрифта для отображения информации
     pygame.font.init()
     font = pygame.font.SysFont('Arial', 16)
 
     clock = pygame.time.Clock()
+    loader = BackgroundLoader(args.max_points)
 
-    print(f"Загружено {len(points_list)} точек и {len(lines_list)} линий")
+    print(f"Загружено {len(points)} точек и {len(lines)} линий")
     print(f"Размер: {parser.width}x{parser.height}")
     print("Управление:")
     print("  ЛКМ + движение - вращение модели")
@@ -154,12 +260,16 @@ def main():
     print("  Градиенты: 1-по умолчанию, 2-земля/горы, 3-огонь, 4-лед/снег")
     print("  O - Открыть новый файл")
     print("  R - Сбросить вид камеры")
+    print("  T - Кеш текста вкл/выкл")
+    print("  P - Профиль кадра вкл/выкл")
 
     # Главный цикл
     running = True
     current_filename = os.path.basename(filename)
 
     while running:
+        profiler.begin_frame()
+
         # Обработка событий
         events = pygame.event.get()
         i = 0
@@ -172,33 +282,24 @@ def main():
                 if event.key == pygame.K_ESCAPE:
                     running = False
                 elif event.key == pygame.K_o:
-                    # Открытие нового файла
-                    new_filename = select_file_dialog()
-                    if new_filename and os.path.exists(new_filename):
-                        # Загрузка нового файла
-                        new_parser, new_points, new_lines = load_file(
-                            new_filename)
-                        if new_parser is not None:
-                            parser = new_parser
-                            points_list = new_points
-                            lines_list = new_lines
-                            current_filename = os.path.basename(new_filename)
-
-                            # Инициализация данных для новой модели
-                            renderer.init_wireframe(points_list, lines_list,
-                                                    parser.norm_min_z,
-                                                    parser.norm_max_z,
-                                                    parser.width,
-                                                    parser.height)
-
-                            print(f"Загружен файл: {current_filename}")
-                            print(f"  Точек: {len(points_list)}," +
-                                  f" Линий: {len(lines_list)}")
-                            print(f"  Размер: {parser.width}x{parser.height}")
+                    # Открытие нового файла (загрузка в фоне, текущая
+                    # модель остается на экране)
+                    if loader.is_loading():
+                        print("Загрузка предыдущего файла еще не завершена")
+                    else:
+                        new_filename = select_file_dialog()
+                        if new_filename and os.path.exists(new_filename):
+                            loader.start(new_filename)
                 elif event.key == pygame.K_r:
                     # Сброс камеры
                     camera.reset()
                     print("Вид камеры сброшен")
+                elif event.key == pygame.K_t:
+                    # Сравнение времени кадра с кешем текста и без него
+                    renderer.toggle_text_cache()
+                elif event.key == pygame.K_p:
+                    # Время этапов кадра на экране
+                    profiler.toggle()
                 elif event.key == pygame.K_1:
                     # Градиент по умолчанию
                     renderer.set_gradient([
@@ -242,6 +343,35 @@ def main():
                                 pygame.MOUSEMOTION]:
                 camera.handle_event(event)
             i += 1
+        profiler.mark('events')
+
+        # Замена модели, когда фоновая загрузка завершена
+        loaded = loader.take_result()
+        if loaded is not None:
+            new_parser, new_points, new_lines = loaded
+            if new_points is None or new_lines is None:
+                print(f"Ошибка загрузки файла: {loader.filename}")
+            else:
+                parser = new_parser
+                points = new_points
+                lines = new_lines
+                current_filename = os.path.basename(loader.filename)
+
+                # Инициализация данных для новой модели
+                start = time.perf_counter()
+                renderer.init_wireframe(points, lines,
+                                        parser.norm_min_z,
+                                        parser.norm_max_z,
+                                        parser.width, parser.height,
+                                        parser.colors, parser.pyramid)
+                parser.timings['build_wireframe'] = \
+                    time.perf_counter() - start
+                profiler.set_load_timings(current_filename, parser.timings)
+
+                print(f"Загружен файл: {current_filename}")
+                print(f"  Точек: {len(points)}, Линий: {len(lines)}")
+                print(f"  Размер: {parser.width}x{parser.height}")
+        profiler.mark('load')
 
         # Очистка экрана
         renderer.clear()
@@ -250,21 +380,42 @@ def main():
         glLoadIdentity()
         camera.apply_transformations()
 
+        # Выбор уровня детализации по масштабу камеры
+        renderer.update_lod(camera.get_distance())
+        profiler.mark('update_lod')
+
         # Отрисовка
         renderer.render_grid()
+        profiler.mark('render_grid')
         renderer.render_wireframe()
+        profiler.mark('render_wireframe')
         renderer.render_axes()
+        profiler.mark('render_axes')
 
         # Отображение информации
-        renderer.display_info(font, current_filename, len(points_list),
-                              len(lines_list),
+        renderer.display_info(font, current_filename, len(points),
+                              len(lines),
                               camera.rotation_x, camera.rotation_y,
-                              camera.zoom)
+                              camera.zoom, loader.get_progress(),
+                              clock.get_rawtime(),
+                              profiler.get_hud_lines())
+        profiler.mark('display_info')
+
+        # Вызовы отрисовки и вершины кадра (на экране - с прошлого кадра)
+        draw_calls, drawn_vertices = renderer.get_draw_stats()
+        profiler.set_counter('draw_calls', draw_calls)
+        profiler.set_counter('vertices', drawn_vertices)
 
         # Обновление экрана
         pygame.display.flip()
+        profiler.mark('flip')
+        profiler.end_frame()
         clock.tick(60)
 
+    # Запись трассировки кадров
+    if trace_file is not None:
+        profiler.dump(trace_file)
+
     # Очистка ресурсов
     renderer.cleanup()
     pygame.quit()
@@ -0,0 +1,223 @@
+import glob
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import resource_tracker, shared_memory
+import numpy as np
+from modules.file_parser import FDFParser, SUPPORTED_EXTENSIONS
+from modules.topology import GridTopology
+
+
+# Копирование массива в новый блок общей памяти.
+# Возвращает описание (имя блока, форма, тип) для передачи в процесс.
+# Блок удаляет основной процесс (SharedHeightmap.release); регистрация
+# блока в resource_tracker (общем с основным процессом) сохраняется,
+# чтобы блок был удален и при аварийном завершении основного процесса
+def _to_shared(array):
+    array = np.ascontiguousarray(array)
+    block = shared_memory.SharedMemory(create=True,
+                                       size=max(array.nbytes, 1))
+    view = np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf)
+    view[...] = array
+    del view
+
+    name = block.name
+    block.close()
+    return name, array.shape, array.dtype.str
+
+
+# Обработка одного файла в рабочем процессе: разбор, нормализация,
+# построение линий и запись кеша. Результаты - в общей памяти
+def preprocess_file(filename, cache_dir=None):
+    start = time.perf_counter()
+    parser = FDFParser(cache_dir=cache_dir)
+    points, lines = parser.parse_file(filename)
+    parse_time = time.perf_counter() - start
+
+    info = {
+        'filename': filename,
+        'source_bytes': os.path.getsize(filename),
+        'parse_time': parse_time,
+        'from_cache': parser.from_cache,
+        'error': None
+    }
+    if points is None or lines is None:
+        info['error'] = "не удалось загрузить файл"
+        return info
+
+    info['width'] = parser.width
+    info['height'] = parser.height
+    info['norm_min_z'] = float(parser.norm_min_z)
+    info['norm_max_z'] = float(parser.norm_max_z)
+    info['is_image'] = parser.is_image
+    info['points'] = _to_shared(points)
+
+    # Линии задаются размерами сетки и шагом (индексы не передаются)
+    info['lines'] = lines.key()
+    info['colors'] = None
+    if parser.colors is not None:
+        info['colors'] = _to_shared(parser.colors)
+    return info
+
+
+class SharedHeightmap:
+    # Результат обработки файла: массивы - представления общей памяти,
+    # созданной рабочим процессом (без копирования через pickle),
+    # линии - топология сетки (индексы создаются при обращении)
+    def __init__(self, info):
+        self.filename = info['filename']
+        self.source_bytes = info['source_bytes']
+        self.parse_time = info['parse_time']
+        self.from_cache = info['from_cache']
+        self.error = info['error']
+        self.blocks = []
+        self.points = None
+        self.lines = None
+        self.colors = None
+
+        if self.error is not None:
+            return
+
+        self.width = info['width']
+        self.height = info['height']
+        self.norm_min_z = info['norm_min_z']
+        self.norm_max_z = info['norm_max_z']
+        self.is_image = info['is_image']
+        self.points = self._attach(info['points'])
+        self.lines = GridTopology(*info['lines'])
+        if info['colors'] is not None:
+            self.colors = self._attach(info['colors'])
+
+    # Представление блока общей памяти как массива NumPy
+    def _attach(self, description):
+        name, shape, dtype = description
+        block = shared_memory.SharedMemory(name=name)
+        self.blocks.append(block)
+        return np.ndarray(shape, dtype=dtype, buffer=block.buf)
+
+    # Количество точек
+    def num_points(self):
+        return 0 if self.points is None else len(self.points)
+
+    # Освобождение общей памяти (массивы после этого недоступны)
+    def release(self):
+        self.points = None
+        self.lines = None
+        self.colors = None
+
+        idx = 0
+        while idx < len(self.blocks):
+            self.blocks[idx].close()
+            self.blocks[idx].unlink()
+            idx += 1
+        self.blocks = []
+
+
+# Раскрытие шаблонов и каталогов в список поддерживаемых файлов
+def expand_inputs(patterns):
+    files = []
+    idx = 0
+    while idx < len(patterns):
+        pattern = patterns[idx]
+        if os.path.isdir(pattern):
+            pattern = os.path.join(pattern, '*')
+
+        matches = sorted(glob.glob(pattern))
+        i = 0
+        while i < len(matches):
+            ext = os.path.splitext(matches[i])[1].lower()
+            if ext in SUPPORTED_EXTENSIONS and os.path.isfile(matches[i]):
+                files.append(matches[i])
+            i += 1
+        idx += 1
+    return files
+
+
+# Параллельная обработка файлов в пуле процессов.
+# Возвращает (результаты SharedHeightmap в порядке файлов, общее время)
+def preprocess_files(filenames, workers=None, cache_dir=None):
+    start = time.perf_counter()
+    results = []
+    completed = False
+
+    # Рабочие процессы используют resource_tracker основного процесса
+    # (иначе каждый запускает свой и удаляет блоки при завершении)
+    resource_tracker.ensure_running()
+
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = []
+            idx = 0
+            while idx < len(filenames):
+                futures.append(executor.submit(preprocess_file,
+                                               filenames[idx], cache_dir))
+                idx += 1
+
+            idx = 0
+            while idx < len(futures):
+                try:
+                    info = futures[idx].result()
+                except Exception as e:
+                    info = {
+                        'filename': filenames[idx],
+                        'source_bytes': 0,
+                        'parse_time': 0.0,
+                        'from_cache': False,
+                        'error': str(e)
+                    }
+                results.append(SharedHeightmap(info))
+                idx += 1
+        completed = True
+    finally:
+        # При ошибке или прерывании общая память полученных результатов
+        # освобождается здесь (остальные блоки удалит resource_tracker)
+        if not completed:
+            release_all(results)
+
+    return results, time.perf_counter() - start
+
+
+# Освобождение общей памяти всех результатов
+def release_all(results):
+    idx = 0
+    while idx < len(results):
+        results[idx].release()
+        idx += 1
+
+
+# Отчет: время и скорость обработки каждого файла и всего пакета
+def print_report(results, wall_time):
+    print(f"{'Файл':<32} {'МБ':>8} {'Точек':>10} {'Время, с':>9} " +
+          f"{'МБ/с':>8} {'Мточек/с':>9} {'Кеш':>4}")
+
+    total_bytes = 0
+    total_points = 0
+    failed = 0
+    idx = 0
+    while idx < len(results):
+        result = results[idx]
+        name = os.path.basename(result.filename)[:32]
+        megabytes = result.source_bytes / (1024 * 1024)
+        if result.error is not None:
+            print(f"{name:<32} {megabytes:>8.1f} ошибка: {result.error}")
+            failed += 1
+            idx += 1
+            continue
+
+        points = result.num_points()
+        seconds = max(result.parse_time, 1e-9)
+        cache_text = "да" if result.from_cache else "нет"
+        print(f"{name:<32} {megabytes:>8.1f} {points:>10} " +
+              f"{result.parse_time:>9.3f} {megabytes / seconds:>8.1f} " +
+              f"{points / seconds / 1e6:>9.2f} {cache_text:>4}")
+
+        total_bytes += result.source_bytes
+        total_points += points
+        idx += 1
+
+    total_megabytes = total_bytes / (1024 * 1024)
+    wall_time = max(wall_time, 1e-9)
+    print(f"Файлов: {len(results) - failed} из {len(results)}, " +
+          f"{total_megabytes:.1f} МБ, {total_points} точек за " +
+          f"{wall_time:.2f} с ({total_megabytes / wall_time:.1f} МБ/с, " +
+          f"{total_points / wall_time / 1e6:.2f} Мточек/с)")
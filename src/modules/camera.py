@@ -1,3 +1,5 @@
+import math
+import numpy as np
 from OpenGL.GL import glTranslatef, glRotatef
 import pygame
 
@@ -43,12 +45,38 @@ class Camera:
 
                 self.last_mouse_pos = (x, y)
 
+    # Расстояние от камеры до центра модели
+    def get_distance(self):
+        return 5.0 * self.zoom
+
     # Применение трансформаций камеры
     def apply_transformations(self):
-        glTranslatef(self.translation_x, self.translation_y, -5.0 * self.zoom)
+        glTranslatef(self.translation_x, self.translation_y,
+                     -self.get_distance())
         glRotatef(self.rotation_x, 1, 0, 0)
         glRotatef(self.rotation_y, 0, 1, 0)
 
+    # Матрица вида (4x4, по строкам) - те же преобразования, что и в
+    # apply_transformations, для отрисовки без OpenGL
+    def get_view_matrix(self):
+        translation = np.identity(4)
+        translation[:3, 3] = (self.translation_x, self.translation_y,
+                              -self.get_distance())
+
+        angle = math.radians(self.rotation_x)
+        rotation_x = np.identity(4)
+        rotation_x[1:3, 1:3] = [[math.cos(angle), -math.sin(angle)],
+                                [math.sin(angle), math.cos(angle)]]
+
+        angle = math.radians(self.rotation_y)
+        rotation_y = np.identity(4)
+        rotation_y[0, 0] = math.cos(angle)
+        rotation_y[0, 2] = math.sin(angle)
+        rotation_y[2, 0] = -math.sin(angle)
+        rotation_y[2, 2] = math.cos(angle)
+
+        return translation @ rotation_x @ rotation_y
+
     # Сброс камеры к начальным значениям
     def reset(self):
         self.rotation_x = 30.0
@@ -0,0 +1,31 @@
+import numpy as np
+
+
+class Colormap:
+    # Инициализация градиента
+    def __init__(self, colors, positions):
+        self.colors = np.asarray(colors, dtype=np.float32).reshape(-1, 3)
+        self.positions = np.asarray(positions, dtype=np.float32)
+
+    # Получение цветов для массива высот за один проход
+    def map_heights(self, z_array, min_z, max_z):
+        z_array = np.asarray(z_array, dtype=np.float32).ravel()
+        colors = np.empty((len(z_array), 3), dtype=np.float32)
+
+        if max_z == min_z:
+            # Все точки на одной высоте - первый цвет градиента
+            colors[:] = self.colors[0]
+            return colors
+
+        # Нормализация высот
+        normalized = (z_array - np.float32(min_z)) / np.float32(max_z - min_z)
+
+        # Линейная интерполяция каждого канала между точками градиента
+        # (значения вне диапазона получают крайние цвета)
+        channel = 0
+        while channel < 3:
+            colors[:, channel] = np.interp(normalized, self.positions,
+                                           self.colors[:, channel])
+            channel += 1
+
+        return colors
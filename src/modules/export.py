@@ -0,0 +1,164 @@
+import math
+import pygame
+from PIL import Image
+from OpenGL.GL import glEnable, glClearColor, glClear, glMatrixMode, \
+    glLoadIdentity, glGetFloatv, glFinish, GL_DEPTH_TEST, GL_PROJECTION, \
+    GL_MODELVIEW, GL_COLOR_BUFFER_BIT, GL_DEPTH_BUFFER_BIT, \
+    GL_PROJECTION_MATRIX, GL_MODELVIEW_MATRIX
+from OpenGL.GLU import gluPerspective
+from OpenGL.error import GLError, NullFunctionError
+from modules.camera import Camera
+from modules.colormap import Colormap
+from modules.file_parser import FDFParser, MAX_IMAGE_POINTS
+from modules.graphics import SimpleRenderer, MAX_CELL_PIXELS
+from modules.offscreen import OffscreenContext
+from modules.rasterizer import SoftwareRasterizer, perspective_matrix
+from modules.renderer import BACKGROUND_COLOR, FIELD_OF_VIEW, NEAR_PLANE, \
+    FAR_PLANE, DEFAULT_GRADIENT_COLORS, DEFAULT_GRADIENT_POSITIONS
+from modules.terrain import Frustum
+
+# Бюджет вершин уровня детализации при программной отрисовке
+MAX_SOFTWARE_VERTICES = 1 << 21
+
+
+class HeadlessExporter:
+    # Отрисовка в буфер кадра OpenGL без окна; если контекст создать
+    # нельзя (или use_gl=False) - программная отрисовка на NumPy.
+    # implicit_xy и quantize_heights - хранение тайлов без X и Y,
+    # max_image_points - предельное количество точек изображения
+    def __init__(self, width=1200, height=800, use_gl=True,
+                 implicit_xy=False, quantize_heights=False,
+                 max_image_points=MAX_IMAGE_POINTS):
+        self.width = width
+        self.height = height
+        self.max_image_points = max_image_points
+        self.camera = Camera()
+        self.colormap = Colormap(DEFAULT_GRADIENT_COLORS,
+                                 DEFAULT_GRADIENT_POSITIONS)
+        self.context = None
+        self.renderer = None
+        self.rasterizer = SoftwareRasterizer(width, height, BACKGROUND_COLOR)
+
+        if use_gl:
+            try:
+                self.context = OffscreenContext(width, height)
+                self.renderer = SimpleRenderer(
+                    implicit_xy=implicit_xy,
+                    quantize_heights=quantize_heights)
+            except (GLError, NullFunctionError, RuntimeError, ImportError,
+                    OSError, pygame.error) as e:
+                print("OpenGL без окна недоступен, " +
+                      f"программная отрисовка: {e}")
+                self.context = None
+
+    # Положение камеры (None - значение по умолчанию)
+    def set_view(self, rotation_x=None, rotation_y=None, zoom=None):
+        self.camera.reset()
+        if rotation_x is not None:
+            self.camera.rotation_x = rotation_x
+        if rotation_y is not None:
+            self.camera.rotation_y = rotation_y
+        if zoom is not None:
+            self.camera.zoom = zoom
+
+    # Загрузка файла, отрисовка и запись PNG
+    def export(self, filename, output):
+        parser = FDFParser(max_image_points=self.max_image_points)
+        points, lines = parser.parse_file(filename)
+        if points is None or lines is None:
+            print(f"Ошибка загрузки файла: {filename}")
+            return False
+
+        image = None
+        if self.context is not None:
+            try:
+                image = self._render_gl(parser, points, lines)
+            except (GLError, NullFunctionError) as e:
+                # Например, нехватка видеопамяти на большой карте: файл
+                # отрисовывается программно, остальные - снова в OpenGL
+                print(f"Ошибка отрисовки OpenGL ({filename}), " +
+                      f"программная отрисовка: {e}")
+        if image is None:
+            image = self._render_software(parser, points, lines)
+
+        try:
+            Image.fromarray(image).save(output)
+        except (OSError, ValueError) as e:
+            print(f"Не удалось сохранить {output}: {e}")
+            return False
+
+        print(f"Сохранено: {output}")
+        return True
+
+    # Размер в пикселях единицы длины на расстоянии 1
+    def _pixel_scale(self):
+        return self.height / (2.0 * math.tan(math.radians(
+            FIELD_OF_VIEW / 2)))
+
+    # Отрисовка тем же кодом, что и в окне, в буфер кадра
+    def _render_gl(self, parser, points, lines):
+        renderer = self.renderer
+        renderer.set_image_mode(parser.is_image)
+        renderer.build_wireframe(points, lines, parser.norm_min_z,
+                                 parser.norm_max_z, self.colormap.map_heights,
+                                 parser.colors, parser.pyramid)
+        renderer.set_gradient(DEFAULT_GRADIENT_COLORS,
+                              DEFAULT_GRADIENT_POSITIONS)
+
+        self.context.bind()
+        glEnable(GL_DEPTH_TEST)
+        glClearColor(*BACKGROUND_COLOR)
+        glClear(GL_COLOR_BUFFER_BIT | GL_DEPTH_BUFFER_BIT)
+
+        glMatrixMode(GL_PROJECTION)
+        glLoadIdentity()
+        gluPerspective(FIELD_OF_VIEW, self.width / float(self.height),
+                       NEAR_PLANE, FAR_PLANE)
+        glMatrixMode(GL_MODELVIEW)
+        glLoadIdentity()
+        self.camera.apply_transformations()
+
+        pixel_scale = self._pixel_scale()
+        frustum = Frustum(glGetFloatv(GL_PROJECTION_MATRIX),
+                          glGetFloatv(GL_MODELVIEW_MATRIX))
+        renderer.update_lod(pixel_scale / self.camera.get_distance(),
+                            frustum, pixel_scale)
+        renderer.render_wireframe()
+        glFinish()
+
+        return self.context.read_pixels()
+
+    # Программная отрисовка уровня детализации по масштабу камеры
+    def _render_software(self, parser, points, lines):
+        pyramid = parser.pyramid
+        vertex_colors = parser.colors
+        if pyramid is not None:
+            level = pyramid.select_level(
+                self._pixel_scale() / self.camera.get_distance(),
+                MAX_CELL_PIXELS, MAX_SOFTWARE_VERTICES)
+            points = pyramid.level_points(level)
+            lines = pyramid.level_lines(level)
+            vertex_colors = pyramid.level_colors(level)
+
+        # Цвета из файла имеют приоритет над градиентом, как в окне
+        if vertex_colors is not None:
+            colors = SimpleRenderer.unpack_colors(vertex_colors)
+        else:
+            colors = self.colormap.map_heights(points[:, 2],
+                                               parser.norm_min_z,
+                                               parser.norm_max_z)
+
+        projection = perspective_matrix(FIELD_OF_VIEW,
+                                        self.width / float(self.height),
+                                        NEAR_PLANE, FAR_PLANE)
+        return self.rasterizer.render(points, lines, colors, projection,
+                                      self.camera.get_view_matrix())
+
+    # Освобождение ресурсов OpenGL
+    def cleanup(self):
+        if self.renderer is not None:
+            self.renderer.cleanup()
+            self.renderer = None
+        if self.context is not None:
+            self.context.delete()
+            self.context = None
@@ -0,0 +1,254 @@
+import os
+import numpy as np
+
+# Размер блока чтения файла
+CHUNK_SIZE = 16 * 1024 * 1024
+
+# Коды символов
+MINUS = ord('-')
+PLUS = ord('+')
+NEWLINE = ord('\n')
+COMMA = ord(',')
+SPACE = ord(' ')
+
+# Наибольшее количество цифр, накапливаемых в int64 (числа длиннее
+# разбираются через float, как в прежнем парсере)
+MAX_SCAN_DIGITS = 18
+
+# Цвет точки без суффикса ",0xRRGGBB"
+DEFAULT_COLOR = 0xFFFFFF
+
+# Допустимые символы: цифры, знаки и пробельные символы
+ALLOWED_BYTES = np.zeros(256, dtype=bool)
+ALLOWED_BYTES[ord('0'):ord('9') + 1] = True
+ALLOWED_BYTES[[MINUS, PLUS]] = True
+ALLOWED_BYTES[[ord(' '), ord('\t'), ord('\n'), ord('\r'), 0x0b, 0x0c]] = True
+
+# Пробельные символы, после которых может стоять знак числа
+SPACE_BYTES = np.zeros(256, dtype=bool)
+SPACE_BYTES[[ord(' '), ord('\t'), ord('\n'), ord('\r'), 0x0b, 0x0c]] = True
+
+
+class FDFReader:
+    # Инициализация значений
+    def __init__(self, chunk_size=CHUNK_SIZE):
+        self.chunk_size = chunk_size
+        self.width = 0
+        self.height = 0
+        self.grid = None
+        self.colors = None
+        self.row_capacity = 0
+
+    # Потоковое чтение FDF файла в массив высот float32 (height, width).
+    # progress(fraction) вызывается после каждого блока
+    def read(self, filename, progress=None):
+        file_size = os.path.getsize(filename)
+        self.width = 0
+        self.height = 0
+        self.grid = None
+        self.colors = None
+        self.row_capacity = 0
+
+        with open(filename, 'rb') as file:
+            remainder = b''
+            bytes_read = 0
+            while True:
+                block = file.read(self.chunk_size)
+                if not block:
+                    break
+                bytes_read += len(block)
+
+                # Блок обрезается по последнему переводу строки,
+                # чтобы число не разделилось между блоками
+                data = remainder + block
+                cut = data.rfind(b'\n') + 1
+                if cut == 0:
+                    remainder = data
+                    continue
+                remainder = data[cut:]
+                self._consume(data[:cut], file_size)
+
+                if progress is not None:
+                    progress(bytes_read / max(file_size, 1))
+
+            if remainder.strip():
+                self._consume(remainder + b'\n', file_size)
+
+        if self.grid is None:
+            return None
+
+        if self.colors is not None:
+            self.colors = self.colors[:self.height]
+        return self.grid[:self.height]
+
+    # Разбор блока целых строк и запись в сетку
+    def _consume(self, chunk, file_size):
+        arr = np.frombuffer(chunk, dtype=np.uint8)
+
+        # Цветовые суффиксы есть только в блоках с запятыми
+        color_info = None
+        if b',' in chunk:
+            arr, color_info = self._strip_colors(arr)
+
+        if not ALLOWED_BYTES[arr].all():
+            bad = chr(arr[np.argmin(ALLOWED_BYTES[arr])])
+            raise ValueError(f"Недопустимый символ в FDF файле: {bad!r}")
+
+        values, ends = self._scan_integers(arr)
+
+        # Количество чисел в каждой непустой строке
+        newlines = np.flatnonzero(arr == NEWLINE)
+        per_row = np.diff(np.searchsorted(ends, newlines), prepend=0)
+        per_row = per_row[per_row > 0]
+        if len(per_row) == 0:
+            return
+
+        if self.width == 0:
+            self.width = int(per_row[0])
+            # Оценка количества строк по размеру первого блока
+            bytes_per_row = len(chunk) / len(per_row)
+            self._reserve_rows(int(file_size / bytes_per_row * 1.05) + 1)
+
+        if np.any(per_row != self.width):
+            raise ValueError("Строки FDF файла имеют разную длину")
+
+        rows = len(per_row)
+        if self.height + rows > self.row_capacity:
+            self._reserve_rows(max(self.height + rows,
+                                   int(self.row_capacity * 1.5)))
+
+        self.grid[self.height:self.height + rows] = \
+            values.reshape(rows, self.width)
+
+        if color_info is not None:
+            self._store_colors(chunk, ends, color_info, rows)
+        elif self.colors is not None:
+            self.colors[self.height:self.height + rows] = DEFAULT_COLOR
+        self.height += rows
+
+    # Выделение памяти под сетку с сохранением прочитанных строк
+    def _reserve_rows(self, rows):
+        grid = np.empty((rows, self.width), dtype=np.float32)
+        if self.grid is not None:
+            grid[:self.height] = self.grid[:self.height]
+        self.grid = grid
+
+        if self.colors is not None:
+            colors = np.empty((rows, self.width), dtype=np.uint32)
+            colors[:self.height] = self.colors[:self.height]
+            self.colors = colors
+
+        self.row_capacity = rows
+
+    # Замена суффиксов ",0xRRGGBB" пробелами для разбора высот
+    @staticmethod
+    def _strip_colors(arr):
+        commas = np.flatnonzero(arr == COMMA)
+        spaces = np.flatnonzero(SPACE_BYTES[arr])
+
+        # Суффикс продолжается до ближайшего пробельного символа
+        color_ends = spaces[np.minimum(np.searchsorted(spaces, commas),
+                                       len(spaces) - 1)]
+        color_ends = np.where(color_ends > commas, color_ends, len(arr))
+
+        delta = np.zeros(len(arr) + 1, dtype=np.int32)
+        np.add.at(delta, commas, 1)
+        np.add.at(delta, color_ends, -1)
+        in_color = np.cumsum(delta[:-1]) > 0
+
+        stripped = np.where(in_color, np.uint8(SPACE), arr)
+        return stripped, (commas, color_ends)
+
+    # Разбор цветов и запись в массив цветов
+    def _store_colors(self, chunk, ends, color_info, rows):
+        commas, color_ends = color_info
+
+        # Массив цветов создается при первом цветном блоке
+        if self.colors is None:
+            self.colors = np.full((self.row_capacity, self.width),
+                                  DEFAULT_COLOR, dtype=np.uint32)
+
+        # Число, к которому относится суффикс, заканчивается перед запятой
+        token_idx = np.searchsorted(ends, commas) - 1
+        if np.any(token_idx < 0) or np.any(ends[token_idx] != commas - 1):
+            raise ValueError("Цвет без высоты в FDF файле")
+
+        block_colors = np.full(rows * self.width, DEFAULT_COLOR,
+                               dtype=np.uint32)
+        i = 0
+        while i < len(commas):
+            text = chunk[commas[i] + 1:color_ends[i]]
+            block_colors[token_idx[i]] = int(text, 16) & 0xFFFFFF
+            i += 1
+
+        self.colors[self.height:self.height + rows] = \
+            block_colors.reshape(rows, self.width)
+
+    # Векторное преобразование десятичных целых чисел из байтов
+    @staticmethod
+    def _scan_integers(arr):
+        digits = arr - np.uint8(ord('0'))
+        is_digit = digits < 10
+
+        # Последняя цифра каждого числа
+        next_is_digit = np.zeros_like(is_digit)
+        next_is_digit[:-1] = is_digit[1:]
+        ends = np.flatnonzero(is_digit & ~next_is_digit)
+
+        # Накопление разрядов справа налево только для длинных чисел
+        values = digits[ends].astype(np.int64)
+        starts = ends.copy()
+        live = np.flatnonzero(starts > 0)
+        scale = 1
+        scanned = 1
+        while len(live) > 0 and scanned < MAX_SCAN_DIGITS:
+            prev = starts[live] - 1
+            prev_digits = digits[prev]
+            keep = prev_digits < 10
+            live = live[keep]
+            prev = prev[keep]
+            if len(live) == 0:
+                break
+
+            scale *= 10
+            values[live] += prev_digits[keep].astype(np.int64) * scale
+            starts[live] = prev
+            live = live[prev > 0]
+            scanned += 1
+
+        # Числа длиннее MAX_SCAN_DIGITS цифр: начало ищется дальше
+        long_tokens = []
+        if len(live) > 0:
+            long_tokens = live[digits[starts[live] - 1] < 10]
+        i = 0
+        while i < len(long_tokens):
+            token = long_tokens[i]
+            while starts[token] > 0 and digits[starts[token] - 1] < 10:
+                starts[token] -= 1
+            i += 1
+
+        # Проверка знаков: знак стоит перед цифрой и после пробела
+        signs = np.flatnonzero((arr == MINUS) | (arr == PLUS))
+        if len(signs) > 0:
+            after = np.minimum(signs + 1, len(arr) - 1)
+            valid = (signs + 1 < len(arr)) & is_digit[after]
+            valid &= (signs == 0) | SPACE_BYTES[arr[signs - 1]]
+            if not valid.all():
+                raise ValueError("Некорректное число в FDF файле")
+
+            # Отрицательные числа
+            sign_pos = starts - 1
+            negative = np.flatnonzero(arr[np.maximum(sign_pos, 0)] == MINUS)
+            negative = negative[sign_pos[negative] >= 0]
+            values[negative] = -values[negative]
+
+        result = values.astype(np.float32)
+        i = 0
+        while i < len(long_tokens):
+            token = long_tokens[i]
+            start = starts[token]
+            if start > 0 and arr[start - 1] in (MINUS, PLUS):
+                start -= 1
+            result[token] = float(arr[start:ends[token] + 1].tobytes())
+            i += 1
+        return result, ends
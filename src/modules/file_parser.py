@@ -1,10 +1,33 @@
+import time
 import numpy as np
 from PIL import Image
+from modules.fdf_reader import FDFReader
+from modules.heightmap_cache import HeightmapCache
+from modules.lod import HeightPyramid
+from modules.topology import GridTopology
+
+# Предельное количество точек изображения (больше - уменьшение)
+MAX_IMAGE_POINTS = 4096 * 4096
+
+# Исходных точек изображения в одной полосе при чтении (ограничивает
+# память на преобразование в оттенки серого и уменьшение; само исходное
+# изображение декодируется целиком)
+IMAGE_BAND_PIXELS = 4 * 1024 * 1024
+
+# Режимы изображений, которые можно уменьшить усреднением блоков
+# (Image.reduce); палитровые и 16-битные уменьшаются только фильтром
+REDUCE_MODES = ('L', 'LA', 'RGB', 'RGBA', 'I', 'F', 'CMYK', 'YCbCr')
+
+# Поддерживаемые расширения файлов
+SUPPORTED_EXTENSIONS = ['.fdf', '.txt', '.png', '.jpg', '.jpeg', '.bmp',
+                        '.tiff', '.tif', '.gif', '.psd']
 
 
 class FDFParser:
-    # Инициализация значений
-    def __init__(self):
+    # Инициализация значений. max_image_points - предельное количество
+    # точек изображения (больше - уменьшение при загрузке)
+    def __init__(self, use_cache=True, cache_dir=None,
+                 max_image_points=MAX_IMAGE_POINTS):
         self.points = None
         self.lines = []
         self.width = 0
@@ -14,12 +37,36 @@ class FDFParser:
         self.norm_min_z = 0
         self.norm_max_z = 0
         self.data_array = None
+        self.colors = None
         self.is_image = False
+        self.from_cache = False
+        self.pyramid = None
+        self.scale_factor = 1.0
+        self.z_offset = 0.0
+        self.z_scale = 1.0
+        self.cache = HeightmapCache(cache_dir) if use_cache else None
+        self.max_image_points = max_image_points
+
+        # Ход загрузки (читается из другого потока при фоновой загрузке)
+        self.stage = ""
+        self.progress = 0.0
+
+        # Время этапов загрузки (секунды)
+        self.timings = {}
+        self.timing_mark = 0.0
 
     # Функция парсинга файлов
     def parse_file(self, filename):
         # Определение типа файла по расширению
         ext = self._get_file_extension(filename)
+        self._set_progress("Чтение файла", 0.0)
+        self.timings = {}
+        self.timing_mark = time.perf_counter()
+
+        # Быстрое открытие из бинарного кеша
+        self.from_cache = self._load_cache(filename)
+        if self.from_cache:
+            return self._build_geometry()
 
         # Проверка поддержки формата
         if ext in ['.fdf', '.txt']:
@@ -29,6 +76,89 @@ class FDFParser:
             self.is_image = True
             return self._parse_image(filename)
 
+    # Загрузка высот из кеша (через np.memmap)
+    def _load_cache(self, filename):
+        if self.cache is None:
+            return False
+
+        cached = self.cache.load(filename)
+        if cached is None:
+            return False
+
+        # Изображение в кеше могло быть уменьшено с другим пределом точек
+        if cached[4] and not self._image_cache_fits(filename,
+                                                    cached[0].shape):
+            return False
+
+        self.data_array, self.colors, self.min_z, self.max_z, \
+            self.is_image = cached
+        self.height, self.width = self.data_array.shape
+        print(f"Загружено из кеша: {self.cache.cache_path(filename)}")
+        return True
+
+    # Совпадает ли размер высот из кеша с размером, до которого
+    # уменьшается изображение при текущем пределе точек
+    def _image_cache_fits(self, filename, shape):
+        try:
+            with Image.open(filename) as img:
+                width, height = self._image_size(img.size[0], img.size[1])
+        except (OSError, ValueError):
+            return False
+        return shape == (height, width)
+
+    # Сохранение прочитанных высот в кеш
+    def _save_cache(self, filename):
+        if self.cache is None:
+            return
+
+        self.cache.save(filename, self.data_array, self.colors,
+                        self.min_z, self.max_z, self.is_image)
+
+    # Построение точек, линий и нормализация
+    def _build_geometry(self):
+        self._mark_timing('parse')
+
+        # 3D точки
+        self._set_progress("Построение точек", 0.5)
+        self.create_points()
+
+        # Линии каркаса (для изображений - оптимизированные)
+        self._set_progress("Построение линий", 0.6)
+        if self.is_image:
+            self.create_lines_optimized_for_image()
+        else:
+            self.create_lines()
+        self._mark_timing('geometry')
+
+        self._set_progress("Нормализация", 0.7)
+        points, lines = self.normalize_points()
+        self._mark_timing('normalize')
+
+        # Пирамида уровней детализации для рендерера
+        self._set_progress("Уровни детализации", 0.85)
+        self.pyramid = HeightPyramid(self.data_array, self.scale_factor,
+                                     self.z_offset, self.z_scale, self.colors)
+        print(f"Уровней детализации: {self.pyramid.level_count()}")
+        self._mark_timing('pyramid')
+
+        self._set_progress("Готово", 1.0)
+        return points, lines
+
+    # Текущий этап и доля выполненной работы (от 0.0 до 1.0)
+    def _set_progress(self, stage, progress):
+        self.stage = stage
+        self.progress = progress
+
+    # Время этапа загрузки с предыдущей отметки
+    def _mark_timing(self, stage):
+        now = time.perf_counter()
+        self.timings[stage] = now - self.timing_mark
+        self.timing_mark = now
+
+    # Ход чтения FDF файла (первая половина загрузки)
+    def _read_progress(self, fraction):
+        self._set_progress("Чтение файла", 0.5 * fraction)
+
     # Получение расширения файла
     def _get_file_extension(self, filename):
         dot_pos = len(filename) - 1
@@ -41,223 +171,237 @@ class FDFParser:
 
     # Парсинг FDF файла
     def _parse_fdf(self, filename):
-        # Чтение файла
-        with open(filename, 'r') as file:
-            lines = file.readlines()
-
-        self.height = len(lines)
-        data_rows = []
-
-        # Парсинг строк
-        i = 0
-        while i < len(lines):
-            values = lines[i].strip().split()
-            if values:
-                # Преобразование строк в числа
-                row = list(map(int, values))
-                data_rows.append(row)
-            i += 1
-
-        if not data_rows:
-            return None, []
-
-        # Преобразование в массив
-        self.data_array = np.array(data_rows, dtype=np.float32)
-        self.width = self.data_array.shape[1]
-        self.height = self.data_array.shape[0]
+        # Потоковое чтение файла блоками прямо в массив float32
+        reader = FDFReader()
+        try:
+            self.data_array = reader.read(filename, self._read_progress)
+        except ValueError as e:
+            print(f"Ошибка чтения FDF файла: {e}")
+            return None, None
+
+        if self.data_array is None:
+            return None, None
+
+        self.height, self.width = self.data_array.shape
+
+        # Цвета точек из суффиксов ",0xRRGGBB" (None, если их нет)
+        self.colors = reader.colors
 
         # min и max значения Z с использованием NumPy
         self.min_z = np.min(self.data_array)
         self.max_z = np.max(self.data_array)
 
-        # 3D точки
-        self.create_points()
-
-        # Линии каркаса
-        self.create_lines()
+        self._save_cache(filename)
+        return self._build_geometry()
 
-        return self.normalize_points()
-
-    # Парсинг изображения с сохранением распределения
+    # Парсинг изображения с сохранением распределения. Исходное
+    # изображение декодируется целиком (после draft/reduce) при первом
+    # обращении к пикселям; полосами строк выполняются преобразование в
+    # оттенки серого, уменьшение и запись высот сразу в файл кеша
+    # (np.memmap), min/max вычисляются по полосам - полноразмерных копий
+    # в оттенках серого и float32 нет. Массив точек (N, 3) float32
+    # создается в _build_geometry целиком
     def _parse_image(self, filename):
-        # Загрузка изображения
+        heights = None
         try:
             img = Image.open(filename)
-
-            # Конвертация различных форматов изображений
-            if img.mode == 'P':
-                # Для палитровых изображений конвертируем в RGBA
-                img = img.convert('RGBA')
-                img = img.convert('L')
-            elif img.mode in ['RGBA', 'LA']:
-                # Для изображений с альфа-каналом конвертируем в L
-                img = img.convert('RGBA')
-                background = Image.new('RGBA', img.size, (255, 255, 255, 255))
-                img = Image.alpha_composite(background, img)
-                img = img.convert('L')
-            elif img.mode != 'L':
-                # Для RGB и других форматов конвертируем в оттенки серого
-                img = img.convert('L')
-
             original_width, original_height = img.size
 
-            # Конвертация в массив numpy
-            img_array = np.array(img, dtype=np.float32)
+            self.width, self.height = self._image_size(original_width,
+                                                       original_height)
 
-            # Инвертирование значений (чтобы темные области были ниже)
-            original_data = 255.0 - img_array
-
-            # Расчет оптимального размера для дискретизации
-            target_points = 5000  # Целевое количество точек
-
-            # Вычисление коэффициента масштабирования
-            total_pixels = original_width * original_height
-            if total_pixels > target_points:
-                scale_factor = np.sqrt(target_points / total_pixels)
-                new_width = int(original_width * scale_factor)
-                new_height = int(original_height * scale_factor)
-
-                """
-                Использование билинейной интерполяции для сохранения
-                распределения
-                """
-                img_resized = img.resize((new_width, new_height),
-                                         Image.BILINEAR)
-                img_array_resized = np.array(img_resized, dtype=np.float32)
-                self.data_array = 255.0 - img_array_resized
-                self.width = new_width
-                self.height = new_height
-            else:
-                self.data_array = original_data
-                self.width = original_width
-                self.height = original_height
+            # Уменьшение при декодировании (до размера не меньше
+            # итогового), окончательное - фильтром по полосам
+            img = self._decode_reduced(img)
+            if img.size != (original_width, original_height):
+                print("Декодирование с уменьшением: " +
+                      f"{img.size[0]}x{img.size[1]}")
 
-            # Нормализация значений высоты
-            self.min_z = np.min(self.data_array)
-            self.max_z = np.max(self.data_array)
+            heights = self._create_image_heights(filename)
+            self.min_z, self.max_z = self._read_image_bands(img, heights)
+            self.data_array = heights
 
-            print("Изображение оптимизировано: " +
+            print("Изображение загружено: " +
                   f"{original_width}x{original_height} -> " +
                   f"{self.width}x{self.height}")
             print(f"Количество точек: {self.width * self.height}")
             print(f"Диапазон высот: {self.min_z:.1f} - {self.max_z:.1f}")
 
-            # 3D точки
-            self.create_points()
-
-            # Линии каркаса (оптимизированные)
-            self.create_lines_optimized_for_image()
-
-            return self.normalize_points()
+            # Высоты уже записаны в файл кеша (или кеш недоступен)
+            if isinstance(heights, np.memmap):
+                self.cache.commit(filename, heights, self.min_z, self.max_z)
+            return self._build_geometry()
 
         except Exception as e:
+            if isinstance(heights, np.memmap):
+                self.cache.discard(filename)
             print(f"Ошибка загрузки изображения: {e}")
-            return None, []
+            return None, None
+
+    # Размер карты высот для изображения width x height. Изображение
+    # используется в полном разрешении (уровни детализации строятся в
+    # HeightPyramid); уменьшаются только изображения больше
+    # max_image_points (с сохранением пропорций)
+    def _image_size(self, width, height):
+        total_pixels = width * height
+        if total_pixels <= self.max_image_points:
+            return width, height
+
+        scale_factor = np.sqrt(self.max_image_points / total_pixels)
+        return max(1, int(width * scale_factor)), \
+            max(1, int(height * scale_factor))
+
+    # Уменьшение изображения до декодирования в полном разрешении: для
+    # JPEG - масштаб декодера в области DCT (draft: 1/2, 1/4 или 1/8),
+    # затем усреднение блоков Image.reduce с целым коэффициентом.
+    # Результат не меньше self.width x self.height
+    def _decode_reduced(self, img):
+        if img.size == (self.width, self.height):
+            return img
+
+        if img.format == 'JPEG':
+            img.draft(img.mode, (self.width, self.height))
+
+        factor = int(min(img.size[0] / self.width,
+                         img.size[1] / self.height))
+        if factor >= 2 and img.mode in REDUCE_MODES:
+            img = img.reduce(factor)
+        return img
+
+    # Массив высот изображения: np.memmap во временном файле кеша или
+    # массив в памяти (без кеша)
+    def _create_image_heights(self, filename):
+        if self.cache is not None:
+            heights = self.cache.create(filename, self.width, self.height,
+                                        True)
+            if heights is not None:
+                return heights
+        return np.empty((self.height, self.width), dtype=np.float32)
+
+    # Запись высот изображения в heights полосами строк (около
+    # IMAGE_BAND_PIXELS исходных точек на полосу); возвращает min и max.
+    # Первый crop декодирует img целиком, по полосам ограничена только
+    # память на оттенки серого и уменьшение
+    def _read_image_bands(self, img, heights):
+        source_width, source_height = img.size
+        resize = (self.width, self.height) != img.size
+        scale_y = source_height / self.height
+
+        # Запас исходных строк вокруг полосы для билинейного фильтра
+        # (при уменьшении он охватывает около scale_y строк с каждой
+        # стороны); от уменьшения целиком полоса отличается не больше
+        # чем на 1 из-за округления весов фильтра
+        margin = int(np.ceil(scale_y)) + 1
+        band_rows = max(1, int(IMAGE_BAND_PIXELS /
+                               (source_width * scale_y)))
+
+        min_z = None
+        max_z = None
+        row = 0
+        while row < self.height:
+            stop = min(row + band_rows, self.height)
+            if resize:
+                top = max(0, int(row * scale_y) - margin)
+                bottom = min(source_height,
+                             int(np.ceil(stop * scale_y)) + margin)
+                band = self._to_grayscale(
+                    img.crop((0, top, source_width, bottom)))
+                band = band.resize((self.width, stop - row), Image.BILINEAR,
+                                   box=(0, row * scale_y - top, source_width,
+                                        stop * scale_y - top))
+            else:
+                band = self._to_grayscale(
+                    img.crop((0, row, source_width, stop)))
 
-    # Создание точек
+            # Инвертирование значений (чтобы темные области были ниже)
+            block = heights[row:stop]
+            np.subtract(255.0, np.asarray(band, dtype=np.float32),
+                        out=block)
+
+            band_min = np.min(block)
+            band_max = np.max(block)
+            if min_z is None or band_min < min_z:
+                min_z = band_min
+            if max_z is None or band_max > max_z:
+                max_z = band_max
+
+            row = stop
+            self._read_progress(row / self.height)
+        return min_z, max_z
+
+    # Преобразование изображения (или полосы) в оттенки серого
+    @staticmethod
+    def _to_grayscale(img):
+        if img.mode == 'P':
+            # Для палитровых изображений конвертируем в RGBA
+            img = img.convert('RGBA')
+            img = img.convert('L')
+        elif img.mode in ['RGBA', 'LA']:
+            # Для изображений с альфа-каналом конвертируем в L
+            img = img.convert('RGBA')
+            background = Image.new('RGBA', img.size, (255, 255, 255, 255))
+            img = Image.alpha_composite(background, img)
+            img = img.convert('L')
+        elif img.mode != 'L':
+            # Для RGB и других форматов конвертируем в оттенки серого
+            img = img.convert('L')
+        return img
+
+    # Создание точек: массив (N, 3) float32 [x, y, z]. Сетка координат
+    # XY не создается: строка x и столбец y записываются рассылкой
     def create_points(self):
-        # Создание сетки координат XY
-        y_coords, x_coords = np.meshgrid(
-            np.arange(self.height),
-            np.arange(self.width),
-            indexing='ij'
-        )
-
+        self.points = np.empty((self.width * self.height, 3),
+                               dtype=np.float32)
+        grid = self.points.reshape(self.height, self.width, 3)
+        self._write_xy(grid, 1.0)
+        grid[:, :, 2] = self.data_array
+
+    # Запись X и Y в точки (сетка (H, W, 3)) рассылкой строки и столбца:
+    # в float64 вычисляются только W + H значений
+    def _write_xy(self, grid, scale_factor):
         # Центрирование координат
-        x_coords_centered = x_coords - self.width / 2
+        grid[:, :, 0] = (np.arange(self.width) - self.width / 2) * \
+            scale_factor
 
         # Инвертирование оси Y, чтобы первая строка файла была верхом модели
-        y_coords_centered = -(y_coords - self.height / 2)
-
-        # Создание массива точек [x, y, z]
-        self.points = np.stack([
-            x_coords_centered.flatten(),
-            y_coords_centered.flatten(),
-            self.data_array.flatten()
-        ], axis=1)
+        grid[:, :, 1] = (-(np.arange(self.height) - self.height / 2) *
+                         scale_factor)[:, np.newaxis]
 
-    # Создание линий каркаса (оптимизированная для изображений)
+    # Создание линий каркаса (оптимизированная для изображений).
+    # Для больших изображений - грубая сетка: каждая skip_factor-я строка
+    # и столбец, соседние узлы соединены линиями длиной skip_factor
     def create_lines_optimized_for_image(self):
         # Ограничиваем максимальное количество линий для изображений
         max_lines = 20000
 
+        skip_factor = 1
         if self.width * self.height * 2 > max_lines:
             # Если слишком много точек, прореживаем линии
-            skip_factor = int(np.sqrt((self.width * self.height * 2) /
-                                      max_lines))
-
-            horizontal_lines = []
-            y = 0
-            while y < self.height:
-                x = 0
-                while x < self.width - 1:
-                    idx1 = y * self.width + x
-                    idx2 = y * self.width + (x + 1)
-                    horizontal_lines.append([idx1, idx2])
-                    x += skip_factor
-                y += skip_factor
-
-            vertical_lines = []
-            x = 0
-            while x < self.width:
-                y = 0
-                while y < self.height - 1:
-                    idx1 = y * self.width + x
-                    idx2 = (y + 1) * self.width + x
-                    vertical_lines.append([idx1, idx2])
-                    y += skip_factor
-                x += skip_factor
-
-            self.lines = np.array(horizontal_lines + vertical_lines,
-                                  dtype=np.int32)
-        else:
-            # Для небольших изображений используем все линии
-            horizontal_indices = np.arange(self.height * self.width). \
-                reshape(self.height, self.width)
-            horizontal_lines = np.stack([
-                horizontal_indices[:, :-1].flatten(),
-                horizontal_indices[:, 1:].flatten()
-            ], axis=1)
-
-            vertical_lines = np.stack([
-                horizontal_indices[:-1, :].flatten(),
-                horizontal_indices[1:, :].flatten()
-            ], axis=1)
-
-            self.lines = np.vstack([horizontal_lines, vertical_lines]). \
-                astype(np.int32)
+            skip_factor = max(1, int(np.sqrt((self.width * self.height * 2) /
+                                             max_lines)))
 
+        self.lines = GridTopology(self.width, self.height, skip_factor)
         print(f"Создано {len(self.lines)} линий")
 
-    # Создание линий каркаса (для FDF)
+    # Создание линий каркаса (для FDF). Массив индексов не создается:
+    # топология сетки определяется размерами, индексы строятся при
+    # отрисовке (для тайлов и уровней - своего размера)
     def create_lines(self):
-        # Создание массива индексов для горизонтальных линий
-        horizontal_indices = np.arange(self.height * self.width). \
-            reshape(self.height, self.width)
-        horizontal_lines = np.stack([
-            horizontal_indices[:, :-1].flatten(),
-            horizontal_indices[:, 1:].flatten()
-        ], axis=1)
-
-        # Создание массива индексов для вертикальных линий
-        vertical_lines = np.stack([
-            horizontal_indices[:-1, :].flatten(),
-            horizontal_indices[1:, :].flatten()
-        ], axis=1)
-
-        # Объединение горизонтальных и вертикальных линий
-        self.lines = np.vstack([horizontal_lines, vertical_lines]). \
-            astype(np.int32)
-
-    # Нормализация точек
+        self.lines = GridTopology(self.width, self.height)
+
+    # Нормализация точек на месте (в массиве create_points, без копий).
+    # Все столбцы записываются заново из размеров и высот, поэтому
+    # повторный вызов дает тот же результат
     def normalize_points(self):
         if self.points is None or len(self.points) == 0:
-            return np.array([]), np.array([])
+            return np.empty((0, 3), dtype=np.float32), \
+                np.empty((0, 2), dtype=np.int32)
 
-        # Вычисление диапазонов по осям
-        x_range = np.max(self.points[:, 0]) - np.min(self.points[:, 0])
-        y_range = np.max(self.points[:, 1]) - np.min(self.points[:, 1])
-        z_range = np.max(self.points[:, 2]) - np.min(self.points[:, 2])
+        # Вычисление диапазонов по осям (по размерам сетки и min/max высот,
+        # без прохода по точкам)
+        x_range = float(self.width - 1)
+        y_range = float(self.height - 1)
+        z_range = float(self.max_z) - float(self.min_z)
 
         # Максимальный размер по всем осям
         max_range = max(x_range, y_range, z_range)
@@ -268,32 +412,49 @@ class FDFParser:
         else:
             scale_factor = 1.0
 
-        # Масштабирование всех точек
-        normalized_points = self.points * scale_factor
+        # Масштабирование X и Y
+        normalized_points = self.points
+        grid = normalized_points.reshape(self.height, self.width, 3)
+        self._write_xy(grid, scale_factor)
+
+        # Параметры нормализации: z = (h - z_offset) * z_scale
+        self.scale_factor = scale_factor
+        self.z_offset = 0.0
+        self.z_scale = scale_factor
 
         # Масштабирование по Z для лучшей визуализации
         if self.max_z != self.min_z:
             z_range = self.max_z - self.min_z
             if z_range > 0:
-                # Сохраняем исходные Z для цветовой градации
-                original_z = normalized_points[:, 2].copy()
-
                 # Усиливаем рельеф (сильнее для изображений)
                 if self.is_image:
                     z_scale = 1.0 / z_range  # Усиление для изображений
                 else:
                     z_scale = 0.5 / z_range  # Усиление для FDF
 
-                normalized_points[:, 2] = (self.data_array.flatten() -
-                                           self.min_z) * z_scale
-                # Сохранение нормализованных min/max Z для цветовой градации
-                self.norm_min_z = np.min(original_z)
-                self.norm_max_z = np.max(original_z)
+                # Z записывается прямо в столбец точек (float32)
+                z_column = grid[:, :, 2]
+                np.subtract(self.data_array, self.min_z, out=z_column)
+                z_column *= z_scale
+                self.z_offset = self.min_z
+                self.z_scale = z_scale
+                # Нормализованные min/max Z для цветовой градации
+                # (масштабированные исходные min/max высот)
+                self.norm_min_z = np.float32(float(self.min_z) *
+                                             scale_factor)
+                self.norm_max_z = np.float32(float(self.max_z) *
+                                             scale_factor)
             else:
-                self.norm_min_z = self.min_z
-                self.norm_max_z = self.max_z
+                self._scale_heights(grid, scale_factor)
         else:
-            self.norm_min_z = self.min_z
-            self.norm_max_z = self.max_z
+            self._scale_heights(grid, scale_factor)
 
         return normalized_points, self.lines
+
+    # Масштабирование Z без усиления рельефа (плоская карта); произведение
+    # вычисляется в float64 по блокам буфера ufunc, без временного массива
+    def _scale_heights(self, grid, scale_factor):
+        np.multiply(self.data_array, scale_factor, out=grid[:, :, 2],
+                    dtype=np.float64, casting='same_kind')
+        self.norm_min_z = self.min_z
+        self.norm_max_z = self.max_z
@@ -1,173 +1,653 @@
 import numpy as np
-from OpenGL.GL import glLineWidth, glBegin, glColor3f, glVertex3f, glEnd, \
-    glColor4f, GL_LINES
+from OpenGL.GL import glLineWidth, glGenBuffers, glBindBuffer, \
+    glBufferData, glDeleteBuffers, glEnable, glDisable, \
+    glPrimitiveRestartIndex, GL_ELEMENT_ARRAY_BUFFER, GL_STATIC_DRAW, \
+    GL_PRIMITIVE_RESTART
+from OpenGL.error import GLError, NullFunctionError
+from modules.mesh import WireframeMesh, HeightFieldMesh, index_type
+from modules.shaders import HeightColorShader, HeightFieldShader
+from modules.terrain import TerrainTiles, intersect_regions
+from modules.topology import GridTopology
+
+# Выбор уровня детализации: наибольший размер ячейки на экране (пиксели)
+MAX_CELL_PIXELS = 3.0
+
+# Бюджет вершин уровня в непосредственном режиме (с буферами вершин
+# модель делится на тайлы, детализация выбирается для каждого тайла)
+MAX_IMMEDIATE_VERTICES = 5000
 
 
 class SimpleRenderer:
-    # Инициализация данных
-    def __init__(self):
+    # Инициализация данных. line_strips - строки и столбцы регулярной
+    # сетки рисуются полосами (GL_LINE_STRIP) с перезапуском примитива,
+    # если он поддерживается (индексов вдвое меньше, чем у GL_LINES).
+    # implicit_xy - тайлы хранят в видеопамяти только высоты (X и Y
+    # вычисляются шейдером, нужен GLSL 1.30), quantize_heights - высоты
+    # в uint16 вместо float32
+    def __init__(self, line_strips=True, implicit_xy=False,
+                 quantize_heights=False):
         self.wireframe_data = None
-        self.grid_data = None
+        self.grid_mesh = None
         self.wireframe_initialized = False
         self.grid_initialized = False
         self.is_image_mode = False
+        self.use_vertex_colors = False
+        self.pyramid = None
+        self.level_meshes = []
+        self.current_level = 0
+        self.terrain = None
+
+        # Общие индексы тайлов одного размера:
+        # (ширина, высота, полосы) -> (индексы, буфер индексов или None)
+        self.tile_indices = {}
+        self.min_z = 0
+        self.max_z = 0
+        self.get_color_func = None
+
+        # Высоты изменены: диапазон для раскраски в шейдере пересчитывается
+        # при следующей отрисовке
+        self.height_range_dirty = False
+        self.use_buffers = None
+        self.line_strips = line_strips
+        self.use_strips = None
+        self.height_shader = None
+        self.use_shaders = None
+        self.shader_gradient_ready = False
+        self.implicit_xy = implicit_xy or quantize_heights
+        self.quantize_heights = quantize_heights
+        self.field_shader = None
+        self.use_field_shader = None
+
+        # Тайлы текущей модели - сетки карты высот (HeightFieldMesh)
+        self.use_heightfields = False
+
+        # Вызовы отрисовки и вершины текущего кадра
+        self.draw_calls = 0
+        self.drawn_vertices = 0
 
     # Функция подготовки данных для проволочной модели
-    def build_wireframe(self, points, lines, min_z, max_z, get_color_func):
-        if not points or not lines or len(lines) == 0:
+    def build_wireframe(self, points, lines, min_z, max_z, get_color_func,
+                        vertex_colors=None, pyramid=None):
+        if points is None or lines is None or len(points) == 0 or \
+                len(lines) == 0:
             print("Нет данных для построения проволочной модели")
             return False
 
-        # Преобразование точек в массив NumPy для векторизации
-        points_array = np.array(points, dtype=np.float32)
-        lines_array = np.array(lines, dtype=np.int32)
+        self._delete_meshes()
+        self.use_heightfields = False
+        self.height_range_dirty = False
+
+        # Параметры раскраски для сеток, создаваемых позже
+        self.min_z = min_z
+        self.max_z = max_z
+        self.get_color_func = get_color_func
+
+        # Цвета задаются для каждой вершины, а не для концов линий:
+        # из файла (0xRRGGBB) или по градиенту высот
+        self.use_vertex_colors = vertex_colors is not None
+
+        self.pyramid = pyramid
+        if pyramid is None:
+            # Единственный уровень - переданные точки и линии (линии
+            # регулярной сетки - полосами)
+            if isinstance(lines, GridTopology) and self._strips_available():
+                mesh = self._create_mesh(points, lines.strips(),
+                                         vertex_colors, True)
+            else:
+                mesh = self._create_mesh(points, lines, vertex_colors)
+            self.level_meshes = [mesh]
+            self.current_level = 0
+            self._upload_mesh(self.level_meshes[0])
+        elif self._buffers_available():
+            # Тайлы с отсечением по пирамиде видимости; до первого
+            # выбора по камере показывается самый грубый уровень.
+            # Без цветов из файла тайлы могут хранить только высоты
+            self.use_heightfields = self.implicit_xy and \
+                not self.use_vertex_colors and \
+                self._field_shader_available()
+            self.terrain = TerrainTiles(pyramid, self._create_tile_mesh)
+            self.terrain.update(None, 0, MAX_CELL_PIXELS)
+        else:
+            self._use_level_meshes()
 
-        # Ограничение количества линий для рендеринга
-        max_render_lines = 10000
-        if len(lines_array) > max_render_lines:
-            # Прореживание линий для отображения
-            skip_factor = len(lines_array) // max_render_lines + 1
-            lines_array = lines_array[::skip_factor]
-            print(f"Линии прорежены для отображения: {len(lines_array)}")
+        self.wireframe_initialized = True
 
-        # Получение координат вершин линий
-        idx1 = lines_array[:, 0]
-        idx2 = lines_array[:, 1]
+        # Диапазон высот для раскраски в шейдере
+        if self._shaders_available():
+            self.height_shader.set_height_range(min_z, max_z)
+        if self.use_heightfields:
+            self.field_shader.set_height_range(min_z, max_z)
+        return True
 
-        points1 = points_array[idx1]
-        points2 = points_array[idx2]
+    # Создание сетки с цветами из файла или по градиенту
+    def _create_mesh(self, points, lines, vertex_colors, line_strips=False):
+        mesh = WireframeMesh(points, lines, None, line_strips)
+        if self.use_vertex_colors:
+            mesh.colors = self.unpack_colors(vertex_colors)
+        else:
+            mesh.colors = self._compute_colors(mesh.vertices)
+        return mesh
+
+    # Создание сетки уровня детализации из пирамиды высот
+    def _create_level_mesh(self, level):
+        vertex_colors = None
+        if self.use_vertex_colors:
+            vertex_colors = self.pyramid.level_colors(level)
+        return self._create_mesh(self.pyramid.level_points(level),
+                                 self.pyramid.level_lines(level),
+                                 vertex_colors)
+
+    # Уровни целиком: сетки создаются при первом выборе уровня,
+    # начальный уровень - самый грубый
+    def _use_level_meshes(self):
+        self.level_meshes = [None] * self.pyramid.level_count()
+        self.set_level(self.pyramid.level_count() - 1)
+
+    # Создание сетки тайла (часть уровня) в видеопамяти
+    def _create_tile_mesh(self, level, region):
+        vertex_colors = None
+        if self.use_vertex_colors:
+            vertex_colors = self.pyramid.level_colors(level, region)
+
+        row_start, row_stop, col_start, col_stop = region
+        line_strips = self._strips_available()
+        indices, ibo = self._tile_indices(col_stop - col_start,
+                                          row_stop - row_start, line_strips)
+        if self.use_heightfields:
+            heightfield = self.pyramid.level_heightfield(
+                level, region, self.quantize_heights)
+            mesh = HeightFieldMesh(heightfield, indices, self.field_shader,
+                                   line_strips)
+        else:
+            mesh = self._create_mesh(self.pyramid.level_points(level,
+                                                               region),
+                                     indices, vertex_colors, line_strips)
+        if ibo is not None:
+            mesh.share_index_buffer(ibo)
+        self._upload_mesh(mesh)
+        return mesh
+
+    # Индексы и буфер индексов для тайлов width x height: линии или
+    # полосы (создаются один раз для всех тайлов этого размера)
+    def _tile_indices(self, width, height, line_strips):
+        key = (width, height, line_strips)
+        if key not in self.tile_indices:
+            topology = GridTopology(width, height)
+            if line_strips:
+                indices = topology.strips()
+            else:
+                indices = topology.lines()
+            indices = np.asarray(indices, dtype=index_type(
+                width * height, line_strips)).ravel()
+            self.tile_indices[key] = (indices,
+                                      self._upload_indices(indices))
+        return self.tile_indices[key]
+
+    # Загрузка общего буфера индексов (None без буферов или при ошибке:
+    # тогда каждая сетка загружает свои индексы)
+    def _upload_indices(self, indices):
+        if not self._buffers_available():
+            return None
+
+        try:
+            ibo = glGenBuffers(1)
+            glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, ibo)
+            glBufferData(GL_ELEMENT_ARRAY_BUFFER, indices.nbytes, indices,
+                         GL_STATIC_DRAW)
+            glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, 0)
+        except (GLError, NullFunctionError) as e:
+            print(f"Ошибка создания буфера индексов: {e}")
+            return None
+        return ibo
+
+    # Удаление общих буферов индексов тайлов
+    def _delete_tile_indices(self):
+        keys = list(self.tile_indices)
+        idx = 0
+        while idx < len(keys):
+            ibo = self.tile_indices[keys[idx]][1]
+            if ibo is not None:
+                try:
+                    glDeleteBuffers(1, [ibo])
+                except (GLError, NullFunctionError):
+                    pass
+            idx += 1
+        self.tile_indices = {}
+
+    # Выбор уровня детализации (сетка создается при первом выборе)
+    def set_level(self, level):
+        if self.level_meshes[level] is None:
+            mesh = self._create_level_mesh(level)
+            self._upload_mesh(mesh)
+            self.level_meshes[level] = mesh
+
+            width, height = self.pyramid.level_size(level)
+            print(f"Уровень детализации {level}: {width}x{height}, " +
+                  f"линий: {mesh.num_lines()}")
+        self.current_level = level
+
+    # Выбор детализации по размеру единицы длины на экране (в пикселях).
+    # Для тайлов - отсечение по frustum и выбор уровня каждого тайла,
+    # pixel_scale - размер единицы длины на расстоянии 1
+    def update_lod(self, pixels_per_unit, frustum=None, pixel_scale=None):
+        if self.pyramid is None or not self.wireframe_initialized:
+            return
 
-        # Получение цветов с использованием векторизации
-        z1 = points1[:, 2]
-        z2 = points2[:, 2]
+        if self.terrain is not None:
+            if frustum is not None:
+                self.terrain.update(frustum, pixel_scale, MAX_CELL_PIXELS)
+            return
 
-        # Получение цветов для всех точек сразу
-        colors1 = get_color_func(z1, min_z, max_z)
-        colors2 = get_color_func(z2, min_z, max_z)
+        level = self.pyramid.select_level(pixels_per_unit, MAX_CELL_PIXELS,
+                                          MAX_IMMEDIATE_VERTICES)
+        if level != self.current_level:
+            self.set_level(level)
+
+    # Замена исходных высот прямоугольной части карты: x0, y0 - столбец
+    # и строка левого верхнего угла, heights - массив (строки, столбцы).
+    # Пересчитываются только затронутые части уровней пирамиды и вершины
+    # созданных сеток (буферы вершин - через glBufferSubData); тайлы,
+    # еще не загруженные в видеопамять, создаются потом из обновленной
+    # пирамиды. Вторичная сетка не меняется
+    def update_heights(self, x0, y0, heights):
+        if not self.wireframe_initialized or self.pyramid is None:
+            print("Нет пирамиды высот для обновления")
+            return False
 
-        # Объединение вершин и цветов
-        self.wireframe_vertices = np.column_stack([points1, points2]).flatten()
+        heights = np.asarray(heights, dtype=np.float32)
+        if heights.ndim != 2 or x0 < 0 or y0 < 0 or \
+                x0 + heights.shape[1] > self.pyramid.full_width or \
+                y0 + heights.shape[0] > self.pyramid.full_height:
+            print(f"Область высот {heights.shape} в ({x0}, {y0}) " +
+                  "выходит за карту")
+            return False
+        if heights.size == 0:
+            return True
 
-        # Объединение цветов
-        if colors1.ndim == 1 and colors2.ndim == 1:
-            # Если возвращены одиночные цвета (не должно происходить)
-            self.wireframe_colors = np.concatenate([colors1, colors2])
+        regions = self.pyramid.update_region(x0, y0, heights)
+        self.height_range_dirty = True
+
+        try:
+            level = 0
+            while level < len(self.level_meshes):
+                mesh = self.level_meshes[level]
+                if mesh is not None:
+                    width, height = self.pyramid.level_size(level)
+                    self._update_mesh_heights(mesh, level,
+                                              (0, height, 0, width),
+                                              regions[level])
+                level += 1
+
+            if self.terrain is not None:
+                self.terrain.update_heights(regions,
+                                            self._update_mesh_heights)
+        except (GLError, NullFunctionError) as e:
+            print(f"Ошибка обновления буфера вершин: {e}")
+            self._disable_buffers()
+        return True
+
+    # Обновление вершин сетки (часть mesh_region уровня level), входящих
+    # в измененную часть changed. Строки сетки лежат в буфере подряд:
+    # обновляется одна непрерывная часть - от первой до последней
+    # измененной вершины
+    def _update_mesh_heights(self, mesh, level, mesh_region, changed):
+        region = intersect_regions(mesh_region, changed)
+        if region is None:
+            return
+
+        width = mesh_region[3] - mesh_region[2]
+        row_start = region[0] - mesh_region[0]
+        row_stop = region[1] - mesh_region[0]
+        col_start = region[2] - mesh_region[2]
+        col_stop = region[3] - mesh_region[2]
+        heights = self.pyramid.level_heights(level, region)
+
+        if isinstance(mesh, HeightFieldMesh):
+            if not mesh.heightfield.set_heights(row_start, col_start,
+                                                heights):
+                # Квантованные высоты вышли за отрезок тайла
+                mesh.heightfield = self.pyramid.level_heightfield(
+                    level, mesh_region, True)
+                mesh.upload_vertices()
+                return
         else:
-            # Если возвращены массивы цветов
-            self.wireframe_colors = \
-                np.column_stack([colors1, colors2]).flatten()
+            block = mesh.vertices.reshape(-1, width, 3)[
+                row_start:row_stop, col_start:col_stop]
+            block[:, :, 2] = heights
+            if not self.use_vertex_colors:
+                colors = mesh.colors.reshape(-1, width, 3)
+                colors[row_start:row_stop, col_start:col_stop] = \
+                    self._compute_colors(block.reshape(-1, 3)). \
+                    reshape(block.shape)
+
+        mesh.update_vertices(row_start * width + col_start,
+                             (row_stop - 1) * width + col_stop)
+
+    # Диапазон высот для раскраски в шейдерах после изменения высот
+    # (исходные min/max, масштабированные как в normalize_points). Цвета
+    # вершин на CPU остаются рассчитанными по диапазону при загрузке
+    def _refresh_height_range(self):
+        self.height_range_dirty = False
+        if not self.use_shaders and not self.use_heightfields:
+            return
 
-        self.wireframe_num_lines = len(lines_array)
-        self.wireframe_initialized = True
+        min_z, max_z = self.pyramid.height_range()
+        if min_z == max_z:
+            return
+        scale_factor = self.pyramid.scale_factor
+        min_z = np.float32(float(min_z) * scale_factor)
+        max_z = np.float32(float(max_z) * scale_factor)
+
+        if self.use_shaders:
+            self.height_shader.set_height_range(min_z, max_z)
+        if self.use_heightfields:
+            self.field_shader.set_height_range(min_z, max_z)
+
+    # Текущий уровень, количество вершин и линий для отображения
+    def get_wireframe_stats(self):
+        if not self.wireframe_initialized:
+            return 0, 0, 0
+
+        if self.terrain is not None:
+            return self.terrain.stats()
+
+        mesh = self.level_meshes[self.current_level]
+        return self.current_level, mesh.num_vertices(), mesh.num_lines()
+
+    # Количество видимых и отсеченных тайлов (None без тайлов)
+    def get_tile_stats(self):
+        if self.terrain is None:
+            return None
+        return len(self.terrain.visible), self.terrain.culled
+
+    # Проверка поддержки шейдеров (требуется контекст OpenGL)
+    def _shaders_available(self):
+        if self.use_shaders is None:
+            try:
+                self.height_shader = HeightColorShader()
+                self.use_shaders = True
+            except (GLError, NullFunctionError, RuntimeError) as e:
+                print(f"Шейдеры недоступны, раскраска на CPU: {e}")
+                self.height_shader = None
+                self.use_shaders = False
+        return self.use_shaders
+
+    # Проверка поддержки шейдера карты высот (GLSL 1.30, gl_VertexID)
+    def _field_shader_available(self):
+        if self.use_field_shader is None:
+            try:
+                self.field_shader = HeightFieldShader()
+                self.use_field_shader = True
+            except (GLError, NullFunctionError, RuntimeError) as e:
+                print("Шейдер карты высот недоступен, тайлы хранят " +
+                      f"координаты вершин: {e}")
+                self.field_shader = None
+                self.use_field_shader = False
+        return self.use_field_shader
+
+    # Проверка поддержки перезапуска примитива (OpenGL 3.1) для полос
+    def _strips_available(self):
+        if self.use_strips is None:
+            self.use_strips = False
+            if self.line_strips and self._buffers_available():
+                try:
+                    glEnable(GL_PRIMITIVE_RESTART)
+                    glDisable(GL_PRIMITIVE_RESTART)
+                    self.use_strips = bool(glPrimitiveRestartIndex)
+                except (GLError, NullFunctionError) as e:
+                    print("Перезапуск примитива недоступен, сетка " +
+                          f"рисуется отрезками: {e}")
+        return self.use_strips
+
+    # Загрузка градиента в шейдеры (без изменения данных вершин)
+    def set_gradient(self, colors, positions):
+        if not self._shaders_available():
+            return False
+
+        try:
+            self.height_shader.set_gradient(colors, positions)
+            if self.field_shader is not None:
+                self.field_shader.set_gradient(colors, positions)
+        except (GLError, ValueError) as e:
+            print(f"Ошибка загрузки градиента в шейдер: {e}")
+            self.shader_gradient_ready = False
+            return False
+
+        self.shader_gradient_ready = True
         return True
 
-    # Подготовка данных для сетки
-    def build_grid(self, points, width, height, grid_color):
-        if not points or width == 0 or height == 0:
+    # Расчет цветов вершин по высоте
+    def _compute_colors(self, vertices):
+        colors = self.get_color_func(vertices[:, 2], self.min_z, self.max_z)
+        return np.asarray(colors, dtype=np.float32).reshape(-1, 3)
+
+    # Преобразование цветов 0xRRGGBB в массив (N, 3) float32
+    @staticmethod
+    def unpack_colors(vertex_colors):
+        packed = np.asarray(vertex_colors, dtype=np.uint32).ravel()
+        colors = np.empty((len(packed), 3), dtype=np.float32)
+        colors[:, 0] = (packed >> 16) & 0xFF
+        colors[:, 1] = (packed >> 8) & 0xFF
+        colors[:, 2] = packed & 0xFF
+        colors /= 255.0
+        return colors
+
+    # Переход от цветов из файла к раскраске по градиенту
+    def disable_vertex_colors(self):
+        self.use_vertex_colors = False
+
+    # Пересчет только цветов вершин (например, при смене градиента)
+    def recolor_wireframe(self, min_z, max_z, get_color_func):
+        if not self.wireframe_initialized:
             return False
 
-        self.grid_color = grid_color
+        self.use_vertex_colors = False
+        self.min_z = min_z
+        self.max_z = max_z
+        self.get_color_func = get_color_func
+
+        # Сетки карты высот раскрашиваются только в шейдере
+        meshes = []
+        if not self.use_heightfields:
+            meshes = self._all_meshes()
+
+        idx = 0
+        while idx < len(meshes):
+            mesh = meshes[idx]
+            try:
+                mesh.set_colors(self._compute_colors(mesh.vertices))
+            except (GLError, NullFunctionError) as e:
+                print(f"Ошибка обновления буфера вершин: {e}")
+                self._disable_buffers()
+                break
+            idx += 1
+        return True
 
-        # Нужно ли рисовать сетку
-        if width * height > 10000:  # Для больших - не рисуем сетку
-            print("Сетка отключена для оптимизации производительности")
-            self.grid_vertices = np.array([], dtype=np.float32)
-            self.grid_num_lines = 0
-            self.grid_initialized = True
-            return True
+    # Все созданные сетки: уровни и тайлы
+    def _all_meshes(self):
+        meshes = []
+        idx = 0
+        while idx < len(self.level_meshes):
+            if self.level_meshes[idx] is not None:
+                meshes.append(self.level_meshes[idx])
+            idx += 1
+
+        if self.terrain is not None:
+            meshes.extend(self.terrain.all_meshes())
+        return meshes
+
+    # Проверка поддержки буферов вершин (требуется контекст OpenGL)
+    def _buffers_available(self):
+        if self.use_buffers is None:
+            try:
+                self.use_buffers = bool(glGenBuffers)
+            except NullFunctionError:
+                self.use_buffers = False
+
+            if not self.use_buffers:
+                print("Буферы вершин недоступны, используется " +
+                      "непосредственный режим отрисовки")
+        return self.use_buffers
+
+    # Загрузка сетки в видеопамять
+    def _upload_mesh(self, mesh):
+        if not self._buffers_available():
+            return
+
+        try:
+            mesh.upload()
+        except (GLError, NullFunctionError) as e:
+            print(f"Ошибка создания буферов: {e}")
+            mesh.delete()
+            self._disable_buffers()
+
+    # Переход в непосредственный режим отрисовки (тайлы заменяются
+    # уровнями целиком с ограниченным количеством вершин)
+    def _disable_buffers(self):
+        self.use_buffers = False
+        self.use_strips = False
+        self.use_heightfields = False
+        if self.grid_mesh is not None:
+            self.grid_mesh.delete()
+
+        idx = 0
+        while idx < len(self.level_meshes):
+            if self.level_meshes[idx] is not None:
+                self.level_meshes[idx].delete()
+            idx += 1
+
+        if self.terrain is not None:
+            self.terrain.delete()
+            self.terrain = None
+            self._use_level_meshes()
+        self._delete_tile_indices()
+
+    # Удаление всех сеток уровней
+    def _delete_meshes(self):
+        idx = 0
+        while idx < len(self.level_meshes):
+            if self.level_meshes[idx] is not None:
+                self.level_meshes[idx].delete()
+            idx += 1
+        self.level_meshes = []
+        self.current_level = 0
+
+        if self.terrain is not None:
+            self.terrain.delete()
+            self.terrain = None
+        self._delete_tile_indices()
+
+    # Подготовка данных для сетки: узлы - каждая grid_step-я строка и
+    # столбец модели (срез без копирования всех точек), линии между
+    # соседними узлами. Сетка загружается в видеопамять один раз
+    def build_grid(self, points, width, height, grid_color):
+        if points is None or len(points) == 0 or width == 0 or height == 0:
+            return False
 
-        points_array = np.array(points, dtype=np.float32). \
-            reshape(height, width, 3)
+        self.grid_color = grid_color
+        self._delete_grid()
 
-        # Ограничение детализации сетки
+        # Ограничение детализации сетки (около 20 линий по каждой оси)
         grid_step_x = max(1, width // 20)
         grid_step_y = max(1, height // 20)
 
-        # Создание массива для вершин сетки
-        grid_vertices_list = []
-
-        # Рисование только основных линий сетки
-        y = 0
-        while y < height:
-            x = 0
-            while x < width:
-                point1 = points_array[y, x]
-                z_grid = point1[2] - 0.1
-
-                # Горизонтальная линия
-                if x + grid_step_x < width:
-                    point2 = points_array[y, x + grid_step_x]
-                    grid_vertices_list.extend([point1[0], point1[1], z_grid])
-                    grid_vertices_list.extend([point2[0], point2[1], z_grid])
-
-                # Вертикальная линия
-                if y + grid_step_y < height:
-                    point2 = points_array[y + grid_step_y, x]
-                    grid_vertices_list.extend([point1[0], point1[1], z_grid])
-                    grid_vertices_list.extend([point2[0], point2[1], z_grid])
-
-                x += grid_step_x
-            y += grid_step_y
-
-        # Преобразование в numpy array
-        self.grid_vertices = np.array(grid_vertices_list, dtype=np.float32)
-        self.grid_num_lines = len(self.grid_vertices) // 6
+        nodes = np.asarray(points).reshape(height, width, 3)[
+            ::grid_step_y, ::grid_step_x]
+
+        # Горизонтальные и вертикальные отрезки между соседними узлами
+        vertices = np.concatenate([
+            self._grid_segments(nodes[:, :-1], nodes[:, 1:]),
+            self._grid_segments(nodes[:-1, :], nodes[1:, :])
+        ])
+
+        if len(vertices) > 0:
+            colors = np.empty((len(vertices), 3), dtype=np.float32)
+            colors[:] = grid_color[:3]
+            lines = np.arange(len(vertices)).reshape(-1, 2)
+            self.grid_mesh = WireframeMesh(vertices, lines, colors)
+            self._upload_mesh(self.grid_mesh)
+
         self.grid_initialized = True
         return True
 
+    # Вершины отрезков сетки (2 на отрезок): отрезок рисуется на высоте
+    # начального узла, немного ниже модели
+    @staticmethod
+    def _grid_segments(starts, ends):
+        segments = np.empty(starts.shape[:2] + (2, 3), dtype=np.float32)
+        segments[:, :, 0, :] = starts
+        segments[:, :, 1, :2] = ends[:, :, :2]
+        segments[:, :, 1, 2] = starts[:, :, 2]
+        segments[:, :, :, 2] -= 0.1
+        return segments.reshape(-1, 3)
+
+    # Удаление сетки из видеопамяти
+    def _delete_grid(self):
+        if self.grid_mesh is not None:
+            self.grid_mesh.delete()
+            self.grid_mesh = None
+        self.grid_initialized = False
+
     # Отрисовка проволочной модели
     def render_wireframe(self):
-        if not self.wireframe_initialized or self.wireframe_vertices is None:
+        if not self.wireframe_initialized:
             return
 
+        mesh = None
+        if self.terrain is None:
+            mesh = self.level_meshes[self.current_level]
+            if mesh is None:
+                return
+
         if self.is_image_mode:
             glLineWidth(0.8)
         else:
             glLineWidth(1.5)
 
-        glBegin(GL_LINES)
-
-        vertices = self.wireframe_vertices
-        colors = self.wireframe_colors
-
-        # Отрисовка через предподготовленные данные
-        i = 0
-        num_vertices = len(vertices)
-        while i < num_vertices:
-            # Первая точка
-            glColor3f(colors[i], colors[i+1], colors[i+2])
-            glVertex3f(vertices[i], vertices[i+1], vertices[i+2])
-
-            # Вторая точка
-            glColor3f(colors[i+3], colors[i+4], colors[i+5])
-            glVertex3f(vertices[i+3], vertices[i+4], vertices[i+5])
-
-            i += 6
+        if self.height_range_dirty:
+            self._refresh_height_range()
+
+        # Раскраска по высоте в шейдере (цвета из файла - без шейдера);
+        # сетки карты высот рисуются только своим шейдером
+        shader = None
+        if self.use_heightfields and self.terrain is not None:
+            shader = self.field_shader
+        elif self.shader_gradient_ready and not self.use_vertex_colors:
+            shader = self.height_shader
+        if shader is not None:
+            shader.bind()
+        if self.use_strips:
+            glEnable(GL_PRIMITIVE_RESTART)
+
+        if self.terrain is not None:
+            self.count_draw(len(self.terrain.visible), self.terrain.draw())
+        else:
+            mesh.draw()
+            self.count_draw(1, len(mesh.indices))
 
-        glEnd()
+        if self.use_strips:
+            glDisable(GL_PRIMITIVE_RESTART)
+        if shader is not None:
+            shader.unbind()
 
     # Отрисовка сетки
     def render_grid(self):
-        if not self.grid_initialized or self.grid_vertices is None or len(
-                self.grid_vertices) == 0:
+        if not self.grid_initialized or self.grid_mesh is None:
             return
 
-        glColor4f(*self.grid_color)
         glLineWidth(0.5)
+        self.grid_mesh.draw()
+        self.count_draw(1, len(self.grid_mesh.indices))
 
-        glBegin(GL_LINES)
-
-        vertices = self.grid_vertices
+    # Сброс счетчиков отрисовки (в начале кадра)
+    def reset_draw_stats(self):
+        self.draw_calls = 0
+        self.drawn_vertices = 0
 
-        # Проход по всем линиям сетки
-        i = 0
-        num_vertices = len(vertices)
-        while i < num_vertices:
-            glVertex3f(vertices[i], vertices[i+1], vertices[i+2])
-            glVertex3f(vertices[i+3], vertices[i+4], vertices[i+5])
-            i += 6
-
-        glEnd()
+    # Учет вызовов отрисовки и переданных вершин
+    def count_draw(self, calls, vertices):
+        self.draw_calls += calls
+        self.drawn_vertices += vertices
 
     # Установка режима для изображений
     def set_image_mode(self, is_image):
@@ -175,8 +655,17 @@ class SimpleRenderer:
 
     # Очистка ресурсов
     def cleanup(self):
-        self.wireframe_vertices = None
-        self.wireframe_colors = None
-        self.grid_vertices = None
+        self._delete_meshes()
+        if self.height_shader is not None:
+            self.height_shader.delete()
+            self.height_shader = None
+        if self.field_shader is not None:
+            self.field_shader.delete()
+            self.field_shader = None
+        self.use_shaders = None
+        self.use_field_shader = None
+        self.use_heightfields = False
+        self.shader_gradient_ready = False
+        self._delete_grid()
+        self.pyramid = None
         self.wireframe_initialized = False
-        self.grid_initialized = False
@@ -0,0 +1,113 @@
+import numpy as np
+
+# Наибольшее значение квантованной высоты (uint16)
+MAX_QUANTIZED_HEIGHT = 65535
+
+
+class HeightField:
+    # Регулярная сетка width x height, в которой хранятся только высоты
+    # (float32 или квантованные uint16). X и Y вершины i определяются
+    # номером: x = x0 + (i % width) * dx, y = y0 + (i // width) * dy
+    # (в вершинном шейдере по gl_VertexID или в points() на NumPy),
+    # высота: z = z_base + h * z_step
+    def __init__(self, heights, origin, step, quantize=False):
+        heights = np.asarray(heights, dtype=np.float32)
+        self.height, self.width = heights.shape
+        self.origin = (float(origin[0]), float(origin[1]))
+        self.step = (float(step[0]), float(step[1]))
+        self.z_base = 0.0
+        self.z_step = 1.0
+
+        if quantize:
+            self.heights = self._quantize(heights)
+        else:
+            self.heights = np.ascontiguousarray(heights)
+
+    # Квантование высот в uint16 на отрезке [min, max] (2 байта на
+    # вершину; погрешность - половина шага (max - min) / 65535)
+    def _quantize(self, heights):
+        quantized = np.zeros(heights.shape, dtype=np.uint16)
+        if heights.size == 0:
+            return quantized
+
+        low = float(heights.min())
+        high = float(heights.max())
+        self.z_base = low
+        if high > low:
+            self.z_step = (high - low) / MAX_QUANTIZED_HEIGHT
+            scaled = self._quantized_steps(heights)
+            np.clip(scaled, 0, MAX_QUANTIZED_HEIGHT, out=scaled)
+            quantized[:] = scaled
+        else:
+            self.z_step = 0.0
+        return quantized
+
+    # Номера шагов квантования для высот (округленные, float32)
+    def _quantized_steps(self, heights):
+        scaled = heights - np.float32(self.z_base)
+        scaled *= np.float32(1.0 / self.z_step)
+        np.rint(scaled, out=scaled)
+        return scaled
+
+    # Замена высот части сетки, начиная со строки row и столбца col.
+    # Квантованные высоты записываются с прежними z_base и z_step;
+    # False, если новые высоты выходят за их отрезок (сетку нужно
+    # квантовать заново)
+    def set_heights(self, row, col, heights):
+        heights = np.asarray(heights, dtype=np.float32)
+        rows, cols = heights.shape
+        target = self.heights[row:row + rows, col:col + cols]
+        if not self.is_quantized():
+            target[:] = heights
+            return True
+
+        if self.z_step == 0.0:
+            return False
+        scaled = self._quantized_steps(heights)
+        if scaled.min() < 0 or scaled.max() > MAX_QUANTIZED_HEIGHT:
+            return False
+        target[:] = scaled
+        return True
+
+    # Признак квантованных высот
+    def is_quantized(self):
+        return self.heights.dtype == np.uint16
+
+    # Количество вершин
+    def num_vertices(self):
+        return self.width * self.height
+
+    # Количество вершин, как у массива точек (N, 3)
+    def __len__(self):
+        return self.num_vertices()
+
+    # Объем данных вершин (байты)
+    def vertex_bytes(self):
+        return self.heights.nbytes
+
+    # Высоты всех вершин (N) float32
+    def z_values(self):
+        z = self.heights.astype(np.float32).ravel()
+        if self.is_quantized():
+            z *= np.float32(self.z_step)
+            z += np.float32(self.z_base)
+        return z
+
+    # Точки (N, 3) float32 для отрисовки на CPU: X и Y восстанавливаются
+    # по номеру вершины рассылкой строки и столбца
+    def points(self):
+        points = np.empty((self.num_vertices(), 3), dtype=np.float32)
+        grid = points.reshape(self.height, self.width, 3)
+        grid[:, :, 0] = self.origin[0] + np.arange(self.width) * \
+            self.step[0]
+        grid[:, :, 1] = (self.origin[1] + np.arange(self.height) *
+                         self.step[1])[:, np.newaxis]
+        points[:, 2] = self.z_values()
+        return points
+
+    # Преобразование в массив точек (N, 3) через np.asarray
+    def __array__(self, dtype=None, copy=None):
+        points = self.points()
+        if dtype is not None and points.dtype != dtype:
+            return points.astype(dtype)
+        return points
@@ -0,0 +1,214 @@
+import hashlib
+import os
+import numpy as np
+
+# Версия формата (увеличивается при изменении формата или обработки данных)
+CACHE_VERSION = 2
+CACHE_MAGIC = b'FDFCACHE'
+CACHE_EXTENSION = '.hmap'
+
+# Флаги заголовка
+FLAG_HAS_COLORS = 1
+FLAG_IS_IMAGE = 2
+
+# Заголовок фиксированного размера (128 байт), далее данные:
+# высоты float32 (height x width), затем цвета uint32 (если есть)
+HEADER_DTYPE = np.dtype([
+    ('magic', 'S8'),
+    ('version', '<u4'),
+    ('flags', '<u4'),
+    ('width', '<u4'),
+    ('height', '<u4'),
+    ('min_z', '<f8'),
+    ('max_z', '<f8'),
+    ('source_size', '<u8'),
+    ('source_mtime', '<i8'),
+    ('source_hash', 'u1', (32,)),
+    ('reserved', 'u1', (40,))
+])
+
+# Размер блока при вычислении хеша
+HASH_CHUNK_SIZE = 4 * 1024 * 1024
+
+
+class HeightmapCache:
+    # Инициализация каталога кеша
+    def __init__(self, cache_dir=None):
+        if cache_dir is None:
+            cache_dir = os.environ.get(
+                'FDF_CACHE_DIR',
+                os.path.join(os.path.expanduser('~'), '.cache', 'fdf_viewer')
+            )
+        self.cache_dir = cache_dir
+
+    # Путь к файлу кеша для исходного файла
+    def cache_path(self, source):
+        key = hashlib.sha1(os.path.abspath(source).encode('utf-8'))
+        return os.path.join(self.cache_dir, key.hexdigest() + CACHE_EXTENSION)
+
+    # Хеш содержимого исходного файла
+    @staticmethod
+    def source_hash(source):
+        digest = hashlib.sha256()
+        with open(source, 'rb') as file:
+            while True:
+                block = file.read(HASH_CHUNK_SIZE)
+                if not block:
+                    break
+                digest.update(block)
+        return np.frombuffer(digest.digest(), dtype=np.uint8)
+
+    # Открытие кеша через np.memmap, если исходный файл не изменился.
+    # Возвращает (heights, colors, min_z, max_z, is_image) или None
+    def load(self, source):
+        path = self.cache_path(source)
+        try:
+            if not os.path.exists(path):
+                return None
+
+            header = np.fromfile(path, dtype=HEADER_DTYPE, count=1)
+            if len(header) == 0:
+                return None
+            header = header[0]
+
+            if header['magic'] != CACHE_MAGIC or \
+                    header['version'] != CACHE_VERSION:
+                return None
+
+            # Сначала дешевые проверки размера и времени изменения,
+            # хеш - только если время изменилось
+            stat = os.stat(source)
+            if header['source_size'] != stat.st_size:
+                return None
+            if header['source_mtime'] != stat.st_mtime_ns:
+                if not np.array_equal(header['source_hash'],
+                                      self.source_hash(source)):
+                    return None
+                # Содержимое не изменилось - обновляем время в заголовке
+                self._update_mtime(path, stat.st_mtime_ns)
+
+            width = int(header['width'])
+            height = int(header['height'])
+            flags = int(header['flags'])
+            offset = HEADER_DTYPE.itemsize
+
+            heights = np.memmap(path, dtype='<f4', mode='r', offset=offset,
+                                shape=(height, width))
+
+            colors = None
+            if flags & FLAG_HAS_COLORS:
+                colors = np.memmap(path, dtype='<u4', mode='r',
+                                   offset=offset + heights.nbytes,
+                                   shape=(height, width))
+
+            return heights, colors, float(header['min_z']), \
+                float(header['max_z']), bool(flags & FLAG_IS_IMAGE)
+        except (OSError, ValueError) as e:
+            print(f"Кеш недоступен: {e}")
+            return None
+
+    # Запись нового времени изменения исходного файла в заголовок
+    @staticmethod
+    def _update_mtime(path, mtime_ns):
+        offset = HEADER_DTYPE.fields['source_mtime'][1]
+        with open(path, 'r+b') as file:
+            file.seek(offset)
+            file.write(np.array(mtime_ns, dtype='<i8').tobytes())
+
+    # Заголовок кеша для исходного файла и высот width x height
+    def _make_header(self, source, width, height, min_z, max_z, flags):
+        stat = os.stat(source)
+        header = np.zeros(1, dtype=HEADER_DTYPE)
+        header['magic'] = CACHE_MAGIC
+        header['version'] = CACHE_VERSION
+        header['flags'] = flags
+        header['width'] = width
+        header['height'] = height
+        header['min_z'] = min_z
+        header['max_z'] = max_z
+        header['source_size'] = stat.st_size
+        header['source_mtime'] = stat.st_mtime_ns
+        header['source_hash'] = self.source_hash(source)
+        return header
+
+    # Запись кеша (атомарно через временный файл)
+    def save(self, source, heights, colors, min_z, max_z, is_image):
+        path = self.cache_path(source)
+        tmp_path = path + '.tmp'
+
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+
+            flags = 0
+            if colors is not None:
+                flags |= FLAG_HAS_COLORS
+            if is_image:
+                flags |= FLAG_IS_IMAGE
+
+            height, width = heights.shape
+            header = self._make_header(source, width, height, min_z, max_z,
+                                       flags)
+
+            with open(tmp_path, 'wb') as file:
+                header.tofile(file)
+                np.ascontiguousarray(heights, dtype='<f4').tofile(file)
+                if colors is not None:
+                    np.ascontiguousarray(colors, dtype='<u4').tofile(file)
+
+            os.replace(tmp_path, path)
+            return True
+        except OSError as e:
+            print(f"Не удалось записать кеш: {e}")
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            return False
+
+    # Потоковая запись: временный файл кеша с заголовком и np.memmap для
+    # высот width x height (без цветов). Высоты записываются в него по
+    # частям, min/max - в commit. None, если файл создать нельзя
+    def create(self, source, width, height, is_image):
+        tmp_path = self.cache_path(source) + '.tmp'
+        flags = FLAG_IS_IMAGE if is_image else 0
+
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            header = self._make_header(source, width, height, 0.0, 0.0,
+                                       flags)
+            with open(tmp_path, 'wb') as file:
+                header.tofile(file)
+                file.truncate(HEADER_DTYPE.itemsize + width * height * 4)
+
+            return np.memmap(tmp_path, dtype='<f4', mode='r+',
+                             offset=HEADER_DTYPE.itemsize,
+                             shape=(height, width))
+        except (OSError, ValueError) as e:
+            print(f"Не удалось создать кеш: {e}")
+            self.discard(source)
+            return None
+
+    # Завершение потоковой записи: min/max в заголовок и замена файла
+    # кеша временным файлом (heights остается открытым)
+    def commit(self, source, heights, min_z, max_z):
+        path = self.cache_path(source)
+        tmp_path = path + '.tmp'
+
+        try:
+            heights.flush()
+            offset = HEADER_DTYPE.fields['min_z'][1]
+            with open(tmp_path, 'r+b') as file:
+                file.seek(offset)
+                file.write(np.array([min_z, max_z], dtype='<f8').tobytes())
+            os.replace(tmp_path, path)
+            return True
+        except OSError as e:
+            print(f"Не удалось записать кеш: {e}")
+            return False
+
+    # Удаление временного файла потоковой записи
+    def discard(self, source):
+        tmp_path = self.cache_path(source) + '.tmp'
+        try:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        except OSError:
+            pass
@@ -0,0 +1,84 @@
+import os
+import threading
+import time
+from modules.file_parser import FDFParser, MAX_IMAGE_POINTS
+
+
+class BackgroundLoader:
+    # Загрузка файла в отдельном потоке: разбор, построение точек, линий
+    # и уровней детализации. Загрузка в видеопамять - в основном потоке
+    def __init__(self, max_image_points=MAX_IMAGE_POINTS):
+        self.max_image_points = max_image_points
+        self.thread = None
+        self.parser = None
+        self.filename = None
+        self.result = None
+        self.lock = threading.Lock()
+
+    # Запуск загрузки (False, если предыдущая загрузка не завершена)
+    def start(self, filename):
+        if self.is_loading():
+            return False
+
+        self.parser = FDFParser(max_image_points=self.max_image_points)
+        self.filename = filename
+        self.result = None
+        self.thread = threading.Thread(target=self._run,
+                                       args=(self.parser, filename),
+                                       daemon=True)
+        self.thread.start()
+        return True
+
+    # Работа потока загрузки
+    def _run(self, parser, filename):
+        points, lines = None, None
+        try:
+            points, lines = parser.parse_file(filename)
+
+            # Границы тайлов считаются здесь, а не в первом кадре
+            if parser.pyramid is not None:
+                start = time.perf_counter()
+                parser.pyramid.build_extremes()
+                parser.timings['bounds'] = time.perf_counter() - start
+        except Exception as e:
+            print(f"Ошибка загрузки файла {filename}: " +
+                  f"{type(e).__name__}: {e}")
+            points, lines = None, None
+        finally:
+            # Результат записывается всегда, иначе загрузка не завершится
+            with self.lock:
+                self.result = (parser, points, lines)
+
+    # Идет ли загрузка
+    def is_loading(self):
+        return self.thread is not None
+
+    # Имя файла, этап и доля выполненной работы (None без загрузки)
+    def get_progress(self):
+        if not self.is_loading():
+            return None
+        return os.path.basename(self.filename), self.parser.stage, \
+            self.parser.progress
+
+    # Готовый результат (parser, points, lines) или None, если загрузка
+    # еще идет. Результат возвращается один раз
+    def take_result(self):
+        if self.thread is None:
+            return None
+
+        # Поток проверяется до чтения результата: результат, записанный
+        # перед завершением потока, будет прочитан ниже
+        finished = not self.thread.is_alive()
+        with self.lock:
+            result = self.result
+            self.result = None
+
+        # Поток завершился без результата: загрузка считается неудачной
+        if result is None and finished:
+            result = (self.parser, None, None)
+
+        if result is not None:
+            self.thread.join()
+            self.thread = None
+            self.parser = None
+        return result
@@ -0,0 +1,271 @@
+import numpy as np
+from modules.heightfield import HeightField
+from modules.topology import GridTopology
+
+# Минимальная сторона самого грубого уровня
+MIN_LEVEL_SIZE = 2
+
+
+class HeightPyramid:
+    # Построение уровней: полное разрешение, 1/2, 1/4, ...
+    def __init__(self, data_array, scale_factor, z_offset, z_scale,
+                 colors=None, min_size=MIN_LEVEL_SIZE):
+        self.levels = [np.asarray(data_array, dtype=np.float32)]
+
+        # Исходные высоты копируются при первом изменении (массив парсера
+        # может быть отображением файла кеша)
+        self.owns_data = False
+        self.colors = colors
+        self.full_height, self.full_width = self.levels[0].shape
+
+        # Параметры нормализации (как в FDFParser.normalize_points)
+        self.scale_factor = scale_factor
+        self.z_offset = z_offset
+        self.z_scale = z_scale
+
+        while True:
+            height, width = self.levels[-1].shape
+            if (height + 1) // 2 < min_size or (width + 1) // 2 < min_size:
+                break
+            self.levels.append(self._downsample(self.levels[-1]))
+
+        # Минимумы и максимумы блоков для границ частей уровней
+        # (создаются при первом запросе границ)
+        self.min_levels = None
+        self.max_levels = None
+
+    # Дополнение нечетной последней строки/столбца повтором
+    @staticmethod
+    def _pad_even(data):
+        height, width = data.shape
+        if height % 2:
+            data = np.concatenate([data, data[-1:]], axis=0)
+        if width % 2:
+            data = np.concatenate([data, data[:, -1:]], axis=1)
+        return data
+
+    # Уменьшение в 2 раза усреднением блоков 2x2
+    @staticmethod
+    def _downsample(data):
+        data = HeightPyramid._pad_even(data)
+        result = data[0::2, 0::2] + data[1::2, 0::2]
+        result += data[0::2, 1::2]
+        result += data[1::2, 1::2]
+        result *= 0.25
+        return result
+
+    # Уменьшение в 2 раза выбором минимума или максимума блоков 2x2
+    @staticmethod
+    def _reduce(data, func):
+        data = HeightPyramid._pad_even(data)
+        result = func(data[0::2, 0::2], data[1::2, 0::2])
+        func(result, data[0::2, 1::2], out=result)
+        func(result, data[1::2, 1::2], out=result)
+        return result
+
+    # Пересчет части region уровня level по уровню level - 1: усреднение
+    # (func=None) или минимум/максимум (func) блоков 2x2 - те же
+    # значения, что и при построении уровня целиком
+    @staticmethod
+    def _update_level(levels, level, region, func=None):
+        row_start, row_stop, col_start, col_stop = region
+        height, width = levels[level - 1].shape
+        source = levels[level - 1][2 * row_start:min(2 * row_stop, height),
+                                   2 * col_start:min(2 * col_stop, width)]
+        if func is None:
+            block = HeightPyramid._downsample(source)
+        else:
+            block = HeightPyramid._reduce(source, func)
+        levels[level][row_start:row_stop, col_start:col_stop] = block
+
+    # Замена исходных высот (строки y0.., столбцы x0..) и пересчет этой
+    # области на всех уровнях и в пирамидах минимумов и максимумов (если
+    # они построены). Возвращает измененную часть каждого уровня:
+    # (row_start, row_stop, col_start, col_stop)
+    def update_region(self, x0, y0, heights):
+        heights = np.asarray(heights, dtype=np.float32)
+        rows, cols = heights.shape
+        if not self.owns_data:
+            self.levels[0] = np.array(self.levels[0])
+            self.owns_data = True
+            if self.min_levels is not None:
+                self.min_levels[0] = self.levels[0]
+                self.max_levels[0] = self.levels[0]
+        self.levels[0][y0:y0 + rows, x0:x0 + cols] = heights
+
+        # Строки r..r2 уровня - строки r // 2..r2 // 2 следующего уровня
+        regions = [(y0, y0 + rows, x0, x0 + cols)]
+        level = 1
+        while level < len(self.levels):
+            row_start, row_stop, col_start, col_stop = regions[-1]
+            region = (row_start // 2, (row_stop + 1) // 2,
+                      col_start // 2, (col_stop + 1) // 2)
+            self._update_level(self.levels, level, region)
+            if self.min_levels is not None:
+                self._update_level(self.min_levels, level, region,
+                                   np.minimum)
+                self._update_level(self.max_levels, level, region,
+                                   np.maximum)
+            regions.append(region)
+            level += 1
+        return regions
+
+    # Наименьшая и наибольшая исходная высота (по самому грубому уровню
+    # пирамид минимумов и максимумов)
+    def height_range(self):
+        if self.min_levels is None:
+            self.build_extremes()
+        return self.min_levels[-1].min(), self.max_levels[-1].max()
+
+    # Пирамиды минимумов и максимумов того же размера, что и уровни
+    # (строятся при первом запросе границ или заранее в потоке загрузки)
+    def build_extremes(self):
+        self.min_levels = [self.levels[0]]
+        self.max_levels = [self.levels[0]]
+        while len(self.min_levels) < len(self.levels):
+            self.min_levels.append(self._reduce(self.min_levels[-1],
+                                                np.minimum))
+            self.max_levels.append(self._reduce(self.max_levels[-1],
+                                                np.maximum))
+
+    # Количество уровней
+    def level_count(self):
+        return len(self.levels)
+
+    # Размер уровня (ширина, высота)
+    def level_size(self, level):
+        height, width = self.levels[level].shape
+        return width, height
+
+    # Расстояние между соседними вершинами уровня (после нормализации)
+    def cell_size(self, level):
+        width, height = self.level_size(level)
+        step_x = (self.full_width - 1) / max(width - 1, 1)
+        step_y = (self.full_height - 1) / max(height - 1, 1)
+        return max(step_x, step_y) * self.scale_factor
+
+    # Индексы исходных строк и столбцов, ближайших к вершинам уровня
+    def _source_indices(self, level):
+        width, height = self.level_size(level)
+        rows = np.linspace(0, self.full_height - 1, height)
+        cols = np.linspace(0, self.full_width - 1, width)
+        return rows, cols
+
+    # Нормализованные точки уровня (N, 3) float32; region - часть уровня
+    # (row_start, row_stop, col_start, col_stop)
+    def level_points(self, level, region=None):
+        rows, cols = self._source_indices(level)
+        data = self.levels[level]
+        if region is not None:
+            row_start, row_stop, col_start, col_stop = region
+            rows = rows[row_start:row_stop]
+            cols = cols[col_start:col_stop]
+            data = data[row_start:row_stop, col_start:col_stop]
+        height, width = data.shape
+
+        # Уровень покрывает ту же область, что и полное разрешение
+        points = np.empty((height * width, 3), dtype=np.float32)
+        points[:, 0] = np.tile((cols - self.full_width / 2) *
+                               self.scale_factor, height)
+        points[:, 1] = np.repeat(-(rows - self.full_height / 2) *
+                                 self.scale_factor, width)
+        points[:, 2] = self._normalize(data).ravel()
+        return points
+
+    # Нормализация высот (как в FDFParser.normalize_points)
+    def _normalize(self, data):
+        return (data - self.z_offset) * self.z_scale
+
+    # Нормализованные высоты уровня (или его части region)
+    def level_heights(self, level, region=None):
+        data = self.levels[level]
+        if region is not None:
+            row_start, row_stop, col_start, col_stop = region
+            data = data[row_start:row_stop, col_start:col_stop]
+        return self._normalize(data)
+
+    # Уровень (или его часть region) без X и Y: нормализованные высоты,
+    # начало и шаг сетки (quantize - высоты в uint16)
+    def level_heightfield(self, level, region=None, quantize=False):
+        width, height = self.level_size(level)
+        rows, cols = self._source_indices(level)
+        data = self.levels[level]
+        if region is not None:
+            row_start, row_stop, col_start, col_stop = region
+            rows = rows[row_start:row_stop]
+            cols = cols[col_start:col_stop]
+            data = data[row_start:row_stop, col_start:col_stop]
+
+        # Шаг между соседними вершинами уровня (как в np.linspace)
+        step_x = (self.full_width - 1) / max(width - 1, 1)
+        step_y = (self.full_height - 1) / max(height - 1, 1)
+        origin = ((cols[0] - self.full_width / 2) * self.scale_factor,
+                  -(rows[0] - self.full_height / 2) * self.scale_factor)
+        step = (step_x * self.scale_factor, -step_y * self.scale_factor)
+
+        return HeightField(self._normalize(data), origin, step, quantize)
+
+    # Цвета точек уровня (ближайшая исходная точка) или None
+    def level_colors(self, level, region=None):
+        if self.colors is None:
+            return None
+
+        rows, cols = self._source_indices(level)
+        if region is not None:
+            row_start, row_stop, col_start, col_stop = region
+            rows = rows[row_start:row_stop]
+            cols = cols[col_start:col_stop]
+        rows = np.rint(rows).astype(np.intp)
+        cols = np.rint(cols).astype(np.intp)
+        return np.asarray(self.colors)[np.ix_(rows, cols)].ravel()
+
+    # Ограничивающий параллелепипед части уровня: (min xyz, max xyz).
+    # Граница расширена на одну ячейку и учитывает высоты всех более
+    # детальных уровней в этой области
+    def region_bounds(self, level, region):
+        if self.min_levels is None:
+            self.build_extremes()
+
+        width, height = self.level_size(level)
+        row_start = max(region[0] - 1, 0)
+        row_stop = min(region[1] + 1, height)
+        col_start = max(region[2] - 1, 0)
+        col_stop = min(region[3] + 1, width)
+
+        rows, cols = self._source_indices(level)
+        low = self.min_levels[level][row_start:row_stop, col_start:col_stop]
+        high = self.max_levels[level][row_start:row_stop, col_start:col_stop]
+
+        box_min = np.array([
+            (cols[col_start] - self.full_width / 2) * self.scale_factor,
+            -(rows[row_stop - 1] - self.full_height / 2) * self.scale_factor,
+            (low.min() - self.z_offset) * self.z_scale
+        ])
+        box_max = np.array([
+            (cols[col_stop - 1] - self.full_width / 2) * self.scale_factor,
+            -(rows[row_start] - self.full_height / 2) * self.scale_factor,
+            (high.max() - self.z_offset) * self.z_scale
+        ])
+        return box_min, box_max
+
+    # Линии полной сетки уровня (общий массив для сеток этого размера)
+    def level_lines(self, level):
+        width, height = self.level_size(level)
+        return GridTopology(width, height).lines()
+
+    # Выбор уровня: самый грубый, у которого ячейка на экране не больше
+    # max_cell_pixels, но не детальнее, чем позволяет max_vertices
+    def select_level(self, pixels_per_unit, max_cell_pixels, max_vertices):
+        level = 0
+        while level + 1 < self.level_count() and \
+                self.cell_size(level + 1) * pixels_per_unit <= \
+                max_cell_pixels:
+            level += 1
+
+        while level + 1 < self.level_count():
+            width, height = self.level_size(level)
+            if width * height <= max_vertices:
+                break
+            level += 1
+
+        return level
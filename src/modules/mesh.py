@@ -0,0 +1,277 @@
+import ctypes
+import numpy as np
+from OpenGL.GL import glBegin, glColor3f, glVertex3f, glEnd, glGenBuffers, \
+    glBindBuffer, glBufferData, glBufferSubData, glDeleteBuffers, \
+    glEnableClientState, glDisableClientState, glVertexPointer, \
+    glColorPointer, glDrawElements, glPrimitiveRestartIndex, \
+    glEnableVertexAttribArray, \
+    glDisableVertexAttribArray, glVertexAttribPointer, GL_LINES, \
+    GL_LINE_STRIP, GL_ARRAY_BUFFER, GL_ELEMENT_ARRAY_BUFFER, \
+    GL_STATIC_DRAW, GL_VERTEX_ARRAY, GL_COLOR_ARRAY, GL_FLOAT, \
+    GL_UNSIGNED_SHORT, GL_UNSIGNED_INT, GL_FALSE
+from OpenGL.error import GLError, NullFunctionError
+from modules.shaders import HEIGHT_ATTRIBUTE
+
+# Размер одной вершины в буфере: x, y, z, r, g, b (float32)
+VERTEX_STRIDE = 6 * 4
+
+
+# Тип индексов для сетки из num_vertices вершин (uint16, если
+# помещаются, иначе uint32). В полосах наибольшее значение типа
+# зарезервировано для перезапуска примитива
+def index_type(num_vertices, line_strips=False):
+    if num_vertices + int(line_strips) <= 65536:
+        return np.uint16
+    return np.uint32
+
+
+class WireframeMesh:
+    # Вершины, цвета (N, 3) и индексы линий одной сетки. Индексы нужного
+    # типа используются без копирования (общие для сеток одного размера).
+    # line_strips - индексы полос (GL_LINE_STRIP), разделенных
+    # наибольшим значением типа индексов (перезапуск примитива)
+    def __init__(self, vertices, lines, colors, line_strips=False):
+        self.vertices = np.ascontiguousarray(vertices, dtype=np.float32). \
+            reshape(-1, 3)
+        self.colors = colors
+        self._set_indices(lines, len(self.vertices), line_strips)
+
+        self.vbo = None
+        self.ibo = None
+
+        # Буфер индексов может быть общим (принадлежит рендереру)
+        self.owns_ibo = True
+
+    # Индексы линий или полос для сетки из num_vertices вершин
+    def _set_indices(self, lines, num_vertices, line_strips):
+        self.indices = np.asarray(lines,
+                                  dtype=index_type(num_vertices,
+                                                   line_strips)).ravel()
+
+        self.line_strips = line_strips
+        self.restart_index = int(np.iinfo(self.indices.dtype).max)
+        if line_strips:
+            # Полоса из k вершин и индекса перезапуска - k - 1 линий
+            restarts = np.count_nonzero(self.indices == self.restart_index)
+            self.line_count = len(self.indices) - 2 * restarts
+        else:
+            self.line_count = len(self.indices) // 2
+
+    # Использование общего буфера индексов (загружен рендерером)
+    def share_index_buffer(self, ibo):
+        self.ibo = ibo
+        self.owns_ibo = False
+
+    # Количество линий
+    def num_lines(self):
+        return self.line_count
+
+    # Количество вершин
+    def num_vertices(self):
+        return len(self.vertices)
+
+    # Объем данных вершин в видеопамяти (байты)
+    def vertex_bytes(self):
+        return self.num_vertices() * VERTEX_STRIDE
+
+    # Загрузка вершин и индексов в видеопамять
+    def upload(self):
+        self.upload_vertices()
+        if not self.owns_ibo:
+            return
+
+        if self.ibo is None:
+            self.ibo = glGenBuffers(1)
+
+        glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, self.ibo)
+        glBufferData(GL_ELEMENT_ARRAY_BUFFER, self.indices.nbytes,
+                     self.indices, GL_STATIC_DRAW)
+        glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, 0)
+
+    # Чередование координат и цветов вершин start..stop - 1:
+    # [x, y, z, r, g, b] на вершину
+    def _interleaved(self, start, stop):
+        interleaved = np.empty((stop - start, 6), dtype=np.float32)
+        interleaved[:, :3] = self.vertices[start:stop]
+        interleaved[:, 3:] = self.colors[start:stop]
+        return interleaved
+
+    # Загрузка вершин и цветов в буфер вершин (VBO)
+    def upload_vertices(self):
+        interleaved = self._interleaved(0, len(self.vertices))
+
+        if self.vbo is None:
+            self.vbo = glGenBuffers(1)
+
+        glBindBuffer(GL_ARRAY_BUFFER, self.vbo)
+        glBufferData(GL_ARRAY_BUFFER, interleaved.nbytes, interleaved,
+                     GL_STATIC_DRAW)
+        glBindBuffer(GL_ARRAY_BUFFER, 0)
+
+    # Обновление вершин start..stop - 1 в буфере вершин (glBufferSubData)
+    # после изменения их координат или цветов
+    def update_vertices(self, start, stop):
+        if self.vbo is None:
+            return
+
+        interleaved = self._interleaved(start, stop)
+        glBindBuffer(GL_ARRAY_BUFFER, self.vbo)
+        glBufferSubData(GL_ARRAY_BUFFER, start * VERTEX_STRIDE,
+                        interleaved.nbytes, interleaved)
+        glBindBuffer(GL_ARRAY_BUFFER, 0)
+
+    # Замена цветов вершин
+    def set_colors(self, colors):
+        self.colors = colors
+        if self.vbo is not None:
+            self.upload_vertices()
+
+    # Отрисовка: из видеопамяти одним вызовом или в непосредственном режиме
+    def draw(self):
+        if self.vbo is not None and self.ibo is not None:
+            self._draw_buffers()
+        else:
+            self._draw_immediate()
+
+    # Отрисовка из буфера вершин
+    def _draw_buffers(self):
+        glBindBuffer(GL_ARRAY_BUFFER, self.vbo)
+        glEnableClientState(GL_VERTEX_ARRAY)
+        glEnableClientState(GL_COLOR_ARRAY)
+
+        glVertexPointer(3, GL_FLOAT, VERTEX_STRIDE, ctypes.c_void_p(0))
+        glColorPointer(3, GL_FLOAT, VERTEX_STRIDE, ctypes.c_void_p(12))
+        self._draw_elements()
+
+        glDisableClientState(GL_COLOR_ARRAY)
+        glDisableClientState(GL_VERTEX_ARRAY)
+        glBindBuffer(GL_ARRAY_BUFFER, 0)
+
+    # Отрисовка по буферу индексов (буфер вершин уже подключен)
+    def _draw_elements(self):
+        glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, self.ibo)
+        if self.indices.dtype == np.uint16:
+            gl_index_type = GL_UNSIGNED_SHORT
+        else:
+            gl_index_type = GL_UNSIGNED_INT
+
+        # Перезапуск примитива включается рендерером для всех сеток
+        if self.line_strips:
+            glPrimitiveRestartIndex(self.restart_index)
+            glDrawElements(GL_LINE_STRIP, len(self.indices), gl_index_type,
+                           ctypes.c_void_p(0))
+        else:
+            glDrawElements(GL_LINES, len(self.indices), gl_index_type,
+                           ctypes.c_void_p(0))
+        glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, 0)
+
+    # Отрисовка в непосредственном режиме
+    def _draw_immediate(self):
+        mode = GL_LINE_STRIP if self.line_strips else GL_LINES
+        glBegin(mode)
+
+        vertices = self.vertices
+        colors = self.colors
+        indices = self.indices
+
+        # Отрисовка через предподготовленные данные
+        i = 0
+        num_indices = len(indices)
+        while i < num_indices:
+            idx = indices[i]
+            if self.line_strips and idx == self.restart_index:
+                # Начало следующей полосы
+                glEnd()
+                glBegin(mode)
+            else:
+                glColor3f(colors[idx, 0], colors[idx, 1], colors[idx, 2])
+                glVertex3f(vertices[idx, 0], vertices[idx, 1],
+                           vertices[idx, 2])
+            i += 1
+
+        glEnd()
+
+    # Удаление буферов из видеопамяти
+    def delete(self):
+        buffers = []
+        if self.vbo is not None:
+            buffers.append(self.vbo)
+        if self.ibo is not None and self.owns_ibo:
+            buffers.append(self.ibo)
+
+        if buffers:
+            try:
+                glDeleteBuffers(len(buffers), buffers)
+            except (GLError, NullFunctionError):
+                pass
+        self.vbo = None
+        self.ibo = None
+
+
+class HeightFieldMesh(WireframeMesh):
+    # Сетка карты высот (HeightField): в буфере вершин только высота
+    # (4 байта float32 или 2 байта uint16 вместо 24 байт координат и
+    # цвета), X и Y вычисляются шейдером HeightFieldShader по номеру
+    # вершины, цвет - по высоте. Рисуется только из видеопамяти
+    def __init__(self, heightfield, lines, shader, line_strips=False):
+        self.heightfield = heightfield
+        self.shader = shader
+        self.colors = None
+        self._set_indices(lines, heightfield.num_vertices(), line_strips)
+
+        self.vbo = None
+        self.ibo = None
+        self.owns_ibo = True
+
+    # Точки (N, 3), восстановленные на CPU (для отрисовки без шейдера)
+    @property
+    def vertices(self):
+        return self.heightfield.points()
+
+    # Количество вершин
+    def num_vertices(self):
+        return self.heightfield.num_vertices()
+
+    # Объем данных вершин в видеопамяти (байты)
+    def vertex_bytes(self):
+        return self.heightfield.vertex_bytes()
+
+    # Загрузка высот в буфер вершин
+    def upload_vertices(self):
+        if self.vbo is None:
+            self.vbo = glGenBuffers(1)
+
+        heights = self.heightfield.heights
+        glBindBuffer(GL_ARRAY_BUFFER, self.vbo)
+        glBufferData(GL_ARRAY_BUFFER, heights.nbytes, heights,
+                     GL_STATIC_DRAW)
+        glBindBuffer(GL_ARRAY_BUFFER, 0)
+
+    # Обновление высот вершин start..stop - 1 в буфере вершин
+    def update_vertices(self, start, stop):
+        heights = self.heightfield.heights.ravel()[start:stop]
+        glBindBuffer(GL_ARRAY_BUFFER, self.vbo)
+        glBufferSubData(GL_ARRAY_BUFFER, start * heights.itemsize,
+                        heights.nbytes, heights)
+        glBindBuffer(GL_ARRAY_BUFFER, 0)
+
+    # Цвета вычисляются в шейдере
+    def set_colors(self, colors):
+        pass
+
+    # Отрисовка из видеопамяти (шейдер включен рендерером)
+    def draw(self):
+        if self.heightfield.is_quantized():
+            height_type = GL_UNSIGNED_SHORT
+        else:
+            height_type = GL_FLOAT
+
+        self.shader.set_grid(self.heightfield)
+        glBindBuffer(GL_ARRAY_BUFFER, self.vbo)
+        glEnableVertexAttribArray(HEIGHT_ATTRIBUTE)
+        glVertexAttribPointer(HEIGHT_ATTRIBUTE, 1, height_type, GL_FALSE, 0,
+                              ctypes.c_void_p(0))
+        self._draw_elements()
+
+        glDisableVertexAttribArray(HEIGHT_ATTRIBUTE)
+        glBindBuffer(GL_ARRAY_BUFFER, 0)
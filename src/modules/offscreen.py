@@ -0,0 +1,135 @@
+import ctypes
+import os
+import numpy as np
+import pygame
+from OpenGL.GL import glGenFramebuffers, glBindFramebuffer, \
+    glGenRenderbuffers, glBindRenderbuffer, glRenderbufferStorage, \
+    glFramebufferRenderbuffer, glCheckFramebufferStatus, \
+    glDeleteFramebuffers, glDeleteRenderbuffers, glReadPixels, \
+    glPixelStorei, glViewport, GL_FRAMEBUFFER, GL_RENDERBUFFER, GL_RGBA8, \
+    GL_DEPTH_COMPONENT24, GL_COLOR_ATTACHMENT0, GL_DEPTH_ATTACHMENT, \
+    GL_FRAMEBUFFER_COMPLETE, GL_RGB, GL_UNSIGNED_BYTE, GL_PACK_ALIGNMENT
+from OpenGL.error import GLError, NullFunctionError
+
+
+class OffscreenContext:
+    # Контекст OpenGL без видимого окна и буфер кадра width x height.
+    # С PYOPENGL_PLATFORM=egl контекст создается через EGL (серверы без
+    # дисплея), иначе - через скрытое окно pygame
+    def __init__(self, width, height):
+        self.width = width
+        self.height = height
+        self.egl = None
+        self.egl_display = None
+        self.pygame_window = False
+        self.framebuffer = None
+        self.renderbuffers = []
+
+        if os.environ.get('PYOPENGL_PLATFORM') == 'egl':
+            self._create_egl_context()
+        else:
+            self._create_hidden_window()
+
+        try:
+            self._create_framebuffer()
+        except (GLError, NullFunctionError, RuntimeError):
+            self.delete()
+            raise
+
+    # Контекст EGL с минимальной поверхностью (рисование - в буфер кадра)
+    def _create_egl_context(self):
+        from OpenGL import EGL
+
+        display = EGL.eglGetDisplay(EGL.EGL_DEFAULT_DISPLAY)
+        if not EGL.eglInitialize(display, None, None):
+            raise RuntimeError("Не удалось инициализировать EGL")
+        self.egl = EGL
+        self.egl_display = display
+
+        attributes = (EGL.EGLint * 5)(
+            EGL.EGL_SURFACE_TYPE, EGL.EGL_PBUFFER_BIT,
+            EGL.EGL_RENDERABLE_TYPE, EGL.EGL_OPENGL_BIT,
+            EGL.EGL_NONE
+        )
+        config = EGL.EGLConfig()
+        count = EGL.EGLint()
+        EGL.eglChooseConfig(display, attributes, ctypes.pointer(config), 1,
+                            ctypes.pointer(count))
+        if count.value == 0:
+            raise RuntimeError("Нет подходящей конфигурации EGL")
+
+        size = (EGL.EGLint * 5)(EGL.EGL_WIDTH, 1, EGL.EGL_HEIGHT, 1,
+                                EGL.EGL_NONE)
+        surface = EGL.eglCreatePbufferSurface(display, config, size)
+        EGL.eglBindAPI(EGL.EGL_OPENGL_API)
+        context = EGL.eglCreateContext(display, config, EGL.EGL_NO_CONTEXT,
+                                       None)
+        if not EGL.eglMakeCurrent(display, surface, surface, context):
+            raise RuntimeError("Не удалось активировать контекст EGL")
+
+    # Контекст OpenGL скрытого окна pygame (один раз на процесс)
+    def _create_hidden_window(self):
+        pygame.display.init()
+        pygame.display.set_mode((1, 1), pygame.OPENGL | pygame.HIDDEN)
+        self.pygame_window = True
+
+    # Буфер кадра с цветом и глубиной
+    def _create_framebuffer(self):
+        self.framebuffer = glGenFramebuffers(1)
+        glBindFramebuffer(GL_FRAMEBUFFER, self.framebuffer)
+
+        color_buffer = glGenRenderbuffers(1)
+        glBindRenderbuffer(GL_RENDERBUFFER, color_buffer)
+        glRenderbufferStorage(GL_RENDERBUFFER, GL_RGBA8, self.width,
+                              self.height)
+        glFramebufferRenderbuffer(GL_FRAMEBUFFER, GL_COLOR_ATTACHMENT0,
+                                  GL_RENDERBUFFER, color_buffer)
+
+        depth_buffer = glGenRenderbuffers(1)
+        glBindRenderbuffer(GL_RENDERBUFFER, depth_buffer)
+        glRenderbufferStorage(GL_RENDERBUFFER, GL_DEPTH_COMPONENT24,
+                              self.width, self.height)
+        glFramebufferRenderbuffer(GL_FRAMEBUFFER, GL_DEPTH_ATTACHMENT,
+                                  GL_RENDERBUFFER, depth_buffer)
+        glBindRenderbuffer(GL_RENDERBUFFER, 0)
+        self.renderbuffers = [color_buffer, depth_buffer]
+
+        if glCheckFramebufferStatus(GL_FRAMEBUFFER) != \
+                GL_FRAMEBUFFER_COMPLETE:
+            raise RuntimeError("Буфер кадра не готов к отрисовке")
+
+    # Включение буфера кадра для отрисовки
+    def bind(self):
+        glBindFramebuffer(GL_FRAMEBUFFER, self.framebuffer)
+        glViewport(0, 0, self.width, self.height)
+
+    # Чтение изображения (height, width, 3) uint8, первая строка сверху
+    def read_pixels(self):
+        glBindFramebuffer(GL_FRAMEBUFFER, self.framebuffer)
+        glPixelStorei(GL_PACK_ALIGNMENT, 1)
+        data = glReadPixels(0, 0, self.width, self.height, GL_RGB,
+                            GL_UNSIGNED_BYTE)
+        image = np.frombuffer(data, dtype=np.uint8). \
+            reshape(self.height, self.width, 3)
+        return image[::-1].copy()
+
+    # Удаление буфера кадра и контекста
+    def delete(self):
+        try:
+            if self.framebuffer is not None:
+                glBindFramebuffer(GL_FRAMEBUFFER, 0)
+                glDeleteFramebuffers(1, [self.framebuffer])
+            if self.renderbuffers:
+                glDeleteRenderbuffers(len(self.renderbuffers),
+                                      self.renderbuffers)
+        except (GLError, NullFunctionError):
+            pass
+        self.framebuffer = None
+        self.renderbuffers = []
+
+        if self.egl_display is not None:
+            self.egl.eglTerminate(self.egl_display)
+            self.egl_display = None
+        if self.pygame_window:
+            pygame.display.quit()
+            self.pygame_window = False
@@ -0,0 +1,219 @@
+import csv
+import json
+import os
+import time
+from collections import deque
+import numpy as np
+
+# Количество кадров в скользящем окне статистики
+PROFILE_WINDOW = 240
+
+# Период обновления строк профиля на экране (секунды)
+PROFILE_UPDATE_INTERVAL = 0.5
+
+# Порядок этапов загрузки в отчете
+LOAD_STAGES = ['parse', 'geometry', 'normalize', 'pyramid', 'bounds',
+               'build_wireframe']
+
+
+class FrameProfiler:
+    # Время этапов кадра (скользящее среднее, p95, максимум), счетчики
+    # отрисовки и время этапов загрузки. Время измеряется на CPU: для
+    # команд OpenGL это время передачи драйверу, ожидание видеокарты
+    # попадает в этап вывода кадра (flip)
+    def __init__(self, window=PROFILE_WINDOW):
+        self.window = window
+        self.visible = False
+
+        # Этапы в порядке первого измерения и их значения (мс)
+        self.stages = []
+        self.samples = {}
+        self.counters = {}
+
+        # Текущий кадр
+        self.frame = 0
+        self.frame_values = {}
+        self.mark_time = 0.0
+
+        # Время этапов последней загрузки (секунды)
+        self.load_name = None
+        self.load_timings = {}
+
+        # Все кадры для файла трассировки (None - запись выключена)
+        self.trace = None
+        self.trace_start = time.perf_counter()
+
+        self.hud_lines = []
+        self.hud_updated = 0.0
+
+    # Начало кадра
+    def begin_frame(self):
+        self.frame_values = {}
+        self.mark_time = time.perf_counter()
+
+    # Завершение этапа: время с предыдущей отметки (или начала кадра)
+    def mark(self, stage):
+        now = time.perf_counter()
+        self.frame_values[stage] = self.frame_values.get(stage, 0.0) + \
+            (now - self.mark_time) * 1000
+        self.mark_time = now
+
+    # Значение счетчика кадра (вызовы отрисовки, вершины и т.п.)
+    def set_counter(self, name, value):
+        self.counters[name] = value
+
+    # Завершение кадра: значения добавляются в окно статистики
+    def end_frame(self):
+        total = 0.0
+        stages = list(self.frame_values)
+        idx = 0
+        while idx < len(stages):
+            stage = stages[idx]
+            if stage not in self.samples:
+                self.stages.append(stage)
+                self.samples[stage] = deque(maxlen=self.window)
+            self.samples[stage].append(self.frame_values[stage])
+            total += self.frame_values[stage]
+            idx += 1
+
+        if 'total' not in self.samples:
+            self.samples['total'] = deque(maxlen=self.window)
+        self.samples['total'].append(total)
+
+        if self.trace is not None:
+            row = {
+                'frame': self.frame,
+                'time': time.perf_counter() - self.trace_start,
+                'total': total
+            }
+            row.update(self.frame_values)
+            row.update(self.counters)
+            self.trace.append(row)
+
+        self.frame += 1
+
+    # Среднее, 95-й процентиль и максимум этапа за окно (мс)
+    def stage_stats(self, stage):
+        values = self.samples.get(stage)
+        if not values:
+            return 0.0, 0.0, 0.0
+
+        array = np.fromiter(values, dtype=np.float64, count=len(values))
+        return float(array.mean()), float(np.percentile(array, 95)), \
+            float(array.max())
+
+    # Время этапов загрузки файла (секунды)
+    def set_load_timings(self, name, timings):
+        self.load_name = name
+        self.load_timings = dict(timings)
+        print(f"Время загрузки {name}: {self._load_summary()}")
+
+    # Строка времени этапов загрузки
+    def _load_summary(self):
+        parts = []
+        idx = 0
+        while idx < len(LOAD_STAGES):
+            stage = LOAD_STAGES[idx]
+            if stage in self.load_timings:
+                parts.append(f"{stage} {self.load_timings[stage]:.3f} с")
+            idx += 1
+        return ", ".join(parts)
+
+    # Показ/скрытие профиля на экране
+    def toggle(self):
+        self.visible = not self.visible
+        self.hud_updated = 0.0
+        state = "включен" if self.visible else "выключен"
+        print(f"Профиль кадра {state}")
+
+    # Строки профиля для информационной панели (обновляются раз в
+    # полсекунды, чтобы не перерисовывать текст каждый кадр)
+    def get_hud_lines(self):
+        if not self.visible:
+            return []
+
+        now = time.perf_counter()
+        if now - self.hud_updated < PROFILE_UPDATE_INTERVAL:
+            return self.hud_lines
+        self.hud_updated = now
+
+        count = len(self.samples.get('total', ()))
+        lines = ["", f"Профиль ({count} кадров), мс: среднее / p95 / макс"]
+
+        stages = self.stages + ['total']
+        idx = 0
+        while idx < len(stages):
+            mean, p95, peak = self.stage_stats(stages[idx])
+            lines.append(f"  {stages[idx]}: {mean:.2f} / {p95:.2f} / " +
+                         f"{peak:.2f}")
+            idx += 1
+
+        names = list(self.counters)
+        idx = 0
+        while idx < len(names):
+            lines.append(f"  {names[idx]}: {self.counters[names[idx]]}")
+            idx += 1
+
+        if self.load_timings:
+            lines.append(f"Загрузка: {self._load_summary()}")
+
+        if self.trace is not None:
+            lines.append(f"Запись трассировки: {len(self.trace)} кадров")
+
+        self.hud_lines = lines
+        return lines
+
+    # Включение записи всех кадров для файла трассировки
+    def start_trace(self):
+        self.trace = []
+        self.trace_start = time.perf_counter()
+
+    # Сводка: статистика этапов за окно и время загрузки
+    def summary(self):
+        stages = {}
+        names = self.stages + ['total']
+        idx = 0
+        while idx < len(names):
+            mean, p95, peak = self.stage_stats(names[idx])
+            stages[names[idx]] = {'mean': mean, 'p95': p95, 'max': peak}
+            idx += 1
+
+        return {
+            'frames': self.frame,
+            'window': self.window,
+            'stages': stages,
+            'counters': dict(self.counters),
+            'load_file': self.load_name,
+            'load': dict(self.load_timings)
+        }
+
+    # Запись трассировки: CSV (строка на кадр) или JSON (сводка и кадры)
+    def dump(self, filename):
+        frames = self.trace if self.trace is not None else []
+        try:
+            if os.path.splitext(filename)[1].lower() == '.json':
+                data = self.summary()
+                data['trace'] = frames
+                with open(filename, 'w', encoding='utf-8') as f:
+                    json.dump(data, f, indent=1)
+            else:
+                self._dump_csv(filename, frames)
+        except OSError as e:
+            print(f"Ошибка записи трассировки {filename}: {e}")
+            return False
+
+        print(f"Трассировка записана: {filename} ({len(frames)} кадров)")
+        return True
+
+    # Запись кадров в CSV (столбцы - этапы и счетчики)
+    def _dump_csv(self, filename, frames):
+        columns = ['frame', 'time', 'total'] + self.stages + \
+            list(self.counters)
+        with open(filename, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.DictWriter(f, fieldnames=columns, restval='',
+                                    extrasaction='ignore')
+            writer.writeheader()
+            idx = 0
+            while idx < len(frames):
+                writer.writerow(frames[idx])
+                idx += 1
@@ -0,0 +1,151 @@
+import math
+import numpy as np
+
+# Наибольшее количество точек линий, обрабатываемых за один проход
+MAX_SAMPLES_PER_BATCH = 1 << 22
+
+
+# Матрица перспективной проекции (как gluPerspective), по строкам
+def perspective_matrix(fov, aspect_ratio, near, far):
+    focal = 1.0 / math.tan(math.radians(fov) / 2)
+    matrix = np.zeros((4, 4))
+    matrix[0, 0] = focal / aspect_ratio
+    matrix[1, 1] = focal
+    matrix[2, 2] = (far + near) / (near - far)
+    matrix[2, 3] = 2.0 * far * near / (near - far)
+    matrix[3, 2] = -1.0
+    return matrix
+
+
+class SoftwareRasterizer:
+    # Размер изображения и цвет фона (r, g, b, a от 0.0 до 1.0)
+    def __init__(self, width, height, background_color):
+        self.width = width
+        self.height = height
+        self.background = np.rint(np.asarray(background_color[:3]) * 255). \
+            astype(np.uint8)
+
+    # Отрисовка линий с буфером глубины: points (N, 3), lines (M, 2),
+    # colors (N, 3) от 0.0 до 1.0, матрицы 4x4 по строкам.
+    # Результат - изображение (height, width, 3) uint8, первая строка сверху
+    def render(self, points, lines, colors, projection, modelview):
+        image = np.empty((self.height, self.width, 3), dtype=np.uint8)
+        image[:] = self.background
+        depth = np.full(self.height * self.width, np.inf, dtype=np.float32)
+
+        segments = self._project_lines(points, lines, colors,
+                                       projection @ modelview)
+        if segments is None:
+            return image
+
+        # Линии разбиваются на пакеты с ограниченным количеством точек
+        lengths = segments[0]
+        ends = np.cumsum(lengths)
+        start = 0
+        while start < len(lengths):
+            limit = (ends[start - 1] if start > 0 else 0) + \
+                MAX_SAMPLES_PER_BATCH
+            stop = max(int(np.searchsorted(ends, limit, side='right')),
+                       start + 1)
+            self._draw_batch(image, depth, segments, start, stop)
+            start = stop
+
+        return image
+
+    # Проекция концов линий на экран и отсечение по границам изображения.
+    # Возвращает (количество точек, начало, конец, цвет начала,
+    # цвет конца) или None, если видимых линий нет
+    def _project_lines(self, points, lines, colors, matrix):
+        points = np.asarray(points, dtype=np.float64).reshape(-1, 3)
+        clip = points @ matrix[:, :3].T + matrix[:, 3]
+        w = clip[:, 3]
+
+        # Линии с концом за ближней плоскостью пропускаются
+        in_front = clip[:, 2] >= -w
+        lines = np.asarray(lines).reshape(-1, 2)
+        lines = lines[in_front[lines[:, 0]] & in_front[lines[:, 1]]]
+        if len(lines) == 0:
+            return None
+
+        screen = np.empty((len(points), 3))
+        screen[:, 0] = (clip[:, 0] / w + 1.0) * 0.5 * self.width
+        screen[:, 1] = (1.0 - clip[:, 1] / w) * 0.5 * self.height
+        screen[:, 2] = clip[:, 2] / w
+
+        begin = screen[lines[:, 0]]
+        end = screen[lines[:, 1]]
+        colors = np.asarray(colors, dtype=np.float32).reshape(-1, 3)
+        begin_colors = colors[lines[:, 0]]
+        end_colors = colors[lines[:, 1]]
+
+        # Отсечение отрезков прямоугольником изображения (Лян - Барски)
+        delta = end - begin
+        t_enter = np.zeros(len(lines))
+        t_exit = np.ones(len(lines))
+        visible = np.ones(len(lines), dtype=bool)
+        bounds = [
+            (-delta[:, 0], begin[:, 0]),
+            (delta[:, 0], self.width - begin[:, 0]),
+            (-delta[:, 1], begin[:, 1]),
+            (delta[:, 1], self.height - begin[:, 1])
+        ]
+        idx = 0
+        with np.errstate(divide='ignore', invalid='ignore'):
+            while idx < len(bounds):
+                p, q = bounds[idx]
+                visible &= (p != 0) | (q >= 0)
+                t = q / p
+                t_enter = np.where(p < 0, np.maximum(t_enter, t), t_enter)
+                t_exit = np.where(p > 0, np.minimum(t_exit, t), t_exit)
+                idx += 1
+        visible &= t_enter <= t_exit
+        if not visible.any():
+            return None
+
+        t_enter = t_enter[visible, None]
+        t_exit = t_exit[visible, None]
+        delta = delta[visible]
+        color_delta = end_colors[visible] - begin_colors[visible]
+        clipped_begin = begin[visible] + t_enter * delta
+        clipped_end = begin[visible] + t_exit * delta
+        begin_colors = begin_colors[visible] + t_enter * color_delta
+        end_colors = begin_colors + (t_exit - t_enter) * color_delta
+
+        # Точка на каждый пиксель по длинной оси отрезка
+        span = np.abs(clipped_end[:, :2] - clipped_begin[:, :2]).max(axis=1)
+        lengths = np.ceil(span).astype(np.int64) + 1
+        return lengths, clipped_begin, clipped_end, begin_colors, end_colors
+
+    # Отрисовка пакета линий [start, stop) с тестом глубины
+    def _draw_batch(self, image, depth, segments, start, stop):
+        lengths, begin, end, begin_colors, end_colors = segments
+        counts = lengths[start:stop]
+        line_idx = np.repeat(np.arange(start, stop), counts)
+
+        # Параметр точки вдоль отрезка от 0 до 1
+        offsets = np.cumsum(counts) - counts
+        steps = np.arange(len(line_idx)) - np.repeat(offsets, counts)
+        t = (steps / np.maximum(np.repeat(counts, counts) - 1, 1))[:, None]
+
+        samples = begin[line_idx] + t * (end[line_idx] - begin[line_idx])
+        x = np.floor(samples[:, 0]).astype(np.int64)
+        y = np.floor(samples[:, 1]).astype(np.int64)
+        z = samples[:, 2].astype(np.float32)
+
+        inside = (x >= 0) & (x < self.width) & (y >= 0) & \
+            (y < self.height) & (z >= -1.0) & (z <= 1.0)
+        pixel = y[inside] * self.width + x[inside]
+        z = z[inside]
+        if len(pixel) == 0:
+            return
+
+        # Ближайшая точка в каждом пикселе побеждает
+        np.minimum.at(depth, pixel, z)
+        nearest = z <= depth[pixel]
+
+        line_idx = line_idx[inside][nearest]
+        t = t[inside][nearest]
+        colors = begin_colors[line_idx] + \
+            t * (end_colors[line_idx] - begin_colors[line_idx])
+        image.reshape(-1, 3)[pixel[nearest]] = np.rint(
+            np.clip(colors, 0.0, 1.0) * 255).astype(np.uint8)
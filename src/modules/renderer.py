@@ -1,43 +1,94 @@
+import math
+import time
 import numpy as np
 import pygame
 from OpenGL.GL import glEnable, glClearColor, glViewport, glMatrixMode, \
     glLoadIdentity, glClear, glLineWidth, glBegin, glColor3f, glVertex3f, \
     glEnd, glPushMatrix, glDisable, glBlendFunc, glRasterPos2d, glDrawPixels, \
-    glPopMatrix, GL_DEPTH_TEST, GL_PROJECTION, GL_MODELVIEW, \
+    glPopMatrix, glGetFloatv, GL_DEPTH_TEST, GL_PROJECTION, GL_MODELVIEW, \
     GL_COLOR_BUFFER_BIT, GL_DEPTH_BUFFER_BIT, GL_LINES, GL_BLEND, \
-    GL_SRC_ALPHA, GL_ONE_MINUS_SRC_ALPHA, GL_RGBA, GL_UNSIGNED_BYTE
+    GL_SRC_ALPHA, GL_ONE_MINUS_SRC_ALPHA, GL_RGBA, GL_UNSIGNED_BYTE, \
+    GL_PROJECTION_MATRIX, GL_MODELVIEW_MATRIX
 from OpenGL.GLU import gluPerspective, gluOrtho2D
+from modules.colormap import Colormap
 from modules.graphics import SimpleRenderer
+from modules.terrain import Frustum
+from modules.text_overlay import TextOverlay, LINE_HEIGHT
+
+# Параметры сцены (общие для окна и экспорта без окна)
+BACKGROUND_COLOR = (0.1, 0.1, 0.1, 1.0)
+FIELD_OF_VIEW = 45.0
+NEAR_PLANE = 0.1
+FAR_PLANE = 100.0
+
+# Градиент по умолчанию
+DEFAULT_GRADIENT_COLORS = [
+    (0.0, 0.0, 1.0),   # Синий (низкие точки)
+    (0.0, 1.0, 1.0),   # Голубой
+    (0.0, 1.0, 0.0),   # Зеленый
+    (1.0, 1.0, 0.0),   # Желтый
+    (1.0, 0.0, 0.0)    # Красный (высокие точки)
+]
+DEFAULT_GRADIENT_POSITIONS = [0.0, 0.25, 0.5, 0.75, 1.0]
+
+# Справка (не меняется, рисуется из одной текстуры)
+HELP_LINES = [
+    "Управление:",
+    "ЛКМ + движение - вращение",
+    "Колесо мыши - масштаб",
+    "ESC - выход",
+    "",
+    "Градиенты:",
+    "1 - По умолчанию",
+    "2 - Земля/Горы",
+    "3 - Огонь",
+    "4 - Лед/Снег",
+    "",
+    "Файлы:",
+    "O - Открыть новый файл",
+    "R - Сбросить вид",
+    "T - Кеш текста вкл/выкл",
+    "P - Профиль кадра вкл/выкл"
+]
+
+# Период обновления строки со временем кадра (секунды)
+TIMING_UPDATE_INTERVAL = 0.5
 
 
 class Renderer:
-    # Инициализация значений
-    def __init__(self, width=1200, height=800):
+    # Инициализация значений. implicit_xy и quantize_heights - хранение
+    # тайлов без X и Y (см. SimpleRenderer)
+    def __init__(self, width=1200, height=800, implicit_xy=False,
+                 quantize_heights=False):
         self.width = width
         self.height = height
-        self.background_color = (0.1, 0.1, 0.1, 1.0)
+        self.background_color = BACKGROUND_COLOR
         self.line_color = (0.8, 0.8, 0.8, 1.0)
         self.grid_color = (0.3, 0.3, 0.3, 0.5)
+        self.fov = FIELD_OF_VIEW
 
         # Настраиваемые параметры градиента
-        self.gradient_colors = [
-            (0.0, 0.0, 1.0),   # Синий (низкие точки)
-            (0.0, 1.0, 1.0),   # Голубой
-            (0.0, 1.0, 0.0),   # Зеленый
-            (1.0, 1.0, 0.0),   # Желтый
-            (1.0, 0.0, 0.0)    # Красный (высокие точки)
-        ]
-        self.gradient_positions = [0.0, 0.25, 0.5, 0.75, 1.0]
+        self.gradient_colors = list(DEFAULT_GRADIENT_COLORS)
+        self.gradient_positions = list(DEFAULT_GRADIENT_POSITIONS)
 
         # Renderer объекты
-        self.renderer = SimpleRenderer()
+        self.renderer = SimpleRenderer(implicit_xy=implicit_xy,
+                                       quantize_heights=quantize_heights)
         self.current_points = None
         self.current_lines = None
+        self.current_colors = None
         self.current_min_z = 0
         self.current_max_z = 0
         self.current_width = 0
         self.current_height = 0
 
+        # Кеш текста информационной панели и время его отрисовки
+        self.text_overlay = None
+        self.use_text_cache = True
+        self.text_time = 0.0
+        self.timing_text = ""
+        self.timing_updated = 0.0
+
         # Инициализация Pygame и OpenGL
         pygame.init()
 
@@ -71,31 +122,59 @@ class Renderer:
         glMatrixMode(GL_PROJECTION)
         glLoadIdentity()
         aspect_ratio = self.width / float(self.height)
-        gluPerspective(45, aspect_ratio, 0.1, 100.0)
+        gluPerspective(self.fov, aspect_ratio, NEAR_PLANE, FAR_PLANE)
         glMatrixMode(GL_MODELVIEW)
         glLoadIdentity()
 
     # Функция очистки экрана
     def clear(self):
         glClear(GL_COLOR_BUFFER_BIT | GL_DEPTH_BUFFER_BIT)
+        self.renderer.reset_draw_stats()
 
     # Инициализация данных для модели
-    def init_wireframe(self, points, lines, min_z, max_z, width, height):
+    def init_wireframe(self, points, lines, min_z, max_z, width, height,
+                       colors=None, pyramid=None):
         # Сохранение данных для пересчета при изменении градиента
         self.current_points = points
         self.current_lines = lines
+        self.current_colors = colors
         self.current_min_z = min_z
         self.current_max_z = max_z
         self.current_width = width
         self.current_height = height
 
-        # Создание данных для проволочной модели
+        # Создание данных для проволочной модели (цвета из файла имеют
+        # приоритет над градиентом до первого переключения градиента)
         self.renderer.build_wireframe(points, lines, min_z, max_z,
-                                      self.get_color_by_height)
+                                      self.get_color_by_height, colors,
+                                      pyramid)
+
+        # Загрузка текущего градиента в шейдер
+        self.renderer.set_gradient(self.gradient_colors,
+                                   self.gradient_positions)
 
         # Создание данных для сетки
         self.renderer.build_grid(points, width, height, self.grid_color)
 
+    # Выбор детализации и отсечение невидимых тайлов
+    # (вызывается после установки матрицы камеры)
+    def update_lod(self, distance):
+        # Размер единицы длины на экране (в пикселях) на расстоянии 1
+        # и на расстоянии от камеры до модели
+        pixel_scale = self.height / (2.0 * math.tan(math.radians(
+            self.fov / 2)))
+        pixels_per_unit = pixel_scale / max(distance, 1e-6)
+
+        frustum = Frustum(glGetFloatv(GL_PROJECTION_MATRIX),
+                          glGetFloatv(GL_MODELVIEW_MATRIX))
+        self.renderer.update_lod(pixels_per_unit, frustum, pixel_scale)
+
+    # Замена высот прямоугольной части карты (x0, y0 - столбец и строка
+    # левого верхнего угла, heights - исходные высоты, как в файле):
+    # в видеопамяти обновляются только затронутые вершины
+    def update_heights(self, x0, y0, heights):
+        return self.renderer.update_heights(x0, y0, heights)
+
     # Функция получения цвета в зависимости от высоты
     def get_color_by_height(self, z, min_z, max_z):
         # Обработка скалярного значения
@@ -138,48 +217,8 @@ class Renderer:
 
     # Получение цвета для массива значений
     def _get_array_color_by_height(self, z_array, min_z, max_z):
-        if max_z == min_z:
-            # Возвращение массива с первым цветом градиента для всех значений
-            base_color = self.gradient_colors[0]
-            return np.tile(base_color, (len(z_array), 1))
-
-        # Нормализация высот
-        normalized = (z_array - min_z) / (max_z - min_z)
-
-        # Инициализация массива цветов
-        colors = np.zeros((len(z_array), 3))
-
-        # Обработка каждого значения в массиве
-        i = 0
-        while i < len(z_array):
-            norm_val = normalized[i]
-
-            # Поиск интервала градиента
-            grad_idx = 0
-            while grad_idx < len(self.gradient_positions) - 1:
-                if self.gradient_positions[grad_idx] <= norm_val <= \
-                        self.gradient_positions[grad_idx + 1]:
-                    # Интерполяция между двумя цветами
-                    t = (norm_val - self.gradient_positions[grad_idx]) / \
-                        (self.gradient_positions[grad_idx + 1] -
-                         self.gradient_positions[grad_idx])
-
-                    color1 = self.gradient_colors[grad_idx]
-                    color2 = self.gradient_colors[grad_idx + 1]
-
-                    colors[i, 0] = color1[0] + t * (color2[0] - color1[0])
-                    colors[i, 1] = color1[1] + t * (color2[1] - color1[1])
-                    colors[i, 2] = color1[2] + t * (color2[2] - color1[2])
-                    break
-                grad_idx += 1
-
-            # Если значение вне диапазона, используем крайний цвет
-            if grad_idx == len(self.gradient_positions) - 1:
-                colors[i] = self.gradient_colors[-1]
-
-            i += 1
-
-        return colors
+        colormap = Colormap(self.gradient_colors, self.gradient_positions)
+        return colormap.map_heights(z_array, min_z, max_z)
 
     # Функция для установки пользовательского градиента
     def set_gradient(self, colors, positions=None):
@@ -202,11 +241,15 @@ class Renderer:
         else:
             self.gradient_positions = positions
 
-        # Перестройка данных с новым градиентом
+        # Загрузка градиента в шейдер; без шейдеров - пересчет цветов вершин
+        self.renderer.disable_vertex_colors()
+        if self.renderer.set_gradient(self.gradient_colors,
+                                      self.gradient_positions):
+            return
+
         if (self.current_points is not None and
                 self.current_lines is not None):
-            self.renderer.build_wireframe(
-                self.current_points, self.current_lines,
+            self.renderer.recolor_wireframe(
                 self.current_min_z, self.current_max_z,
                 self.get_color_by_height
             )
@@ -241,10 +284,15 @@ class Renderer:
         glVertex3f(0.0, 0.0, 2.0)
 
         glEnd()
+        self.renderer.count_draw(1, 6)
 
     # Отображение информации на экране
+    # loading - (имя файла, этап, доля) фоновой загрузки или None,
+    # frame_time - время предыдущего кадра без ожидания (мс),
+    # extra_lines - дополнительные строки (например, профиль кадра)
     def display_info(self, font, filename, points_count, lines_count,
-                     rotation_x, rotation_y, zoom):
+                     rotation_x, rotation_y, zoom, loading=None,
+                     frame_time=None, extra_lines=None):
         # Сохранение текущей матрицы проекции
         glMatrixMode(GL_PROJECTION)
         glPushMatrix()
@@ -266,30 +314,63 @@ class Renderer:
         glBlendFunc(GL_SRC_ALPHA, GL_ONE_MINUS_SRC_ALPHA)
 
         # Отображение информации
+        level, level_points, level_lines = \
+            self.renderer.get_wireframe_stats()
         info_lines = [
             f"Файл: {filename}",
             f"Точек: {points_count}",
             f"Линий: {lines_count}",
+            f"Детализация: {level} ({level_points} точек, " +
+            f"{level_lines} линий)",
+            self._tile_info(),
             f"Вращение X: {rotation_x:.1f}°",
             f"Вращение Y: {rotation_y:.1f}°",
             f"Масштаб: {zoom:.2f}",
-            "",
-            "Управление:",
-            "ЛКМ + движение - вращение",
-            "Колесо мыши - масштаб",
-            "ESC - выход",
-            "",
-            "Градиенты:",
-            "1 - По умолчанию",
-            "2 - Земля/Горы",
-            "3 - Огонь",
-            "4 - Лед/Снег",
-            "",
-            "Файлы:",
-            "O - Открыть новый файл",
-            "R - Сбросить вид"
+            self._timing_info(frame_time)
         ]
 
+        # Индикатор фоновой загрузки нового файла
+        if loading is not None:
+            loading_name, stage, progress = loading
+            info_lines.insert(1, f"Загрузка: {loading_name} - {stage} " +
+                              f"({progress * 100:.0f}%)")
+
+        if extra_lines:
+            info_lines.extend(extra_lines)
+
+        start = time.perf_counter()
+        if self.use_text_cache:
+            self._draw_cached_text(font, info_lines)
+        else:
+            self._draw_text_pixels(font, info_lines + [""] + HELP_LINES)
+        self.text_time = 0.9 * self.text_time + \
+            0.1 * (time.perf_counter() - start)
+
+        # Восстановление состояния
+        glDisable(GL_BLEND)
+        glEnable(GL_DEPTH_TEST)
+
+        # Восстанавление матрицы
+        glPopMatrix()
+        glMatrixMode(GL_PROJECTION)
+        glPopMatrix()
+        glMatrixMode(GL_MODELVIEW)
+
+    # Отрисовка текста из кеша текстур (перерисовываются только
+    # изменившиеся строки)
+    def _draw_cached_text(self, font, info_lines):
+        if self.text_overlay is None or self.text_overlay.font is not font:
+            if self.text_overlay is not None:
+                self.text_overlay.delete()
+            self.text_overlay = TextOverlay(font)
+
+        self.text_overlay.set_static_lines(HELP_LINES)
+        self.text_overlay.set_lines(info_lines)
+        self.renderer.count_draw(1, self.text_overlay.draw(10, 40))
+
+    # Отрисовка текста без кеша: каждая строка растеризуется заново
+    # и копируется через glDrawPixels (для сравнения времени кадра)
+    def _draw_text_pixels(self, font, info_lines):
         y_offset = 40
         idx = 0
         while idx < len(info_lines):
@@ -301,18 +382,40 @@ class Renderer:
             glRasterPos2d(10, y_offset)
             glDrawPixels(text_surface.get_width(), text_surface.get_height(),
                          GL_RGBA, GL_UNSIGNED_BYTE, text_data)
-            y_offset += 20
+            y_offset += LINE_HEIGHT
             idx += 1
-
-        # Восстановление состояния
-        glDisable(GL_BLEND)
-        glEnable(GL_DEPTH_TEST)
-
-        # Восстанавление матрицы
-        glPopMatrix()
-        glMatrixMode(GL_PROJECTION)
-        glPopMatrix()
-        glMatrixMode(GL_MODELVIEW)
+        self.renderer.count_draw(len(info_lines), 0)
+
+    # Переключение кеша текста (для сравнения времени кадра)
+    def toggle_text_cache(self):
+        self.use_text_cache = not self.use_text_cache
+        state = "включен" if self.use_text_cache else "выключен"
+        print(f"Кеш текста {state}")
+
+    # Строка со временем кадра и текста (обновляется раз в полсекунды,
+    # чтобы не перерисовывать ее текстуру каждый кадр)
+    def _timing_info(self, frame_time):
+        now = time.perf_counter()
+        if now - self.timing_updated >= TIMING_UPDATE_INTERVAL:
+            mode = "кеш" if self.use_text_cache else "без кеша"
+            self.timing_text = f"Текст: {self.text_time * 1000:.2f} мс " + \
+                f"({mode})"
+            if frame_time is not None:
+                self.timing_text = f"Кадр: {frame_time} мс, " + \
+                    self.timing_text
+            self.timing_updated = now
+        return self.timing_text
+
+    # Вызовы отрисовки и переданные вершины с начала кадра
+    def get_draw_stats(self):
+        return self.renderer.draw_calls, self.renderer.drawn_vertices
+
+    # Строка с количеством видимых и отсеченных тайлов
+    def _tile_info(self):
+        tile_stats = self.renderer.get_tile_stats()
+        if tile_stats is None:
+            return "Тайлы: нет"
+        return f"Тайлы: {tile_stats[0]} видимых, {tile_stats[1]} отсечено"
 
     # Обработка изменения размера окна
     def handle_resize(self, width, height):
@@ -322,4 +425,7 @@ class Renderer:
 
     # Очистка ресурсов
     def cleanup(self):
+        if self.text_overlay is not None:
+            self.text_overlay.delete()
+            self.text_overlay = None
         self.renderer.cleanup()
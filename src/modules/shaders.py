@@ -0,0 +1,202 @@
+import numpy as np
+from OpenGL.GL import glUseProgram, glGetUniformLocation, glUniform1i, \
+    glUniform1f, glUniform2f, glUniform1fv, glUniform3fv, glDeleteProgram, \
+    glCreateProgram, glAttachShader, glDeleteShader, glBindAttribLocation, \
+    glLinkProgram, glGetProgramiv, glGetProgramInfoLog, GL_VERTEX_SHADER, \
+    GL_FRAGMENT_SHADER, GL_LINK_STATUS
+from OpenGL.GL.shaders import compileShader
+
+# Максимальное количество точек градиента в шейдере
+MAX_GRADIENT_STOPS = 16
+
+# Номер атрибута высоты в шейдере карты высот (0 - вместо gl_Vertex,
+# чтобы вершины рисовались без массива координат)
+HEIGHT_ATTRIBUTE = 0
+
+# Градиент по высоте: общие переменные и функция вершинных шейдеров
+GRADIENT_FUNCTION = """
+const int MAX_STOPS = %d;
+
+uniform vec3 u_colors[MAX_STOPS];
+uniform float u_positions[MAX_STOPS];
+uniform int u_num_stops;
+uniform float u_min_z;
+uniform float u_max_z;
+
+vec3 gradient_color(float t)
+{
+    if (t <= u_positions[0])
+        return u_colors[0];
+
+    for (int i = 1; i < MAX_STOPS; i++) {
+        if (i >= u_num_stops)
+            break;
+
+        if (t <= u_positions[i]) {
+            float span = u_positions[i] - u_positions[i - 1];
+            float k = span > 0.0 ? (t - u_positions[i - 1]) / span : 1.0;
+            return mix(u_colors[i - 1], u_colors[i], k);
+        }
+    }
+
+    return u_colors[u_num_stops - 1];
+}
+
+vec4 height_color(float z)
+{
+    float t = 0.0;
+    if (u_max_z != u_min_z)
+        t = (z - u_min_z) / (u_max_z - u_min_z);
+
+    return vec4(gradient_color(t), 1.0);
+}
+""" % MAX_GRADIENT_STOPS
+
+# Вершинный шейдер: цвет вычисляется по высоте вершины и градиенту
+HEIGHT_VERTEX_SHADER = """
+#version 120
+""" + GRADIENT_FUNCTION + """
+void main()
+{
+    gl_Position = ftransform();
+    gl_FrontColor = height_color(gl_Vertex.z);
+}
+"""
+
+# Вершинный шейдер карты высот: в буфере только высота, X и Y
+# вычисляются по номеру вершины (gl_VertexID, GLSL 1.30):
+# x = x0 + столбец * dx, y = y0 + строка * dy, z = z0 + h * dz
+HEIGHTFIELD_VERTEX_SHADER = """
+#version 130
+""" + GRADIENT_FUNCTION + """
+uniform int u_columns;
+uniform vec2 u_origin;
+uniform vec2 u_step;
+uniform vec2 u_z_transform;
+
+in float a_height;
+
+void main()
+{
+    int column = gl_VertexID % u_columns;
+    int row = gl_VertexID / u_columns;
+    float z = u_z_transform.x + a_height * u_z_transform.y;
+    vec2 xy = u_origin + vec2(float(column), float(row)) * u_step;
+
+    gl_Position = gl_ModelViewProjectionMatrix * vec4(xy, z, 1.0);
+    gl_FrontColor = height_color(z);
+}
+"""
+
+HEIGHT_FRAGMENT_SHADER = """
+#version 120
+
+void main()
+{
+    gl_FragColor = gl_Color;
+}
+"""
+
+
+# Сборка программы из вершинного и фрагментного шейдеров. attributes -
+# пары (номер, имя) атрибутов, номера задаются до сборки
+def link_program(vertex_source, fragment_source, attributes=()):
+    shaders = [compileShader(vertex_source, GL_VERTEX_SHADER),
+               compileShader(fragment_source, GL_FRAGMENT_SHADER)]
+    program = glCreateProgram()
+    i = 0
+    while i < len(shaders):
+        glAttachShader(program, shaders[i])
+        i += 1
+
+    i = 0
+    while i < len(attributes):
+        glBindAttribLocation(program, attributes[i][0], attributes[i][1])
+        i += 1
+
+    glLinkProgram(program)
+    i = 0
+    while i < len(shaders):
+        glDeleteShader(shaders[i])
+        i += 1
+
+    if not glGetProgramiv(program, GL_LINK_STATUS):
+        log = glGetProgramInfoLog(program)
+        glDeleteProgram(program)
+        raise RuntimeError(f"Ошибка сборки программы: {log}")
+    return program
+
+
+class HeightColorShader:
+    # Компиляция программы и получение адресов переменных
+    def __init__(self, vertex_source=HEIGHT_VERTEX_SHADER, attributes=()):
+        self.program = link_program(vertex_source, HEIGHT_FRAGMENT_SHADER,
+                                    attributes)
+
+        self.colors_location = glGetUniformLocation(self.program, "u_colors")
+        self.positions_location = glGetUniformLocation(self.program,
+                                                       "u_positions")
+        self.num_stops_location = glGetUniformLocation(self.program,
+                                                       "u_num_stops")
+        self.min_z_location = glGetUniformLocation(self.program, "u_min_z")
+        self.max_z_location = glGetUniformLocation(self.program, "u_max_z")
+
+    # Загрузка градиента (несколько десятков чисел)
+    def set_gradient(self, colors, positions):
+        colors = np.asarray(colors, dtype=np.float32).reshape(-1, 3)
+        positions = np.asarray(positions, dtype=np.float32)
+
+        if len(colors) > MAX_GRADIENT_STOPS:
+            raise ValueError("Слишком много точек градиента: " +
+                             f"{len(colors)} > {MAX_GRADIENT_STOPS}")
+
+        glUseProgram(self.program)
+        glUniform3fv(self.colors_location, len(colors), colors)
+        glUniform1fv(self.positions_location, len(positions), positions)
+        glUniform1i(self.num_stops_location, len(colors))
+        glUseProgram(0)
+
+    # Установка диапазона высот для нормализации
+    def set_height_range(self, min_z, max_z):
+        glUseProgram(self.program)
+        glUniform1f(self.min_z_location, float(min_z))
+        glUniform1f(self.max_z_location, float(max_z))
+        glUseProgram(0)
+
+    # Включение программы
+    def bind(self):
+        glUseProgram(self.program)
+
+    # Выключение программы
+    def unbind(self):
+        glUseProgram(0)
+
+    # Удаление программы из видеопамяти
+    def delete(self):
+        glDeleteProgram(self.program)
+        self.program = 0
+
+
+class HeightFieldShader(HeightColorShader):
+    # Программа для сеток карты высот (HeightFieldMesh): градиент как у
+    # HeightColorShader, координаты X и Y - по номеру вершины
+    def __init__(self):
+        # Высота - атрибут 0 (номер задается до сборки программы)
+        super().__init__(HEIGHTFIELD_VERTEX_SHADER,
+                         [(HEIGHT_ATTRIBUTE, "a_height")])
+
+        self.columns_location = glGetUniformLocation(self.program,
+                                                     "u_columns")
+        self.origin_location = glGetUniformLocation(self.program,
+                                                    "u_origin")
+        self.step_location = glGetUniformLocation(self.program, "u_step")
+        self.z_transform_location = glGetUniformLocation(self.program,
+                                                         "u_z_transform")
+
+    # Параметры сетки для следующей отрисовки (программа включена)
+    def set_grid(self, heightfield):
+        glUniform1i(self.columns_location, heightfield.width)
+        glUniform2f(self.origin_location, *heightfield.origin)
+        glUniform2f(self.step_location, *heightfield.step)
+        glUniform2f(self.z_transform_location, heightfield.z_base,
+                    heightfield.z_step)
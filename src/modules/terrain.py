@@ -0,0 +1,272 @@
+import numpy as np
+
+# Размер тайла в ячейках (вершин на сторону на одну больше: соседние
+# тайлы делят крайний ряд, чтобы линии не разрывались)
+TILE_SIZE = 128
+
+# Наибольшее количество тайлов, хранимых в видеопамяти
+MAX_CACHED_TILES = 256
+
+# Минимальное расстояние до тайла при выборе детализации
+MIN_TILE_DISTANCE = 1e-3
+
+
+# Пересечение частей уровня (row_start, row_stop, col_start, col_stop)
+# или None, если они не пересекаются
+def intersect_regions(first, second):
+    row_start = max(first[0], second[0])
+    row_stop = min(first[1], second[1])
+    col_start = max(first[2], second[2])
+    col_stop = min(first[3], second[3])
+    if row_start >= row_stop or col_start >= col_stop:
+        return None
+    return row_start, row_stop, col_start, col_stop
+
+
+class Frustum:
+    # Плоскости пирамиды видимости из матриц OpenGL (хранятся по столбцам)
+    def __init__(self, projection, modelview):
+        projection = np.asarray(projection, dtype=np.float64). \
+            reshape(4, 4).T
+        modelview = np.asarray(modelview, dtype=np.float64).reshape(4, 4).T
+        clip = projection @ modelview
+
+        # Левая, правая, нижняя, верхняя, ближняя и дальняя плоскости:
+        # точка внутри, если a*x + b*y + c*z + d >= 0 для всех плоскостей
+        self.planes = np.array([
+            clip[3] + clip[0],
+            clip[3] - clip[0],
+            clip[3] + clip[1],
+            clip[3] - clip[1],
+            clip[3] + clip[2],
+            clip[3] - clip[2]
+        ])
+
+        # Положение камеры в координатах модели
+        eye = np.linalg.inv(modelview) @ np.array([0.0, 0.0, 0.0, 1.0])
+        self.eye = eye[:3] / eye[3]
+
+    # Пересекает ли параллелепипед пирамиду видимости
+    def intersects_box(self, box_min, box_max):
+        normals = self.planes[:, :3]
+
+        # Для каждой плоскости - вершина, дальше всех по нормали
+        corners = np.where(normals >= 0, box_max, box_min)
+        distances = np.einsum('ij,ij->i', normals, corners) + \
+            self.planes[:, 3]
+        return bool(np.all(distances >= 0))
+
+    # Расстояние от камеры до ближайшей точки параллелепипеда
+    def distance_to_box(self, box_min, box_max):
+        nearest = np.clip(self.eye, box_min, box_max)
+        return float(np.linalg.norm(nearest - self.eye))
+
+
+class TerrainTiles:
+    # Дерево тайлов над пирамидой высот: тайл уровня L делится на тайлы
+    # уровня L - 1, покрывающие ту же область.
+    # create_mesh(level, region) - создание сетки тайла в видеопамяти
+    def __init__(self, pyramid, create_mesh, tile_size=TILE_SIZE,
+                 max_cached_tiles=MAX_CACHED_TILES):
+        self.pyramid = pyramid
+        self.create_mesh = create_mesh
+        self.tile_size = tile_size
+        self.max_cached_tiles = max_cached_tiles
+
+        # Ключ тайла - (уровень, строка, столбец)
+        self.meshes = {}
+        self.last_used = {}
+        self.bounds = {}
+        self.visible = []
+        self.culled = 0
+        self.frame = 0
+
+    # Количество тайлов уровня по строкам и столбцам
+    def tile_counts(self, level):
+        width, height = self.pyramid.level_size(level)
+        rows = max(1, -(-(height - 1) // self.tile_size))
+        cols = max(1, -(-(width - 1) // self.tile_size))
+        return rows, cols
+
+    # Часть уровня, покрываемая тайлом: (row_start, row_stop,
+    # col_start, col_stop)
+    def tile_region(self, key):
+        level, row, col = key
+        width, height = self.pyramid.level_size(level)
+        row_start = row * self.tile_size
+        col_start = col * self.tile_size
+        row_stop = min(row_start + self.tile_size, height - 1) + 1
+        col_stop = min(col_start + self.tile_size, width - 1) + 1
+        return row_start, row_stop, col_start, col_stop
+
+    # Ограничивающий параллелепипед тайла (вычисляется один раз)
+    def tile_bounds(self, key):
+        if key not in self.bounds:
+            self.bounds[key] = self.pyramid.region_bounds(
+                key[0], self.tile_region(key))
+        return self.bounds[key]
+
+    # Тайлы самого грубого уровня
+    def root_tiles(self):
+        level = self.pyramid.level_count() - 1
+        rows, cols = self.tile_counts(level)
+        tiles = []
+        row = 0
+        while row < rows:
+            col = 0
+            while col < cols:
+                tiles.append((level, row, col))
+                col += 1
+            row += 1
+        return tiles
+
+    # Номера дочерних тайлов по одной оси: 2i и 2i + 1, последний тайл
+    # забирает оставшиеся (при нечетных размерах уровней)
+    @staticmethod
+    def _child_range(index, count, child_count):
+        start = 2 * index
+        stop = 2 * index + 2
+        if index == count - 1:
+            stop = max(stop, child_count)
+        return start, min(stop, child_count)
+
+    # Тайлы следующего, более детального уровня в той же области
+    def children(self, key):
+        level, row, col = key
+        rows, cols = self.tile_counts(level)
+        child_rows, child_cols = self.tile_counts(level - 1)
+        row_start, row_stop = self._child_range(row, rows, child_rows)
+        col_start, col_stop = self._child_range(col, cols, child_cols)
+
+        tiles = []
+        child_row = row_start
+        while child_row < row_stop:
+            child_col = col_start
+            while child_col < col_stop:
+                tiles.append((level - 1, child_row, child_col))
+                child_col += 1
+            child_row += 1
+        return tiles
+
+    # Выбор видимых тайлов: отсечение по пирамиде видимости и выбор
+    # детализации по расстоянию до каждого тайла. Без пирамиды
+    # видимости (frustum=None) показывается самый грубый уровень.
+    # pixel_scale - размер в пикселях единицы длины на расстоянии 1
+    def update(self, frustum, pixel_scale, max_cell_pixels):
+        self.frame += 1
+        self.visible = []
+        self.culled = 0
+
+        stack = self.root_tiles()
+        while stack:
+            key = stack.pop()
+            if frustum is None:
+                self.visible.append(key)
+                continue
+
+            box_min, box_max = self.tile_bounds(key)
+            if not frustum.intersects_box(box_min, box_max):
+                self.culled += 1
+                continue
+
+            level = key[0]
+            distance = max(frustum.distance_to_box(box_min, box_max),
+                           MIN_TILE_DISTANCE)
+            cell_pixels = self.pyramid.cell_size(level) * pixel_scale / \
+                distance
+            if level == 0 or cell_pixels <= max_cell_pixels:
+                self.visible.append(key)
+            else:
+                stack.extend(self.children(key))
+
+        # Создание сеток видимых тайлов
+        idx = 0
+        while idx < len(self.visible):
+            key = self.visible[idx]
+            if key not in self.meshes:
+                self.meshes[key] = self.create_mesh(key[0],
+                                                    self.tile_region(key))
+            self.last_used[key] = self.frame
+            idx += 1
+
+        self._evict()
+
+    # Удаление давно не видимых тайлов из видеопамяти
+    def _evict(self):
+        if len(self.meshes) <= self.max_cached_tiles:
+            return
+
+        keys = sorted(self.meshes, key=self.last_used.get)
+        idx = 0
+        while len(self.meshes) > self.max_cached_tiles and idx < len(keys):
+            key = keys[idx]
+            if self.last_used[key] == self.frame:
+                break
+            self.meshes.pop(key).delete()
+            del self.last_used[key]
+            idx += 1
+
+    # Отрисовка видимых тайлов; возвращает количество вершин (индексов)
+    def draw(self):
+        vertices = 0
+        idx = 0
+        while idx < len(self.visible):
+            mesh = self.meshes[self.visible[idx]]
+            mesh.draw()
+            vertices += len(mesh.indices)
+            idx += 1
+        return vertices
+
+    # Изменение высот: regions[level] - измененная часть уровня. Границы
+    # тайлов, которые ее касаются (с запасом в ячейку, как в
+    # region_bounds), вычисляются заново при следующем выборе, сетки
+    # созданных тайлов обновляет update_mesh(mesh, level, tile_region,
+    # changed); остальные тайлы не меняются
+    def update_heights(self, regions, update_mesh):
+        keys = list(self.bounds)
+        idx = 0
+        while idx < len(keys):
+            key = keys[idx]
+            row_start, row_stop, col_start, col_stop = self.tile_region(key)
+            grown = (row_start - 1, row_stop + 1, col_start - 1, col_stop + 1)
+            if intersect_regions(grown, regions[key[0]]) is not None:
+                del self.bounds[key]
+            idx += 1
+
+        keys = list(self.meshes)
+        idx = 0
+        while idx < len(keys):
+            key = keys[idx]
+            update_mesh(self.meshes[key], key[0], self.tile_region(key),
+                        regions[key[0]])
+            idx += 1
+
+    # Все созданные сетки тайлов
+    def all_meshes(self):
+        return list(self.meshes.values())
+
+    # Самый детальный видимый уровень, количество вершин и линий
+    def stats(self):
+        level = self.pyramid.level_count() - 1
+        vertices = 0
+        lines = 0
+        idx = 0
+        while idx < len(self.visible):
+            key = self.visible[idx]
+            mesh = self.meshes[key]
+            level = min(level, key[0])
+            vertices += mesh.num_vertices()
+            lines += mesh.num_lines()
+            idx += 1
+        return level, vertices, lines
+
+    # Удаление всех тайлов из видеопамяти
+    def delete(self):
+        meshes = self.all_meshes()
+        idx = 0
+        while idx < len(meshes):
+            meshes[idx].delete()
+            idx += 1
+        self.meshes = {}
+        self.last_used = {}
+        self.visible = []
@@ -0,0 +1,204 @@
+import numpy as np
+import pygame
+from OpenGL.GL import glGenTextures, glBindTexture, glTexImage2D, \
+    glTexSubImage2D, glTexParameteri, glDeleteTextures, glEnable, \
+    glDisable, glColor4f, glEnableClientState, glDisableClientState, \
+    glVertexPointer, glTexCoordPointer, glDrawArrays, glPixelStorei, \
+    GL_TEXTURE_2D, GL_RGBA, GL_UNSIGNED_BYTE, GL_TEXTURE_MIN_FILTER, \
+    GL_TEXTURE_MAG_FILTER, GL_NEAREST, GL_QUADS, GL_VERTEX_ARRAY, \
+    GL_TEXTURE_COORD_ARRAY, GL_FLOAT, GL_UNPACK_ALIGNMENT
+
+# Высота строки текста (пиксели)
+LINE_HEIGHT = 20
+
+# Ширина текстуры-атласа строк (более длинные строки обрезаются)
+ATLAS_WIDTH = 1024
+
+# Минимальное количество строк в атласе
+MIN_ATLAS_ROWS = 32
+
+
+class TextOverlay:
+    # Кеш текста в одной текстуре (атласе строк): строка справки
+    # растеризуется один раз, изменяемая строка - только при изменении
+    # текста. Все строки рисуются одним вызовом glDrawArrays
+    def __init__(self, font, color=(255, 255, 255)):
+        self.font = font
+        self.color = color
+        self.texture = None
+        self.rows = 0
+
+        # Строки атласа: сначала справка, затем изменяемые строки
+        self.static_lines = []
+        self.line_texts = []
+        self.slot_widths = []
+
+        # Прямоугольники строк (пересчитываются при изменении ширины)
+        self.vertices = None
+        self.tex_coords = None
+        self.layout_position = None
+
+    # Постоянный блок строк (растеризуется только при изменении)
+    def set_static_lines(self, lines):
+        if lines == self.static_lines and self.texture is not None:
+            return
+
+        self.static_lines = list(lines)
+        self._render_all()
+
+    # Растеризация всех строк справки; изменяемые строки будут
+    # растеризованы заново при следующем set_lines
+    def _render_all(self):
+        self.line_texts = []
+        self.slot_widths = []
+        self._ensure_rows(len(self.static_lines))
+
+        idx = 0
+        while idx < len(self.static_lines):
+            self.slot_widths.append(0)
+            self._render_slot(idx, self.static_lines[idx])
+            idx += 1
+
+    # Изменяемые строки (перерисовываются только измененные)
+    def set_lines(self, lines):
+        first = len(self.static_lines)
+        if self._ensure_rows(first + len(lines)):
+            self._render_all()
+
+        # Лишние строки (например, завершенная загрузка) удаляются
+        while len(self.line_texts) > len(lines):
+            self.line_texts.pop()
+            self.slot_widths.pop()
+            self.layout_position = None
+
+        idx = 0
+        while idx < len(lines):
+            if idx == len(self.line_texts):
+                self.line_texts.append(None)
+                self.slot_widths.append(0)
+
+            if self.line_texts[idx] != lines[idx]:
+                self.line_texts[idx] = lines[idx]
+                self._render_slot(first + idx, lines[idx])
+            idx += 1
+
+    # Создание текстуры на rows строк; True, если текстура создана
+    # заново (старое содержимое потеряно)
+    def _ensure_rows(self, rows):
+        if self.texture is not None and rows <= self.rows:
+            return False
+
+        capacity = MIN_ATLAS_ROWS
+        while capacity < rows:
+            capacity *= 2
+
+        if self.texture is None:
+            self.texture = glGenTextures(1)
+        self.rows = capacity
+
+        glBindTexture(GL_TEXTURE_2D, self.texture)
+        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MIN_FILTER, GL_NEAREST)
+        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAG_FILTER, GL_NEAREST)
+        glTexImage2D(GL_TEXTURE_2D, 0, GL_RGBA, ATLAS_WIDTH,
+                     capacity * LINE_HEIGHT, 0, GL_RGBA, GL_UNSIGNED_BYTE,
+                     None)
+        glBindTexture(GL_TEXTURE_2D, 0)
+        self.layout_position = None
+        return True
+
+    # Растеризация строки в ее ячейку атласа (низ текста - на границе
+    # ячейки, как при glRasterPos2d + glDrawPixels)
+    def _render_slot(self, slot, text):
+        surface = self.font.render(text, True, self.color)
+        width = min(surface.get_width(), ATLAS_WIDTH)
+        height = min(surface.get_height(), LINE_HEIGHT)
+
+        # Перезаписывается и хвост прежней, более длинной строки
+        update_width = max(width, self.slot_widths[slot], 1)
+        cell = pygame.Surface((update_width, LINE_HEIGHT), pygame.SRCALPHA)
+
+        # Прозрачный фон цвета текста, чтобы края букв не темнели
+        cell.fill(self.color + (0,))
+        cell.blit(surface, (0, LINE_HEIGHT - height),
+                  (0, surface.get_height() - height, width, height))
+
+        glBindTexture(GL_TEXTURE_2D, self.texture)
+        glPixelStorei(GL_UNPACK_ALIGNMENT, 1)
+        glTexSubImage2D(GL_TEXTURE_2D, 0, 0, slot * LINE_HEIGHT,
+                        update_width, LINE_HEIGHT, GL_RGBA, GL_UNSIGNED_BYTE,
+                        pygame.image.tostring(cell, "RGBA", False))
+        glBindTexture(GL_TEXTURE_2D, 0)
+
+        if width != self.slot_widths[slot]:
+            self.slot_widths[slot] = width
+            self.layout_position = None
+
+    # Прямоугольники строк: изменяемые строки, пустая строка, справка.
+    # (x, y) - низ первой строки
+    def _build_layout(self, x, y):
+        first = len(self.static_lines)
+        order = list(range(first, len(self.slot_widths)))
+        order.append(None)
+        order.extend(range(first))
+
+        vertices = []
+        tex_coords = []
+        atlas_height = float(self.rows * LINE_HEIGHT)
+        idx = 0
+        while idx < len(order):
+            slot = order[idx]
+            top = y + idx * LINE_HEIGHT - LINE_HEIGHT
+            if slot is not None and self.slot_widths[slot] > 0:
+                width = self.slot_widths[slot]
+                vertices.append([(x, top), (x + width, top),
+                                 (x + width, top + LINE_HEIGHT),
+                                 (x, top + LINE_HEIGHT)])
+
+                u = width / float(ATLAS_WIDTH)
+                v0 = slot * LINE_HEIGHT / atlas_height
+                v1 = (slot + 1) * LINE_HEIGHT / atlas_height
+                tex_coords.append([(0.0, v0), (u, v0), (u, v1), (0.0, v1)])
+            idx += 1
+
+        self.vertices = np.array(vertices, dtype=np.float32).reshape(-1, 2)
+        self.tex_coords = np.array(tex_coords, dtype=np.float32). \
+            reshape(-1, 2)
+        self.layout_position = (x, y)
+
+    # Отрисовка всех строк одним вызовом; (x, y) - низ первой строки.
+    # Возвращает количество вершин
+    def draw(self, x, y):
+        if self.texture is None:
+            return 0
+
+        if self.layout_position != (x, y):
+            self._build_layout(x, y)
+        if len(self.vertices) == 0:
+            return 0
+
+        glEnable(GL_TEXTURE_2D)
+        glBindTexture(GL_TEXTURE_2D, self.texture)
+        glColor4f(1.0, 1.0, 1.0, 1.0)
+
+        glEnableClientState(GL_VERTEX_ARRAY)
+        glEnableClientState(GL_TEXTURE_COORD_ARRAY)
+        glVertexPointer(2, GL_FLOAT, 0, self.vertices)
+        glTexCoordPointer(2, GL_FLOAT, 0, self.tex_coords)
+        glDrawArrays(GL_QUADS, 0, len(self.vertices))
+        glDisableClientState(GL_TEXTURE_COORD_ARRAY)
+        glDisableClientState(GL_VERTEX_ARRAY)
+
+        glBindTexture(GL_TEXTURE_2D, 0)
+        glDisable(GL_TEXTURE_2D)
+        return len(self.vertices)
+
+    # Удаление текстуры
+    def delete(self):
+        if self.texture is not None:
+            glDeleteTextures(1, [self.texture])
+            self.texture = None
+        self.rows = 0
+        self.static_lines = []
+        self.line_texts = []
+        self.slot_widths = []
+        self.layout_position = None
@@ -0,0 +1,161 @@
+import threading
+import numpy as np
+
+# Предельный объем кешированных массивов индексов (байты); массивы
+# больше четверти предела не кешируются и создаются при каждом запросе
+MAX_CACHED_INDEX_BYTES = 64 * 1024 * 1024
+
+# Индекс перезапуска примитива в массиве полос (при преобразовании в
+# uint16 становится 0xFFFF)
+RESTART_INDEX = 0xFFFFFFFF
+
+
+class GridTopology:
+    # Линии регулярной сетки width x height: узлы - каждая stride-я
+    # строка и столбец, соседние узлы соединены линиями. Индексы зависят
+    # только от (width, height, stride), создаются при первом обращении
+    # и хранятся в общем кеше: сетки одного размера (тайлы, уровни,
+    # файлы) используют один массив. Кеш используется из потока загрузки
+    # и основного потока, поэтому изменяется только под cache_lock
+    cache = {}
+    cached_bytes = 0
+    cache_lock = threading.Lock()
+
+    def __init__(self, width, height, stride=1):
+        self.width = int(width)
+        self.height = int(height)
+        self.stride = max(1, int(stride))
+
+        # Количество узлов по осям
+        self.rows = (self.height + self.stride - 1) // self.stride
+        self.cols = (self.width + self.stride - 1) // self.stride
+        self.num_horizontal = self.rows * max(self.cols - 1, 0)
+        self.num_vertical = max(self.rows - 1, 0) * self.cols
+
+    # Ключ кеша (параметры сетки)
+    def key(self):
+        return self.width, self.height, self.stride
+
+    # Количество линий (без создания массива)
+    def num_lines(self):
+        return self.num_horizontal + self.num_vertical
+
+    # Количество линий, как у массива (N, 2)
+    def __len__(self):
+        return self.num_lines()
+
+    # Преобразование в массив (N, 2) через np.asarray
+    def __array__(self, dtype=None, copy=None):
+        lines = self.lines()
+        if dtype is not None and lines.dtype != dtype:
+            return lines.astype(dtype)
+        if copy:
+            return lines.copy()
+        return lines
+
+    # Массив линий (N, 2) int32 только для чтения: горизонтальные, затем
+    # вертикальные
+    def lines(self):
+        return self._cached('lines', self._build_lines)
+
+    # Полосы (GL_LINE_STRIP) uint32 только для чтения: каждая строка,
+    # затем каждый столбец узлов, после каждой полосы - RESTART_INDEX.
+    # Индексов примерно вдвое меньше, чем в lines()
+    def strips(self):
+        return self._cached('strips', self._build_strips)
+
+    # Количество полос строк и столбцов (полосы из одного узла не нужны)
+    def _strip_counts(self):
+        row_strips = self.rows if self.cols > 1 else 0
+        col_strips = self.cols if self.rows > 1 else 0
+        return row_strips, col_strips
+
+    # Количество индексов полос (без создания массива)
+    def num_strip_indices(self):
+        row_strips, col_strips = self._strip_counts()
+        return row_strips * (self.cols + 1) + col_strips * (self.rows + 1)
+
+    # Массив из кеша или новый (созданный build)
+    def _cached(self, kind, build):
+        key = self.key() + (kind,)
+        with GridTopology.cache_lock:
+            array = GridTopology.cache.pop(key, None)
+            if array is not None:
+                # Перемещение в конец (недавно использованные)
+                GridTopology.cache[key] = array
+                return array
+
+        # Создание вне блокировки, чтобы не задерживать другой поток
+        array = build()
+        array.flags.writeable = False
+        with GridTopology.cache_lock:
+            return self._store(key, array)
+
+    # Индексы узлов (rows, cols) без массива индексов всех точек
+    def _nodes(self, dtype):
+        rows = np.arange(0, self.height, self.stride, dtype=dtype)
+        cols = np.arange(0, self.width, self.stride, dtype=dtype)
+        return rows[:, np.newaxis] * dtype(self.width) + cols[np.newaxis, :]
+
+    # Создание линий между соседними узлами
+    def _build_lines(self):
+        nodes = self._nodes(np.int32)
+        lines = np.empty((self.num_lines(), 2), dtype=np.int32)
+        if self.rows == 0 or self.cols == 0:
+            return lines
+
+        horizontal = lines[:self.num_horizontal].reshape(self.rows,
+                                                         self.cols - 1, 2)
+        horizontal[:, :, 0] = nodes[:, :-1]
+        horizontal[:, :, 1] = nodes[:, 1:]
+
+        vertical = lines[self.num_horizontal:].reshape(self.rows - 1,
+                                                       self.cols, 2)
+        vertical[:, :, 0] = nodes[:-1, :]
+        vertical[:, :, 1] = nodes[1:, :]
+        return lines
+
+    # Создание полос строк и столбцов
+    def _build_strips(self):
+        strips = np.empty(self.num_strip_indices(), dtype=np.uint32)
+        nodes = self._nodes(np.uint32)
+        num_rows, num_cols = self._strip_counts()
+        num_row_indices = num_rows * (self.cols + 1)
+
+        if num_rows > 0:
+            row_strips = strips[:num_row_indices].reshape(num_rows,
+                                                          self.cols + 1)
+            row_strips[:, :-1] = nodes
+            row_strips[:, -1] = RESTART_INDEX
+
+        if num_cols > 0:
+            col_strips = strips[num_row_indices:].reshape(num_cols,
+                                                          self.rows + 1)
+            col_strips[:, :-1] = nodes.T
+            col_strips[:, -1] = RESTART_INDEX
+        return strips
+
+    # Сохранение массива в кеш с вытеснением давно не использованных
+    # (вызывается под cache_lock). Возвращает массив из кеша, если другой
+    # поток уже создал такой же
+    @staticmethod
+    def _store(key, array):
+        if key in GridTopology.cache:
+            return GridTopology.cache[key]
+        if array.nbytes * 4 > MAX_CACHED_INDEX_BYTES:
+            return array
+
+        GridTopology.cache[key] = array
+        GridTopology.cached_bytes += array.nbytes
+        while GridTopology.cached_bytes > MAX_CACHED_INDEX_BYTES:
+            oldest = next(iter(GridTopology.cache))
+            GridTopology.cached_bytes -= \
+                GridTopology.cache.pop(oldest).nbytes
+        return array
+
+    # Очистка кеша (например, перед измерением времени создания)
+    @staticmethod
+    def clear_cache():
+        with GridTopology.cache_lock:
+            GridTopology.cache = {}
+            GridTopology.cached_bytes = 0
@@ -0,0 +1,47 @@
+import argparse
+import sys
+
+from modules.batch import expand_inputs, preprocess_files, print_report, \
+    release_all
+
+
+# Пакетная предобработка: разбор файлов и запись бинарного кеша
+def main():
+    arg_parser = argparse.ArgumentParser(
+        description="Параллельная предобработка FDF файлов и изображений")
+    arg_parser.add_argument('inputs', nargs='+',
+                            help="файлы, шаблоны (\"maps/*.fdf\") или " +
+                            "каталоги")
+    arg_parser.add_argument('--workers', type=int, default=None,
+                            help="количество процессов (по умолчанию - " +
+                            "количество ядер)")
+    arg_parser.add_argument('--cache-dir', default=None,
+                            help="каталог кеша (по умолчанию - " +
+                            "FDF_CACHE_DIR или ~/.cache/fdf_viewer)")
+    args = arg_parser.parse_args()
+
+    filenames = expand_inputs(args.inputs)
+    if not filenames:
+        print("Нет поддерживаемых файлов")
+        sys.exit(1)
+
+    results, wall_time = preprocess_files(filenames, args.workers,
+                                          args.cache_dir)
+    try:
+        print_report(results, wall_time)
+    finally:
+        # Результаты в общей памяти больше не нужны
+        release_all(results)
+
+    failed = 0
+    idx = 0
+    while idx < len(results):
+        if results[idx].error is not None:
+            failed += 1
+        idx += 1
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()